@@ -1,19 +1,66 @@
 # app.py - VERSÃO COM LIMPEZA AUTOMÁTICA (SEM BOTÃO)
 import streamlit as st
 import time
+
+# Início desta execução do script; a primeira do processo mede o arranque a frio
+INICIO_EXECUCAO = time.perf_counter()
+
 import uuid
 import base64
-from datetime import datetime
-from PIL import Image
+import hashlib
+import html
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 import io
 import os
 import json
+import csv
+import tempfile
+import threading
+import random
+import secrets
+import re
+import sys
+import bisect
+import sqlite3
+import logging
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+
+from armazenamento import (
+    CAMPO_ORDENACAO,
+    CAMPOS_DATA,
+    ConflitoConcorrencia,
+    PedidoJaExiste,
+    RepositorioFotosLocal,
+    RepositorioFotosStorage,
+    RepositorioPedidosFirestore,
+    RepositorioPedidosSQLite,
+    normalizar_numero_serie,
+)
+from cache_compartilhado import CacheConsultas, criar_backend_cache
+from metricas import MetricasDesempenho, RelatorioInicializacao, RepositorioInstrumentado
+
+# Pillow e as bibliotecas do Google são importados só onde são usados (e
+# pré-carregados pelo aquecimento em segundo plano), não antes da primeira tela
+FIM_IMPORTACOES = time.perf_counter()
 
 # =============================================================================
 # CONFIGURAÇÕES GERAIS
 # =============================================================================
 SENHA_AUTORIZACAO = "Printer@2025"
 
+def obter_config(chave: str, padrao=None):
+    """Configuração: variável de ambiente PARTFLOW_<CHAVE>, depois secrets, depois o padrão"""
+    valor = os.environ.get(f"PARTFLOW_{chave}")
+    if valor is not None:
+        return valor
+    try:
+        return st.secrets.get(chave, padrao)
+    except Exception:
+        # Sem .streamlit/secrets.toml (ex.: backend local em um notebook)
+        return padrao
+
 STATUS_PEDIDO = ["Pendente", "Solicitado", "Entregue"]
 STATUS_EMOJIS = {
     "Pendente": "🔴",
@@ -21,28 +68,181 @@ STATUS_EMOJIS = {
     "Entregue": "🟢",
 }
 
+# Espelho em memória dos pedidos (listener on_snapshot)
+ESPELHO_TIMEOUT_INICIAL = 10      # segundos aguardando o primeiro snapshot
+ESPELHO_INTERVALO_RECONEXAO = 30  # segundos entre tentativas de reabrir o listener
+
+# Filtros das listas viram where() no Firestore; os índices compostos necessários
+# estão em firestore.indexes.json (firebase deploy --only firestore:indexes)
+CAMPO_INTERVALO_DATAS = "criado_em"
+
+# Paginação da tela "Visualizar Pedidos"
+OPCOES_TAMANHO_PAGINA = [10, 20, 50]
+TAMANHO_PAGINA_PADRAO = 20
+# No modo tabela a página inteira é um único elemento, então cabem mais pedidos
+OPCOES_TAMANHO_PAGINA_TABELA = [50, 100, 200, 500]
+TAMANHO_PAGINA_TABELA_PADRAO = 100
+
+# Tabela de pedidos (st.dataframe)
+COLUNAS_TABELA_COMPLETA = ["Status", "ID", "Técnico", "Peça", "Modelo", "Nº Série", "OS", "Data", "Foto"]
+COLUNAS_TABELA_COMPACTA = ["Status", "ID", "Técnico", "Nº Série"]
+CAMPOS_FILTRO_TEXTO = ["id", "tecnico", "peca", "modelo", "numero_serie", "ordem_servico"]
+
+# Cartões de pedidos já formatados (título + corpo), por (id, atualizado_em)
+CARTOES_CACHE_ENTRADAS = 2000
+CARTOES_CACHE_BYTES = 16 * 1024 * 1024
+
+# Listas e tabelas trazem só o resumo (select() no Firestore); o pedido completo
+# (observações, fotos) é carregado ao abrir o detalhe e fica em cache por ID
+CAMPOS_RESUMO = [
+    "status", "tecnico", "peca", "modelo", "numero_serie", "ordem_servico",
+    "criado_em", "atualizado_em", "tem_foto",
+]
+DETALHE_CACHE_ENTRADAS = 500
+
+# Contadores agregados do "Resumo dos pedidos"
+COLECAO_CONTADORES = "contadores_pedidos"
+NUM_FRAGMENTOS_CONTADOR = 1  # aumente se houver contenção de escrita no contador
+
+# Busca por ID / número de série
+BUSCA_LIMITE_CANDIDATOS = 10
+
+# Atualização de status em lote
+LOTE_STATUS_TAMANHO = 200     # pedidos por WriteBatch (limite do Firestore: 500 escritas)
+LOTE_STATUS_TENTATIVAS = 3    # novas leituras se outro usuário alterar um pedido no meio
+
+# Migração de datas (criado_em / atualizado_em / status_em a partir de data_criacao)
+MIGRACAO_LOTE = 400
+
+# Arquivamento de pedidos entregues e limpeza de fotos (ferramentas.py limpeza ou tela Manutenção)
+ARQUIVAMENTO_DIAS = 180             # dias sem alteração para um pedido Entregue ir para o arquivo
+ARQUIVAMENTO_LOTE = 150             # pedidos por WriteBatch (3 escritas cada + contador, limite 500)
+FOTOS_ARQUIVADAS = "apagar"         # "apagar" ou classe do Storage para só rebaixar (ex.: "ARCHIVE")
+LIMPEZA_FOTOS_LOTE = 200            # arquivos verificados por lote na coleta de fotos órfãs
+LIMPEZA_FOTOS_CARENCIA = 24 * 3600  # segundos; arquivos mais novos podem ser de um upload em andamento
+LIMPEZA_LOTES_POR_CLIQUE = 5        # lotes por execução na tela (o checkpoint continua no próximo clique)
+CAMPOS_URL_FOTO = ["foto_url", "foto_miniatura_url", "foto_webp_url"]
+CAMPOS_LISTA_FOTOS = ["fotos", "fotos_urls"]
+
+# Exportação / importação
+EXPORTACAO_PAGINA = 500       # documentos por consulta ao exportar
+IMPORTACAO_LOTE = 500         # escritas por flush do BulkWriter
+CAMPOS_EXPORTACAO = [
+    "id", "tecnico", "peca", "modelo", "numero_serie", "ordem_servico",
+    "observacoes", "status", "data_criacao", "foto_url",
+    # Datas de verdade (histórico de status e a ordem de status + atualizado_em)
+    "criado_em", "atualizado_em", "status_em",
+    # Restaurar uma exportação regrava o documento inteiro: sem estes campos as
+    # fotos além da capa viram órfãs (e a limpeza as apaga)
+    "foto_miniatura_url", "foto_webp_url", "fotos", "fotos_urls", "chave_idempotencia",
+]
+
+# Cache de consultas compartilhado entre réplicas (opcional):
+# CACHE_URL=redis://host:6379/0 ou sqlite:////caminho/cache.sqlite3 (réplicas no mesmo host)
+CACHE_TTL = 300                     # segundos; toda escrita em pedidos já invalida antes disso
+
+# Módulos pré-carregados em segundo plano ao subir o processo (ver aquecer_processo)
+MODULOS_AQUECIMENTO_FIRESTORE = [
+    "google.oauth2.service_account", "google.cloud.firestore", "google.cloud.storage",
+]
+MODULOS_AQUECIMENTO = ["PIL.Image", "PIL.ImageOps", "smtplib", "email.message"]
+
+# Dados locais do processo. Filas e checkpoints que viram escritas no backend
+# ficam numa subpasta por backend (ver diretorio_dados_backend)
+DIRETORIO_DADOS_LOCAIS = os.environ.get("PARTFLOW_DADOS_LOCAIS", ".dados_locais")
+
+# IDs de pedido: 10 caracteres em base32 de Crockford (sem I, L, O, U), ordenados
+# pelo tempo: 5 para o minuto desde ID_EPOCA (até 2087) e 5 aleatórios (33 milhões
+# por minuto). O ID é mostrado (e enviado por email) assim que o pedido entra na
+# fila local, antes de chegar ao servidor, então nunca é trocado depois: com 25
+# bits aleatórios por minuto uma colisão no servidor é praticamente impossível e,
+# se acontecer, o pedido falha de forma visível em vez de mudar de ID.
+# O ritmo de criação do app fica muito abaixo do que faria IDs sequenciais
+# concentrarem escritas num mesmo trecho do índice do Firestore.
+ALFABETO_ID = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ID_EPOCA = datetime(2024, 1, 1, tzinfo=timezone.utc)
+ID_CARACTERES_TEMPO = 5
+ID_CARACTERES_ALEATORIOS = 5
+ID_TENTATIVAS = 5                   # novos IDs tentados quando o sorteado já existe (antes de mostrá-lo)
+
+# Fila local de pedidos novos (write-ahead): o pedido é confirmado assim que
+# gravado aqui e uma thread o sincroniza com o backend
+NOME_FILA_PEDIDOS = "fila_pedidos.sqlite3"
+NOME_SPOOL_FOTOS = "spool_fotos"
+FILA_PEDIDOS_INTERVALO = 2          # segundos entre verificações da fila
+FILA_PEDIDOS_LOTE = 10
+FILA_PEDIDOS_BACKOFF_BASE = 5       # segundos; dobra a cada falha (sem limite de tentativas)
+FILA_PEDIDOS_BACKOFF_MAX = 10 * 60
+FILA_PEDIDOS_LEASE = 5 * 60         # tempo para outra thread reassumir uma sincronização interrompida
+FILA_PEDIDOS_RETENCAO = 24 * 3600   # sincronizados ficam esse tempo (reenvio com a mesma chave)
+
+# Caixa de saída de emails
+NOME_CAIXA_SAIDA = "caixa_saida_email.sqlite3"
+CAIXA_SAIDA_INTERVALO = 5           # segundos entre verificações da fila
+CAIXA_SAIDA_LOTE = 20               # notificações por ciclo (e por email de resumo)
+CAIXA_SAIDA_MAX_TENTATIVAS = 8
+CAIXA_SAIDA_BACKOFF_BASE = 10       # segundos; dobra a cada falha
+CAIXA_SAIDA_BACKOFF_MAX = 30 * 60
+CAIXA_SAIDA_LEASE = 5 * 60          # tempo para outra thread reassumir um envio interrompido
+SMTP_OCIOSO_SEGUNDOS = 60           # fecha a sessão SMTP após esse tempo sem uso
+
+# Processamento de fotos
+FOTO_TAMANHO_MAX = (800, 800)
+FOTO_QUALIDADE_JPEG = 85
+FOTO_MINIATURA_MAX = (240, 240)
+FOTO_QUALIDADE_MINIATURA = 80
+FOTO_QUALIDADE_WEBP = 80
+PREFIXO_FOTOS = "fotos_pedidos/"
+FOTO_MAX_BYTES = 15 * 1024 * 1024   # tamanho máximo do arquivo enviado
+FOTO_MAX_PIXELS = 40_000_000        # proteção contra "decompression bomb"
+FOTO_CACHE_ENTRADAS = 32            # resultados memorizados por hash do conteúdo
+FOTO_WORKERS = 2                    # decodificações simultâneas por processo
+UPLOAD_WORKERS = 8                  # uploads simultâneos para o Storage por processo
+FOTOS_MAX_POR_PEDIDO = 10           # arquivos anexados de uma vez no formulário
+FOTO_GALERIA_LARGURA = 120          # miniaturas lado a lado nas listas (px)
+
+# Log do app (execuções, inicialização, fila): uma linha por evento no stderr.
+# O nível vem de PARTFLOW_LOG_NIVEL (DEBUG, INFO, WARNING...); INFO por padrão
+logger = logging.getLogger("partflow")
+
+def configurar_logger():
+    """Handler e nível do logger "partflow" (uma vez por processo: o script roda a cada rerun)"""
+    nivel = getattr(logging, str(obter_config("LOG_NIVEL", "INFO")).upper(), None)
+    logger.setLevel(nivel if isinstance(nivel, int) else logging.INFO)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        # Sem repetir as linhas em handlers da raiz (ex.: logging.basicConfig de quem importa o app)
+        logger.propagate = False
+
+configurar_logger()
+
+# =============================================================================
+# MÉTRICAS DE DESEMPENHO
+# =============================================================================
+@st.cache_resource
+def obter_metricas():
+    """Agregador de spans do processo (compartilhado por todas as sessões)"""
+    return MetricasDesempenho(logger)
+
+def medido(nome: str):
+    """Decorador: registra a duração da função como span no painel de desempenho"""
+    return obter_metricas().medir(nome)
+
+@st.cache_resource
+def obter_relatorio_inicializacao():
+    """Relatório do arranque a frio (criado na primeira execução do script no processo)"""
+    relatorio = RelatorioInicializacao(obter_metricas(), INICIO_EXECUCAO, logger)
+    relatorio.registrar_importacao("app", (FIM_IMPORTACOES - INICIO_EXECUCAO) * 1000)
+    return relatorio
+
 # =============================================================================
 # CONFIGURAÇÃO DE EMAIL (CORRIGIDA)
 # =============================================================================
-def enviar_email_notificacao(pedido_data):
-    """Envia email de notificação quando um novo pedido é criado"""
-    try:
-        # Verificar se as configurações de email existem
-        if 'EMAIL' not in st.secrets:
-            st.warning("⚠️ Configurações de email não encontradas. Pulando envio de notificação.")
-            return False
-            
-        # Configurações do email
-        smtp_server = st.secrets["EMAIL"]["SMTP_SERVER"]
-        smtp_port = st.secrets["EMAIL"]["SMTP_PORT"]
-        email_from = st.secrets["EMAIL"]["EMAIL_FROM"]
-        email_password = st.secrets["EMAIL"]["EMAIL_PASSWORD"]
-        email_to = st.secrets["EMAIL"]["EMAIL_TO"]
-        
-        # Corpo do email em texto simples (evita problemas com HTML)
-        subject = f"📦 NOVO PEDIDO CRIADO - ID: {pedido_data['id']}"
-        
-        body = f"""
+def montar_corpo_email(pedido_data):
+    """Corpo em texto simples da notificação de um pedido (evita problemas com HTML)"""
+    return f"""
         📦 NOVO PEDIDO CRIADO
         
         Informações do Pedido:
@@ -57,38 +257,275 @@ def enviar_email_notificacao(pedido_data):
         📅 Data: {pedido_data.get('data_criacao', 'Não informada')}
         
         {f"📝 Observações: {pedido_data.get('observacoes', 'Nenhuma observação')}" if pedido_data.get('observacoes') else "📝 Observações: Nenhuma observação"}
-        
+        """
+
+RODAPE_EMAIL = """
         ---
         Este é um email automático do Sistema de Controle de Pedidos.
         """
-        
-        # Usar smtplib nativo (mais compatível)
+
+def montar_email(pedidos):
+    """Monta (assunto, corpo) para um pedido ou para um resumo de vários pedidos"""
+    if len(pedidos) == 1:
+        subject = f"📦 NOVO PEDIDO CRIADO - ID: {pedidos[0]['id']}"
+    else:
+        subject = f"📦 {len(pedidos)} NOVOS PEDIDOS CRIADOS"
+    body = "".join(montar_corpo_email(p) for p in pedidos) + RODAPE_EMAIL
+    return subject, body
+
+class CaixaSaidaEmail:
+    """Fila persistente (SQLite) de notificações, esvaziada por uma thread em segundo plano.
+
+    A thread reaproveita uma única sessão SMTP autenticada, refaz envios com
+    backoff exponencial e, no modo resumo (EMAIL.DIGEST), junta os pedidos
+    criados dentro da janela em um só email.
+    """
+
+    def __init__(self, config: dict, caminho: str = None, metricas: MetricasDesempenho = None):
+        self.config = config
+        self.caminho = caminho = caminho or os.path.join(diretorio_dados_backend(), NOME_CAIXA_SAIDA)
+        self.metricas = metricas or MetricasDesempenho()
+        self.resumo = bool(config.get("DIGEST", False))
+        self.janela_resumo = float(config.get("DIGEST_JANELA_SEGUNDOS", 300))
+        self._acordar = threading.Event()
+        self._smtp = None
+        self._smtp_ultimo_uso = 0.0
+
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        with closing(self._conectar()) as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS notificacoes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    pedido_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    proxima_tentativa REAL NOT NULL,
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pendente',
+                    ultimo_erro TEXT
+                )"""
+            )
+
+        self._thread = threading.Thread(target=self._executar, name="caixa-saida-email", daemon=True)
+        self._thread.start()
+
+    def _conectar(self):
+        conn = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def enfileirar(self, pedido_data: dict):
+        """Grava a notificação na fila e acorda a thread de envio"""
+        agora = time.time()
+        with closing(self._conectar()) as conn:
+            conn.execute(
+                "INSERT INTO notificacoes (pedido_id, payload, criado_em, proxima_tentativa) "
+                "VALUES (?, ?, ?, ?)",
+                (pedido_data["id"], json.dumps(pedido_data, default=str), agora, agora),
+            )
+        self._acordar.set()
+
+    def pendentes(self):
+        """Quantidade de notificações ainda não enviadas (e que não desistimos)"""
+        with closing(self._conectar()) as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM notificacoes WHERE status != 'falhou'"
+            ).fetchone()[0]
+
+    # ---- thread de envio ---------------------------------------------------
+    def _executar(self):
+        while True:
+            try:
+                enviados = self._processar_lote()
+            except Exception:
+                logger.exception("Erro no processamento da caixa de saída de email")
+                enviados = 0
+            if not enviados:
+                self._fechar_smtp_ocioso()
+                self._acordar.wait(timeout=CAIXA_SAIDA_INTERVALO)
+                self._acordar.clear()
+
+    def _reservar_lote(self):
+        """Reserva (lease) as notificações prontas para envio"""
+        agora = time.time()
+        with closing(self._conectar()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            linhas = conn.execute(
+                "SELECT id, payload, tentativas, criado_em FROM notificacoes "
+                "WHERE status IN ('pendente', 'enviando') AND proxima_tentativa <= ? "
+                "ORDER BY id LIMIT ?",
+                (agora, CAIXA_SAIDA_LOTE),
+            ).fetchall()
+
+            # Modo resumo: esperar a janela do pedido mais antigo fechar (ou o lote encher)
+            if (
+                self.resumo
+                and linhas
+                and len(linhas) < CAIXA_SAIDA_LOTE
+                and agora - min(l[3] for l in linhas) < self.janela_resumo
+            ):
+                linhas = []
+
+            if linhas:
+                conn.executemany(
+                    "UPDATE notificacoes SET status = 'enviando', proxima_tentativa = ? WHERE id = ?",
+                    [(agora + CAIXA_SAIDA_LEASE, l[0]) for l in linhas],
+                )
+            conn.execute("COMMIT")
+        return linhas
+
+    def _processar_lote(self):
+        linhas = self._reservar_lote()
+        if not linhas:
+            return 0
+
+        if self.resumo:
+            grupos = [linhas]
+        else:
+            grupos = [[linha] for linha in linhas]
+
+        enviados = 0
+        for grupo in grupos:
+            ids = [l[0] for l in grupo]
+            try:
+                with self.metricas.span("email.enviar"):
+                    self._enviar([json.loads(l[1]) for l in grupo])
+            except Exception as e:
+                logger.warning("Falha ao enviar notificação %s: %s", ids, e)
+                self._fechar_smtp()
+                self._reagendar(grupo, str(e))
+            else:
+                with closing(self._conectar()) as conn:
+                    conn.executemany("DELETE FROM notificacoes WHERE id = ?", [(i,) for i in ids])
+                enviados += len(grupo)
+        return enviados
+
+    def _reagendar(self, grupo, erro: str):
+        """Backoff exponencial com jitter; após o limite de tentativas marca como 'falhou'"""
+        agora = time.time()
+        atualizacoes = []
+        for id_, _, tentativas, _ in grupo:
+            tentativas += 1
+            atraso = min(CAIXA_SAIDA_BACKOFF_BASE * 2 ** (tentativas - 1), CAIXA_SAIDA_BACKOFF_MAX)
+            atraso *= random.uniform(0.8, 1.2)
+            status = "falhou" if tentativas >= CAIXA_SAIDA_MAX_TENTATIVAS else "pendente"
+            atualizacoes.append((status, tentativas, agora + atraso, erro, id_))
+        with closing(self._conectar()) as conn:
+            conn.executemany(
+                "UPDATE notificacoes SET status = ?, tentativas = ?, proxima_tentativa = ?, "
+                "ultimo_erro = ? WHERE id = ?",
+                atualizacoes,
+            )
+
+    def _sessao_smtp(self):
+        """Reaproveita a sessão autenticada; reconecta se o servidor a derrubou"""
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except Exception:
+                pass
+            self._fechar_smtp()
+
         import smtplib
+
+        smtp = smtplib.SMTP(self.config["SMTP_SERVER"], self.config["SMTP_PORT"], timeout=30)
+        try:
+            # SMTP_STARTTLS = false só para servidores locais de teste (ferramentas.py testar-email)
+            if self.config.get("SMTP_STARTTLS", True):
+                smtp.starttls()  # Segurança
+            smtp.login(self.config["EMAIL_FROM"], self.config["EMAIL_PASSWORD"])
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        return smtp
+
+    def _enviar(self, pedidos):
         from email.message import EmailMessage
-        
-        # Criar mensagem
+
+        subject, body = montar_email(pedidos)
         msg = EmailMessage()
-        msg['From'] = email_from
-        msg['To'] = email_to
+        msg['From'] = self.config["EMAIL_FROM"]
+        msg['To'] = self.config["EMAIL_TO"]
         msg['Subject'] = subject
         msg.set_content(body)
-        
-        # Enviar email
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()  # Segurança
-            server.login(email_from, email_password)
-            server.send_message(msg)
-            
+
+        self._sessao_smtp().send_message(msg)
+        self._smtp_ultimo_uso = time.time()
+
+    def _fechar_smtp(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            try:
+                self._smtp.close()
+            except Exception:
+                pass
+        self._smtp = None
+
+    def _fechar_smtp_ocioso(self):
+        if self._smtp is not None and time.time() - self._smtp_ultimo_uso > SMTP_OCIOSO_SEGUNDOS:
+            self._fechar_smtp()
+
+@st.cache_resource
+def obter_caixa_saida():
+    """Cria a caixa de saída (e sua thread de envio) uma única vez por processo"""
+    return CaixaSaidaEmail(dict(st.secrets["EMAIL"]), metricas=obter_metricas())
+
+def email_configurado():
+    try:
+        return 'EMAIL' in st.secrets
+    except Exception:
+        # Sem .streamlit/secrets.toml
+        return False
+
+def enfileirar_notificacao(pedido_data):
+    """Coloca a notificação de novo pedido na caixa de saída (envio em segundo plano)"""
+    try:
+        # Verificar se as configurações de email existem
+        if not email_configurado():
+            st.warning("⚠️ Configurações de email não encontradas. Pulando envio de notificação.")
+            return False
+
+        obter_caixa_saida().enfileirar(pedido_data)
         return True
-        
+
     except Exception as e:
-        st.error(f"❌ Erro ao enviar email: {str(e)}")
+        st.error(f"❌ Erro ao enfileirar email: {str(e)}")
         return False
 
 # =============================================================================
-# CONFIGURAÇÃO DO FIREBASE
+# CONFIGURAÇÃO DO BACKEND (FIREBASE OU LOCAL)
 # =============================================================================
-@st.cache_resource
+def credenciais_firebase():
+    """Conta de serviço dos secrets (o JSON pode vir como texto ou tabela)"""
+    creds_json = st.secrets['GOOGLE_APPLICATION_CREDENTIALS_JSON']
+    return json.loads(creds_json) if isinstance(creds_json, str) else dict(creds_json)
+
+def caminho_sqlite():
+    return obter_config("SQLITE_CAMINHO", os.path.join(DIRETORIO_DADOS_LOCAIS, "pedidos.sqlite3"))
+
+def identificador_backend():
+    """Backend configurado, sem conectar: sqlite:<caminho absoluto> ou firestore:<projeto>"""
+    if obter_config("BACKEND", "firestore") == "sqlite":
+        return f"sqlite:{os.path.abspath(caminho_sqlite())}"
+    return f"firestore:{credenciais_firebase()['project_id']}"
+
+def diretorio_dados_backend():
+    """Subpasta de DIRETORIO_DADOS_LOCAIS só deste backend (fila de pedidos, emails, checkpoints)
+
+    Um processo apontado para outro banco (benchmark, ferramentas, testes) no
+    mesmo diretório de trabalho não enxerga nem sincroniza o que é de outro.
+    """
+    identificador = identificador_backend()
+    tipo = identificador.split(":", 1)[0]
+    return os.path.join(
+        DIRETORIO_DADOS_LOCAIS, f"{tipo}-{hashlib.sha256(identificador.encode('utf-8')).hexdigest()[:12]}"
+    )
+
 def inicializar_firebase():
     """Inicializa Firebase Firestore e Storage"""
     try:
@@ -96,14 +533,8 @@ def inicializar_firebase():
         from google.oauth2 import service_account
         
         # Obter credenciais dos secrets
-        creds_json = st.secrets['GOOGLE_APPLICATION_CREDENTIALS_JSON']
+        creds_dict = credenciais_firebase()
         bucket_name = st.secrets['FIREBASE_BUCKET']
-        
-        # Converter para dict se for string
-        if isinstance(creds_json, str):
-            creds_dict = json.loads(creds_json)
-        else:
-            creds_dict = creds_json
 
         # Criar credenciais
         credentials = service_account.Credentials.from_service_account_info(creds_dict)
@@ -118,8 +549,285 @@ def inicializar_firebase():
         st.error(f"❌ Erro ao inicializar Firebase: {e}")
         st.stop()
 
-# Inicializar Firebase
-firestore_client, storage_client, BUCKET_NAME = inicializar_firebase()
+@st.cache_resource
+def inicializar_backend():
+    """Cria os repositórios de pedidos e fotos conforme BACKEND ("firestore" ou "sqlite")"""
+    backend = obter_config("BACKEND", "firestore")
+    with obter_relatorio_inicializacao().etapa("backend"):
+        if backend == "sqlite":
+            pedidos = RepositorioPedidosSQLite(caminho_sqlite(), STATUS_PEDIDO)
+            fotos = RepositorioFotosLocal(obter_config("FOTOS_DIRETORIO", os.path.join(DIRETORIO_DADOS_LOCAIS, "fotos")))
+        else:
+            firestore_client, storage_client, bucket_name = inicializar_firebase()
+            pedidos = RepositorioPedidosFirestore(
+                firestore_client, STATUS_PEDIDO, COLECAO_CONTADORES, NUM_FRAGMENTOS_CONTADOR
+            )
+            fotos = RepositorioFotosStorage(storage_client, bucket_name)
+
+    # Toda chamada ao backend vira um span (tempo + documentos lidos) no painel de desempenho
+    metricas = obter_metricas()
+    return (
+        RepositorioInstrumentado(pedidos, metricas, "pedidos"),
+        RepositorioInstrumentado(fotos, metricas, "fotos"),
+    )
+
+class RepositorioPreguicoso:
+    """Repositório criado no primeiro uso: telas que não leem nada (ex.: o formulário
+    de novo pedido) não esperam credenciais, clientes e importações do backend"""
+
+    def __init__(self, indice: int):
+        self._indice = indice
+        self._repositorio = None
+
+    def __getattr__(self, nome):
+        if self._repositorio is None:
+            self._repositorio = inicializar_backend()[self._indice]
+        return getattr(self._repositorio, nome)
+
+repositorio_pedidos = RepositorioPreguicoso(0)
+repositorio_fotos = RepositorioPreguicoso(1)
+
+# =============================================================================
+# CACHE COMPARTILHADO ENTRE RÉPLICAS
+# =============================================================================
+@st.cache_resource
+def obter_cache_compartilhado():
+    """Cache de consultas comum a todas as réplicas; None se CACHE_URL não estiver configurado"""
+    url = obter_config("CACHE_URL")
+    if not url:
+        return None
+    try:
+        return CacheConsultas(
+            criar_backend_cache(url),
+            prefixo=obter_config("CACHE_PREFIXO", "partflow"),
+            ttl=int(obter_config("CACHE_TTL", CACHE_TTL)),
+            metricas=obter_metricas(),
+            logger=logger,
+        )
+    except Exception:
+        logger.exception("Cache compartilhado não configurado; consultando o backend direto")
+        return None
+
+def em_cache(partes, calcular):
+    """Resultado de calcular() via cache compartilhado (uma réplica calcula, as outras reaproveitam)"""
+    cache = obter_cache_compartilhado()
+    if cache is None:
+        return calcular()
+    return cache.obter_ou_calcular(partes, calcular)
+
+def invalidar_cache_pedidos():
+    """Chamar depois de toda escrita em pedidos: nova versão para todas as réplicas"""
+    cache = obter_cache_compartilhado()
+    if cache is not None:
+        cache.invalidar()
+
+DATA_MINIMA = datetime.min.replace(tzinfo=timezone.utc)
+
+def chave_ordenacao_pedido(pedido, campo: str = CAMPO_ORDENACAO):
+    """Chave (criado_em, id) usada na ordenação e nos cursores; pedidos ainda sem data vão para o fim"""
+    return (pedido.get(campo) or DATA_MINIMA, pedido.get("id") or "")
+
+def projetar_pedido(pedido, campos=None):
+    """Cópia do pedido com só os campos da projeção (todos se campos=None)"""
+    if campos is None:
+        return dict(pedido)
+    return {"id": pedido.get("id"), **{campo: pedido.get(campo) for campo in campos}}
+
+def pedido_atende_filtros(pedido, filtros=None, intervalo=None):
+    """Mesma semântica da consulta no backend (igualdade + faixa), para filtrar em memória"""
+    if any(pedido.get(campo) != valor for campo, valor in (filtros or {}).items()):
+        return False
+    if intervalo is not None:
+        campo, inicio, fim = intervalo
+        valor = pedido.get(campo)
+        if valor is None:
+            return False
+        if inicio is not None and valor < inicio:
+            return False
+        if fim is not None and valor >= fim:
+            return False
+    return True
+
+# =============================================================================
+# ESPELHO DOS PEDIDOS EM MEMÓRIA (COMPARTILHADO ENTRE SESSÕES)
+# =============================================================================
+class EspelhoPedidos:
+    """Cópia em memória da coleção `pedidos`, mantida por um único listener on_snapshot.
+
+    O listener aplica apenas os deltas (ADDED / MODIFIED / REMOVED), então cada
+    rerun lê da memória em vez de fazer stream da coleção inteira.
+    """
+
+    def __init__(self, repositorio):
+        self._repositorio = repositorio
+        self._lock = threading.Lock()
+        self._lock_conexao = threading.Lock()
+        self._pedidos = {}
+        self._indice_series = []  # lista ordenada de (numero_serie_normalizado, id)
+        self._watch = None
+        self._pronto = threading.Event()
+        self._ultima_tentativa = 0.0
+        self.ultima_atualizacao = None
+        self.erro = None
+
+    def iniciar(self):
+        """Abre (ou reabre) o listener da coleção."""
+        self._ultima_tentativa = time.time()
+        try:
+            if self._watch is not None:
+                self._watch.unsubscribe()
+        except Exception:
+            pass
+        try:
+            self._pronto.clear()
+            self._watch = self._repositorio.ouvir(self._aplicar_alteracoes)
+            self.erro = None
+        except Exception as e:
+            self._watch = None
+            self.erro = e
+
+    def _aplicar_alteracoes(self, alteracoes):
+        """Callback do listener - roda na thread do backend."""
+        with self._lock:
+            if not self._pronto.is_set():
+                # Primeiro snapshot após (re)conexão: reconstruir do zero
+                self._pedidos = {}
+                self._indice_series = []
+            for tipo, pedido_id, pedido in alteracoes:
+                anterior = self._pedidos.pop(pedido_id, None)
+                if anterior is not None:
+                    self._remover_do_indice(anterior)
+                if tipo != "REMOVED":
+                    self._pedidos[pedido_id] = pedido
+                    self._inserir_no_indice(pedido)
+            self.ultima_atualizacao = time.time()
+        self._pronto.set()
+
+    def _inserir_no_indice(self, pedido):
+        serie = normalizar_numero_serie(pedido.get("numero_serie"))
+        if serie:
+            bisect.insort(self._indice_series, (serie, pedido["id"]))
+
+    def _remover_do_indice(self, pedido):
+        serie = normalizar_numero_serie(pedido.get("numero_serie"))
+        if not serie:
+            return
+        chave = (serie, pedido["id"])
+        posicao = bisect.bisect_left(self._indice_series, chave)
+        if posicao < len(self._indice_series) and self._indice_series[posicao] == chave:
+            del self._indice_series[posicao]
+
+    @property
+    def ativo(self):
+        """True se o listener está conectado e já entregou o snapshot inicial."""
+        return (
+            self._watch is not None
+            and self._watch.is_active
+            and self._pronto.is_set()
+        )
+
+    def garantir_ativo(self):
+        """Tenta reabrir o listener se ele caiu (no máximo a cada ESPELHO_INTERVALO_RECONEXAO)."""
+        if self.ativo:
+            return True
+        with self._lock_conexao:
+            if self._watch is None or not self._watch.is_active:
+                if time.time() - self._ultima_tentativa < ESPELHO_INTERVALO_RECONEXAO:
+                    return False
+                self.iniciar()
+                if self._watch is None:
+                    return False
+        # Listener conectado, aguardando o snapshot inicial (sem bloquear reruns futuros)
+        restante = ESPELHO_TIMEOUT_INICIAL - (time.time() - self._ultima_tentativa)
+        if restante > 0:
+            self._pronto.wait(timeout=restante)
+        return self.ativo
+
+    def _selecionar(self, filtros=None, intervalo=None):
+        """Pedidos filtrados e ordenados, sem copiar (o listener troca os dicts, nunca os altera)."""
+        with self._lock:
+            pedidos = [p for p in self._pedidos.values() if pedido_atende_filtros(p, filtros, intervalo)]
+        campo = intervalo[0] if intervalo else CAMPO_ORDENACAO
+        pedidos.sort(key=lambda p: chave_ordenacao_pedido(p, campo), reverse=True)
+        return pedidos
+
+    def listar(self, filtros=None, intervalo=None, campos=None):
+        """Retorna cópias dos pedidos (filtrados), na mesma ordem da consulta no backend.
+
+        campos: copia só esses campos (mesma projeção da consulta com select()).
+        """
+        return [projetar_pedido(p, campos) for p in self._selecionar(filtros, intervalo)]
+
+    def pagina(self, cursor, tamanho, filtros=None, intervalo=None, campos=None):
+        """Retorna até `tamanho` pedidos após o cursor, na mesma ordem da consulta paginada."""
+        pedidos = self._selecionar(filtros, intervalo)
+        if cursor is not None:
+            campo = intervalo[0] if intervalo else CAMPO_ORDENACAO
+            pedidos = [p for p in pedidos if chave_ordenacao_pedido(p, campo) < cursor]
+        return [projetar_pedido(p, campos) for p in pedidos[:tamanho]]
+
+    def obter(self, pedido_id):
+        with self._lock:
+            pedido = self._pedidos.get(pedido_id)
+            return dict(pedido) if pedido is not None else None
+
+    def buscar_por_serie(self, prefixo, limite):
+        """Pedidos cujo nº de série normalizado começa com `prefixo` (busca binária no índice)"""
+        with self._lock:
+            inicio = bisect.bisect_left(self._indice_series, (prefixo, ""))
+            encontrados = []
+            for serie, pedido_id in self._indice_series[inicio:]:
+                if not serie.startswith(prefixo) or len(encontrados) >= limite:
+                    break
+                encontrados.append(dict(self._pedidos[pedido_id]))
+        return encontrados
+
+    def segundos_desde_atualizacao(self):
+        if self.ultima_atualizacao is None:
+            return None
+        return time.time() - self.ultima_atualizacao
+
+@st.cache_resource
+def obter_espelho_pedidos():
+    """Cria o espelho de pedidos uma única vez por processo"""
+    espelho = EspelhoPedidos(repositorio_pedidos)
+    with espelho._lock_conexao:
+        espelho.iniciar()
+    return espelho
+
+# =============================================================================
+# AQUECIMENTO DO PROCESSO (SEGUNDO PLANO)
+# =============================================================================
+def aquecer_processo():
+    """Carrega módulos pesados, cria os clientes do backend e abre o listener,
+    fora da thread da primeira sessão (que renderiza sem esperar por isso)"""
+    relatorio = obter_relatorio_inicializacao()
+    modulos = list(MODULOS_AQUECIMENTO)
+    if obter_config("BACKEND", "firestore") != "sqlite":
+        modulos = MODULOS_AQUECIMENTO_FIRESTORE + modulos
+    try:
+        for nome in modulos:
+            relatorio.importar(nome)
+        inicializar_backend()
+        obter_cache_compartilhado()
+        # Pedidos que ficaram na fila local (ex.: o processo caiu) voltam a sincronizar já
+        obter_fila_pedidos()
+        # Idem para os emails pendentes ou em backoff (sem esperar o próximo pedido)
+        if email_configurado():
+            obter_caixa_saida()
+        with relatorio.etapa("espelho"):
+            obter_espelho_pedidos()
+    except BaseException:
+        # Inclui o st.stop() de inicializar_firebase: a tela que precisar do
+        # backend tenta de novo e mostra o erro ao usuário
+        logger.exception("Falha no aquecimento do processo")
+
+@st.cache_resource
+def iniciar_aquecimento():
+    """Dispara o aquecimento uma única vez por processo (na primeira execução do script)"""
+    thread = threading.Thread(target=aquecer_processo, name="aquecimento", daemon=True)
+    thread.start()
+    return thread
 
 # =============================================================================
 # CONFIGURAÇÃO DA PÁGINA
@@ -171,38 +879,132 @@ def configurar_pagina():
 def datetime_now_str():
     return datetime.now().strftime("%d/%m/%Y %H:%M:%S")
 
+def gerar_id_pedido(momento: datetime = None, aleatorio: int = None):
+    """ID curto ordenado pelo tempo: minuto de criação + sufixo aleatório (ver ALFABETO_ID)
+
+    aleatorio fixa o sufixo (importação: o mesmo pedido recebe sempre o mesmo ID).
+    """
+    momento = momento or datetime.now(timezone.utc)
+    minutos = int((momento - ID_EPOCA).total_seconds() // 60)
+    bits = 5 * ID_CARACTERES_ALEATORIOS
+    aleatorio = secrets.randbits(bits) if aleatorio is None else aleatorio & ((1 << bits) - 1)
+    valor = (minutos << bits) | aleatorio
+    caracteres = []
+    for _ in range(ID_CARACTERES_TEMPO + ID_CARACTERES_ALEATORIOS):
+        valor, resto = divmod(valor, 32)
+        caracteres.append(ALFABETO_ID[resto])
+    return "".join(reversed(caracteres))
+
+# Digitação: maiúsculas/minúsculas tanto faz, I e L valem 1, O vale 0, hífen/espaço são ignorados
+TRADUCAO_ID_DIGITADO = str.maketrans({"I": "1", "L": "1", "O": "0", "-": None, " ": None})
+
+def ids_candidatos(termo: str):
+    """IDs a procurar para o texto digitado: como está, no formato antigo
+    (hex minúsculo, uuid4[:8]) e no formato novo (base32 maiúsculo)"""
+    termo = termo.strip()
+    return list(dict.fromkeys([termo, termo.lower(), termo.upper().translate(TRADUCAO_ID_DIGITADO)]))
+
+def criado_em_de_data_criacao(data_criacao):
+    """Timestamp (UTC) a partir da string dd/mm/YYYY HH:MM:SS em hora local; None se inválida"""
+    try:
+        return datetime.strptime(data_criacao or "", "%d/%m/%Y %H:%M:%S").astimezone(timezone.utc)
+    except ValueError:
+        return None
+
+def intervalo_datas(inicio=None, fim=None):
+    """Faixa de dias (locais, fim inclusivo) como intervalo de consulta em CAMPO_INTERVALO_DATAS"""
+    def _meia_noite(dia):
+        return datetime.combine(dia, datetime.min.time()).astimezone(timezone.utc)
+
+    return (
+        CAMPO_INTERVALO_DATAS,
+        _meia_noite(inicio) if inicio else None,
+        _meia_noite(fim + timedelta(days=1)) if fim else None,
+    )
+
+def reduzir_foto(dados: bytes):
+    """Decodifica já reduzida, corrige a orientação EXIF e gera as variantes finais.
+
+    Retorna (variantes, dimensoes). Não usa Streamlit, então pode rodar em thread.
+    """
+    if len(dados) > FOTO_MAX_BYTES:
+        raise ValueError(f"arquivo maior que {FOTO_MAX_BYTES // (1024 * 1024)}MB")
+
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(dados))
+
+    # Só o cabeçalho foi lido até aqui: recusar antes de decodificar
+    largura, altura = image.size
+    if largura * altura > FOTO_MAX_PIXELS:
+        raise ValueError(f"imagem muito grande ({largura}x{altura} pixels)")
+
+    # JPEG: decodificar direto em escala reduzida (1/2, 1/4, 1/8)
+    if image.format == "JPEG":
+        image.draft("RGB", (FOTO_TAMANHO_MAX[0] * 2, FOTO_TAMANHO_MAX[1] * 2))
+
+    image = ImageOps.exif_transpose(image)
+
+    # Reduzir tamanho (reducing_gap usa reduce() antes do LANCZOS)
+    image.thumbnail(FOTO_TAMANHO_MAX, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    # Normalizar modo da imagem (já no tamanho final)
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    return gerar_variantes_foto(image), image.size
+
+def codificar_imagem(image, formato: str, **opcoes):
+    buffered = io.BytesIO()
+    image.save(buffered, format=formato, **opcoes)
+    return buffered.getvalue()
+
+def gerar_variantes_foto(image):
+    """JPEG (original), miniatura JPEG e WebP a partir da imagem já reduzida"""
+    from PIL import Image
+
+    miniatura = image.copy()
+    miniatura.thumbnail(FOTO_MINIATURA_MAX, Image.Resampling.LANCZOS)
+    return {
+        "jpeg": codificar_imagem(image, "JPEG", quality=FOTO_QUALIDADE_JPEG),
+        "webp": codificar_imagem(image, "WEBP", quality=FOTO_QUALIDADE_WEBP, method=4),
+        "miniatura": codificar_imagem(miniatura, "JPEG", quality=FOTO_QUALIDADE_MINIATURA),
+    }
+
+@st.cache_resource
+def obter_executor_fotos():
+    """Pool de threads que limita quantas fotos são decodificadas ao mesmo tempo"""
+    return ThreadPoolExecutor(max_workers=FOTO_WORKERS, thread_name_prefix="fotos")
+
+@st.cache_data(max_entries=FOTO_CACHE_ENTRADAS, show_spinner=False)
+def processar_bytes_foto(hash_conteudo: str, _dados: bytes):
+    """Processamento memorizado pelo hash do conteúdo (reruns não reprocessam a foto)"""
+    return obter_executor_fotos().submit(reduzir_foto, _dados).result()
+
+@medido("foto.processar")
 def processar_upload_foto(uploaded_file, pedido_id):
     """Processa upload, converte e prepara para envio ao Firebase"""
     if uploaded_file is None:
         return None
 
     try:
-        image = Image.open(uploaded_file)
-
-        # Normalizar modo da imagem
-        if image.mode in ("RGBA", "LA", "P"):
-            background = Image.new("RGB", image.size, (255, 255, 255))
-            if image.mode == "P":
-                image = image.convert("RGBA")
-            background.paste(image, mask=image.split()[-1] if image.mode == "RGBA" else None)
-            image = background
-        elif image.mode != "RGB":
-            image = image.convert("RGB")
-
-        # Reduzir tamanho
-        max_size = (800, 800)
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG", quality=85)
-        img_bytes = buffered.getvalue()
+        dados = uploaded_file.getvalue() if hasattr(uploaded_file, "getvalue") else uploaded_file.read()
+        hash_conteudo = hashlib.sha256(dados).hexdigest()
+        variantes, dimensoes = processar_bytes_foto(hash_conteudo, dados)
+        img_bytes = variantes["jpeg"]
 
         foto_info = {
             "nome": getattr(uploaded_file, "name", "foto.jpg"),
             "tamanho": len(img_bytes),
             "tipo": "image/jpeg",
-            "dimensoes": image.size,
+            "dimensoes": dimensoes,
             "bytes": img_bytes,
+            "variantes": {"miniatura": variantes["miniatura"], "webp": variantes["webp"]},
             "pedido_id": pedido_id,
             "timestamp": datetime_now_str(),
         }
@@ -211,12 +1013,37 @@ def processar_upload_foto(uploaded_file, pedido_id):
         st.error(f"Erro ao processar imagem: {e}")
         return None
 
+def processar_uploads_fotos(arquivos, pedido_id):
+    """processar_upload_foto de todos os arquivos ao mesmo tempo; retorna os que deram certo, na ordem
+
+    As threads daqui só esperam: quem limita as decodificações simultâneas é
+    obter_executor_fotos (FOTO_WORKERS). Elas recebem o contexto da sessão
+    para que st.cache_data e st.error funcionem como na thread do script.
+    """
+    if not arquivos:
+        return []
+
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+    with ThreadPoolExecutor(
+        max_workers=len(arquivos), thread_name_prefix="fotos-formulario",
+        initializer=add_script_run_ctx, initargs=(None, get_script_run_ctx()),
+    ) as executor:
+        resultados = list(executor.map(lambda arquivo: processar_upload_foto(arquivo, pedido_id), arquivos))
+    return [foto_info for foto_info in resultados if foto_info]
+
+def erro_validacao_pedido(tecnico, peca):
+    """Regras do formulário; retorna a mensagem de erro ou None se estiver válido"""
+    if not tecnico or not str(tecnico).strip():
+        return "⚠️ O campo Técnico é obrigatório!"
+    if not peca or not str(peca).strip():
+        return "⚠️ O campo Peça é obrigatório!"
+    return None
+
 def validar_formulario(tecnico, peca):
-    if not tecnico or not tecnico.strip():
-        st.error("⚠️ O campo Técnico é obrigatório!")
-        return False
-    if not peca or not peca.strip():
-        st.error("⚠️ O campo Peça é obrigatório!")
+    erro = erro_validacao_pedido(tecnico, peca)
+    if erro:
+        st.error(erro)
         return False
     return True
 
@@ -233,8 +1060,43 @@ def obter_emoji_status(status):
     status_limpo = str(status).replace(":", "").strip()
     return STATUS_EMOJIS.get(status_limpo, "⚪")
 
+def data_local_pedido(pedido):
+    """Data de criação em hora local, sem fuso (criado_em; pedidos antigos: a string data_criacao)"""
+    criado_em = pedido.get("criado_em") or criado_em_de_data_criacao(pedido.get("data_criacao"))
+    return criado_em.astimezone().replace(tzinfo=None) if criado_em else None
+
+def formatar_data_pedido(pedido):
+    """Data de criação como texto dd/mm/YYYY HH:MM:SS para exibição"""
+    data = data_local_pedido(pedido)
+    return data.strftime("%d/%m/%Y %H:%M:%S") if data else "-"
+
+EXTRATORES_TABELA = {
+    "Status": lambda p: formatar_status(p.get("status") or "Pendente"),
+    "ID": lambda p: p["id"],
+    "Técnico": lambda p: p.get("tecnico") or "-",
+    "Peça": lambda p: p.get("peca") or "-",
+    "Modelo": lambda p: p.get("modelo") or "-",
+    "Nº Série": lambda p: p.get("numero_serie") or "-",
+    "OS": lambda p: p.get("ordem_servico") or "-",
+    "Data": data_local_pedido,
+    "Foto": lambda p: bool(p.get("tem_foto")),
+}
+
+def colunas_tabela_pedidos(pedidos, colunas=COLUNAS_TABELA_COMPLETA):
+    """Dados colunares (uma lista por coluna) para um único st.dataframe"""
+    return {nome: [EXTRATORES_TABELA[nome](p) for p in pedidos] for nome in colunas}
+
+def filtrar_pedidos(pedidos, status=None, texto: str = ""):
+    """Filtro da tabela: status (lista) e texto contido em qualquer campo de CAMPOS_FILTRO_TEXTO"""
+    termo = (texto or "").strip().lower()
+    return [
+        p for p in pedidos
+        if (not status or (p.get("status") or "Pendente") in status)
+        and (not termo or any(termo in str(p.get(campo) or "").lower() for campo in CAMPOS_FILTRO_TEXTO))
+    ]
+
 # =============================================================================
-# FUNÇÕES FIREBASE
+# FUNÇÕES DE DADOS (PEDIDOS E FOTOS)
 # =============================================================================
 def dataurl_para_bytes(data_url: str):
     """Converte data:image/...;base64,... para bytes."""
@@ -244,55 +1106,495 @@ def dataurl_para_bytes(data_url: str):
     except Exception:
         return None
 
-def upload_foto_firebase(bytes_data: bytes, nome_arquivo: str):
-    """Faz upload da foto para Firebase Storage e retorna URL pública"""
+def enviar_blob(bytes_data: bytes, blob_name: str, content_type: str = 'image/jpeg'):
+    """Upload já com leitura pública (uma única chamada); levanta exceção em caso de erro"""
+    return repositorio_fotos.enviar(blob_name, bytes_data, content_type)
+
+def nome_blob_foto(foto_bytes: bytes):
+    """Nome endereçado pelo conteúdo: a mesma foto processada cai sempre no mesmo blob"""
+    return f"{PREFIXO_FOTOS}{hashlib.sha256(foto_bytes).hexdigest()}.jpg"
+
+def enviar_blob_se_ausente(bytes_data: bytes, blob_name: str, content_type: str = 'image/jpeg'):
+    """Como enviar_blob, mas pula o upload se o blob (nome = hash) já existe"""
+    url, enviado = repositorio_fotos.enviar_se_ausente(blob_name, bytes_data, content_type)
+    if not enviado:
+        obter_metricas().registrar("foto.upload_reaproveitado", 0)
+        logger.info("Foto %s já existia: upload de %d bytes evitado", blob_name, len(bytes_data))
+    return url
+
+def upload_foto_firebase(bytes_data: bytes, nome_arquivo: str, content_type: str = 'image/jpeg', blob_name: str = None):
+    """Faz upload da foto para Firebase Storage e retorna URL pública
+
+    Sem blob_name o nome vem do hash do conteúdo e o upload é pulado se a foto já existe.
+    """
     try:
-        bucket = storage_client.bucket(BUCKET_NAME)
-        blob_name = f"fotos_pedidos/{uuid.uuid4().hex}_{nome_arquivo}"
-        blob = bucket.blob(blob_name)
-        
-        blob.upload_from_string(bytes_data, content_type='image/jpeg')
-        blob.make_public()
-        
-        return blob.public_url
+        if blob_name is None:
+            return enviar_blob_se_ausente(bytes_data, nome_blob_foto(bytes_data), content_type)
+        return enviar_blob(bytes_data, blob_name, content_type)
     except Exception as e:
         st.error(f"❌ Erro ao fazer upload da foto: {e}")
         return None
 
-def salvar_pedido(dados: dict, foto_bytes: bytes = None, nome_foto: str = None):
-    """Salva pedido no Firestore com foto no Storage - ID de 8 caracteres"""
+def nomes_blobs_variantes(blob_name: str):
+    """Caminhos da miniatura e do WebP ao lado do blob original"""
+    nome = blob_name[len(PREFIXO_FOTOS):] if blob_name.startswith(PREFIXO_FOTOS) else blob_name
+    base = os.path.splitext(nome)[0]
+    return {
+        "miniatura": f"{PREFIXO_FOTOS}miniaturas/{base}.jpg",
+        "webp": f"{PREFIXO_FOTOS}webp/{base}.webp",
+    }
+
+def upload_variantes_foto(blob_name: str, variantes: dict):
+    """Envia miniatura e WebP; retorna os campos de URL para gravar no pedido"""
+    nomes = nomes_blobs_variantes(blob_name)
+    campos = {}
+    if variantes.get("miniatura"):
+        campos["foto_miniatura_url"] = upload_foto_firebase(
+            variantes["miniatura"], None, 'image/jpeg', nomes["miniatura"]
+        )
+    if variantes.get("webp"):
+        campos["foto_webp_url"] = upload_foto_firebase(
+            variantes["webp"], None, 'image/webp', nomes["webp"]
+        )
+    return campos
+
+@st.cache_resource
+def obter_executor_uploads():
+    """Pool de threads para uploads ao Storage (limita requisições simultâneas)"""
+    return ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="uploads")
+
+def fotos_do_pedido(foto_bytes: bytes, variantes: dict = None):
+    """{campo do pedido: (bytes, nome do blob, content_type)} do original e das variantes
+
+    Os nomes vêm do hash do original, então uma foto repetida não é enviada de novo.
+    """
+    blob_name = nome_blob_foto(foto_bytes)
+    fotos = {"foto_url": (foto_bytes, blob_name, 'image/jpeg')}
+    nomes = nomes_blobs_variantes(blob_name)
+    if variantes and variantes.get("miniatura"):
+        fotos["foto_miniatura_url"] = (variantes["miniatura"], nomes["miniatura"], 'image/jpeg')
+    if variantes and variantes.get("webp"):
+        fotos["foto_webp_url"] = (variantes["webp"], nomes["webp"], 'image/webp')
+    return fotos
+
+def enviar_fotos_em_paralelo(fotos: dict):
+    """Envia todos os arquivos ao mesmo tempo (até UPLOAD_WORKERS em andamento); retorna {chave: url}
+
+    Levanta se algum falhar. Com várias fotos o tempo total fica perto do
+    upload mais lento, não da soma.
+    """
+    executor = obter_executor_uploads()
+    futuros = {
+        campo: executor.submit(enviar_blob_se_ausente, dados, blob_name, content_type)
+        for campo, (dados, blob_name, content_type) in fotos.items()
+    }
+    return {campo: futuro.result() for campo, futuro in futuros.items()}
+
+def campos_fotos_enviadas(urls: dict):
+    """Campos do pedido a partir de {"<índice>.<campo>": url} (todas as fotos já enviadas).
+
+    fotos guarda cada foto com as variantes, na ordem do formulário; a primeira
+    também fica em foto_url/foto_miniatura_url/foto_webp_url (capa), que é o
+    que telas e ferramentas anteriores às várias fotos leem.
+    """
+    por_indice = {}
+    for chave, url in urls.items():
+        indice, _, campo = chave.rpartition(".")
+        por_indice.setdefault(int(indice or 0), {})[campo] = url
+    fotos = [
+        {
+            "url": por_indice[indice].get("foto_url"),
+            "miniatura_url": por_indice[indice].get("foto_miniatura_url"),
+            "webp_url": por_indice[indice].get("foto_webp_url"),
+        }
+        for indice in sorted(por_indice)
+    ]
+    return {
+        "foto_url": fotos[0]["url"],
+        "foto_miniatura_url": fotos[0]["miniatura_url"],
+        "foto_webp_url": fotos[0]["webp_url"],
+        "fotos": fotos,
+        "fotos_urls": [foto["url"] for foto in fotos],
+    }
+
+def lista_fotos_pedido(pedido):
+    """Fotos do pedido ({url, miniatura_url, webp_url}); pedidos antigos só têm a capa"""
+    if pedido.get("fotos"):
+        return pedido["fotos"]
+    if pedido.get("foto_url"):
+        return [{
+            "url": pedido["foto_url"],
+            "miniatura_url": pedido.get("foto_miniatura_url"),
+            "webp_url": pedido.get("foto_webp_url"),
+        }]
+    return []
+
+# =============================================================================
+# FILA LOCAL DE PEDIDOS NOVOS (WRITE-AHEAD)
+# =============================================================================
+def gravar_arquivo_duravel(caminho: str, dados: bytes):
+    """Grava e força para o disco antes de publicar o nome (os.replace é atômico)"""
+    temporario = f"{caminho}.{threading.get_ident()}.tmp"
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(dados)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, caminho)
+
+def pedido_para_json(pedido: dict):
+    return json.dumps(pedido, ensure_ascii=False, default=lambda v: v.isoformat())
+
+def pedido_de_json(payload: str):
+    """Pedido guardado na fila (datas em ISO) de volta com datetimes"""
+    pedido = json.loads(payload)
+    for campo in CAMPOS_DATA:
+        if isinstance(pedido.get(campo), str):
+            pedido[campo] = datetime.fromisoformat(pedido[campo])
+    if isinstance(pedido.get("status_em"), dict):
+        pedido["status_em"] = {
+            status: datetime.fromisoformat(momento) for status, momento in pedido["status_em"].items()
+        }
+    return pedido
+
+class FilaPedidos:
+    """Fila write-ahead (SQLite em WAL + spool de fotos) dos pedidos novos.
+
+    salvar_pedido grava aqui e confirma na hora; uma thread em segundo plano leva
+    cada pedido ao backend em duas etapas, ambas seguras para repetir:
+
+    1. "pedido": criar() do documento (com foto_pendente se houver foto). Se o ID
+       já existe com a mesma chave_idempotencia, a tentativa anterior chegou ao
+       backend e só a resposta se perdeu.
+       Se o ID pertence a outro pedido, a entrada é marcada como 'falhou':
+       create() nunca sobrescreve e o ID, já mostrado ao usuário, não muda.
+    2. "fotos": upload do spool (nomes = hash do conteúdo), todas as fotos e
+       variantes num só lote paralelo, e atualização do pedido com as URLs.
+
+    Falhas são refeitas com backoff exponencial, sem limite de tentativas; só
+    uma colisão de ID no servidor marca a entrada como 'falhou'.
+    """
+
+    def __init__(self, backend: str, caminho: str, diretorio_spool: str, metricas: MetricasDesempenho = None):
+        self.backend = backend
+        self.caminho = caminho
+        self.diretorio_spool = diretorio_spool
+        self.metricas = metricas or MetricasDesempenho()
+        self._acordar = threading.Event()
+
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        os.makedirs(diretorio_spool, exist_ok=True)
+        with closing(self._conectar()) as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS pedidos_pendentes (
+                    pedido_id TEXT PRIMARY KEY,
+                    chave_idempotencia TEXT NOT NULL UNIQUE,
+                    payload TEXT NOT NULL,
+                    fotos TEXT NOT NULL,
+                    etapa TEXT NOT NULL DEFAULT 'pedido',
+                    criado_em REAL NOT NULL,
+                    proxima_tentativa REAL NOT NULL,
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pendente',
+                    ultimo_erro TEXT,
+                    backend TEXT
+                )"""
+            )
+            if "backend" not in {linha[1] for linha in conn.execute("PRAGMA table_info(pedidos_pendentes)")}:
+                conn.execute("ALTER TABLE pedidos_pendentes ADD COLUMN backend TEXT")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_pedidos_pendentes_status "
+                "ON pedidos_pendentes (status, proxima_tentativa)"
+            )
+            alheios = conn.execute(
+                "SELECT COUNT(*) FROM pedidos_pendentes WHERE status != 'sincronizado' "
+                "AND backend IS NOT ?", (backend,),
+            ).fetchone()[0]
+        if alheios:
+            logger.warning(
+                "%s: %d pedidos enfileirados para outro backend (ou sem backend) não serão sincronizados",
+                caminho, alheios,
+            )
+
+        self._thread = threading.Thread(target=self._executar, name="fila-pedidos", daemon=True)
+        self._thread.start()
+
+    def _conectar(self):
+        conn = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def _pedido_da_chave(self, chave_idempotencia: str):
+        with closing(self._conectar()) as conn:
+            linha = conn.execute(
+                "SELECT pedido_id FROM pedidos_pendentes WHERE chave_idempotencia = ?", (chave_idempotencia,)
+            ).fetchone()
+        return linha[0] if linha else None
+
+    def enfileirar(self, pedido: dict, fotos: dict = None):
+        """Grava o pedido (e as fotos no spool) de forma durável; retorna (pedido_id, novo).
+
+        fotos: {"<índice>.<campo>": (bytes, nome do blob, content_type)}. Um reenvio com a mesma
+        chave_idempotencia (duplo clique, rerun interrompido) devolve o pedido já
+        enfileirado em vez de criar outro.
+        """
+        chave = pedido["chave_idempotencia"]
+        existente = self._pedido_da_chave(chave)
+        if existente is not None:
+            return existente, False
+
+        # Fotos primeiro: a linha da fila nunca aponta para um arquivo que não está no disco
+        arquivos = {}
+        prefixo_spool = uuid.uuid4().hex
+        for campo, (dados, blob_name, content_type) in (fotos or {}).items():
+            caminho = os.path.join(self.diretorio_spool, f"{prefixo_spool}.{campo}")
+            gravar_arquivo_duravel(caminho, dados)
+            arquivos[campo] = [caminho, blob_name, content_type]
+
+        for _ in range(ID_TENTATIVAS):
+            agora = time.time()
+            try:
+                with closing(self._conectar()) as conn:
+                    conn.execute(
+                        "INSERT INTO pedidos_pendentes (pedido_id, chave_idempotencia, payload, fotos, "
+                        "criado_em, proxima_tentativa, backend) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            pedido["id"], chave, pedido_para_json(pedido), json.dumps(arquivos),
+                            agora, agora, self.backend,
+                        ),
+                    )
+            except sqlite3.IntegrityError:
+                existente = self._pedido_da_chave(chave)
+                if existente is not None:
+                    # Outro rerun com a mesma chave gravou primeiro
+                    self._apagar_spool(arquivos)
+                    return existente, False
+                # ID já usado por outro pedido da fila: sortear outro
+                pedido = {**pedido, "id": gerar_id_pedido(pedido.get("criado_em"))}
+                continue
+            self._acordar.set()
+            return pedido["id"], True
+
+        self._apagar_spool(arquivos)
+        raise PedidoJaExiste(pedido["id"])
+
+    def pendentes(self):
+        """Pedidos ainda não sincronizados, mais recentes primeiro (para as listas)"""
+        with closing(self._conectar()) as conn:
+            linhas = conn.execute(
+                "SELECT payload, etapa, status, tentativas, ultimo_erro FROM pedidos_pendentes "
+                "WHERE status != 'sincronizado' AND backend = ? ORDER BY criado_em DESC",
+                (self.backend,),
+            ).fetchall()
+        return [
+            {
+                **pedido_de_json(payload),
+                "sincronizacao": {"etapa": etapa, "status": status, "tentativas": tentativas, "erro": erro},
+            }
+            for payload, etapa, status, tentativas, erro in linhas
+        ]
+
+    def descartar_falhas(self, pedido_ids):
+        """Tira da fila (e do spool) os pedidos que falharam, depois que o usuário viu o aviso; retorna quantos"""
+        if not pedido_ids:
+            return 0
+        filtro = (
+            f"WHERE status = 'falhou' AND backend = ? AND pedido_id IN ({', '.join('?' * len(pedido_ids))})"
+        )
+        with closing(self._conectar()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            linhas = conn.execute(
+                f"SELECT fotos FROM pedidos_pendentes {filtro}", (self.backend, *pedido_ids)
+            ).fetchall()
+            conn.execute(f"DELETE FROM pedidos_pendentes {filtro}", (self.backend, *pedido_ids))
+            conn.execute("COMMIT")
+        for (fotos,) in linhas:
+            self._apagar_spool(json.loads(fotos or "{}"))
+        return len(linhas)
+
+    def _apagar_spool(self, arquivos: dict):
+        for caminho, _, _ in arquivos.values():
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+
+    # ---- thread de sincronização -------------------------------------------
+    def _executar(self):
+        while True:
+            try:
+                processados = self._processar_lote()
+            except Exception:
+                logger.exception("Erro no processamento da fila de pedidos")
+                processados = 0
+            if not processados:
+                self._acordar.wait(timeout=FILA_PEDIDOS_INTERVALO)
+                self._acordar.clear()
+
+    def _reservar_lote(self):
+        """Reserva (lease) os pedidos prontos para sincronizar e descarta os já antigos"""
+        agora = time.time()
+        with closing(self._conectar()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "DELETE FROM pedidos_pendentes WHERE status = 'sincronizado' AND criado_em < ?",
+                (agora - FILA_PEDIDOS_RETENCAO,),
+            )
+            linhas = conn.execute(
+                "SELECT pedido_id, chave_idempotencia, payload, fotos, etapa, tentativas "
+                "FROM pedidos_pendentes WHERE status IN ('pendente', 'enviando') AND proxima_tentativa <= ? "
+                "AND backend = ? ORDER BY criado_em LIMIT ?",
+                (agora, self.backend, FILA_PEDIDOS_LOTE),
+            ).fetchall()
+            if linhas:
+                conn.executemany(
+                    "UPDATE pedidos_pendentes SET status = 'enviando', proxima_tentativa = ? WHERE pedido_id = ?",
+                    [(agora + FILA_PEDIDOS_LEASE, l[0]) for l in linhas],
+                )
+            conn.execute("COMMIT")
+        return linhas
+
+    def _processar_lote(self):
+        linhas = self._reservar_lote()
+        for pedido_id, chave, payload, fotos, etapa, tentativas in linhas:
+            try:
+                with self.metricas.span("fila_pedidos.sincronizar"):
+                    self._sincronizar(pedido_id, chave, payload, json.loads(fotos), etapa)
+            except PedidoJaExiste:
+                logger.error("Pedido %s não sincronizado: o ID já pertence a outro pedido no servidor", pedido_id)
+                self._atualizar(pedido_id, status="falhou", ultimo_erro="ID já usado por outro pedido no servidor")
+            except Exception as e:
+                logger.warning("Falha ao sincronizar o pedido %s: %s", pedido_id, e)
+                self._reagendar(pedido_id, tentativas, str(e))
+        return len(linhas)
+
+    def _criar_no_backend(self, chave: str, payload: str):
+        """create() do pedido; PedidoJaExiste se o ID pertence a outro pedido"""
+        pedido = pedido_de_json(payload)
+        try:
+            repositorio_pedidos.criar(pedido)
+        except PedidoJaExiste:
+            existente = repositorio_pedidos.obter(pedido["id"])
+            if existente is None or existente.get("chave_idempotencia") != chave:
+                raise
+            # Tentativa anterior gravou; só a resposta não chegou
+
+    def _sincronizar(self, pedido_id: str, chave: str, payload: str, fotos: dict, etapa: str):
+        if etapa == "pedido":
+            self._criar_no_backend(chave, payload)
+            invalidar_cache_pedidos()
+            if fotos:
+                # Checkpoint: uma falha no upload não repete a criação
+                self._atualizar(pedido_id, etapa="fotos")
+
+        if fotos:
+            lidas = {}
+            for campo, (caminho, blob_name, content_type) in fotos.items():
+                with open(caminho, "rb") as arquivo:
+                    lidas[campo] = (arquivo.read(), blob_name, content_type)
+            campos = campos_fotos_enviadas(enviar_fotos_em_paralelo(lidas))
+            repositorio_pedidos.atualizar(pedido_id, {**campos, "tem_foto": True, "foto_pendente": False})
+            invalidar_cache_pedidos()
+
+        self._atualizar(pedido_id, status="sincronizado", ultimo_erro=None)
+        self._apagar_spool(fotos)
+
+    def _atualizar(self, pedido_id: str, **campos):
+        with closing(self._conectar()) as conn:
+            conn.execute(
+                f"UPDATE pedidos_pendentes SET {', '.join(f'{campo} = ?' for campo in campos)} WHERE pedido_id = ?",
+                (*campos.values(), pedido_id),
+            )
+
+    def _reagendar(self, pedido_id: str, tentativas: int, erro: str):
+        """Backoff exponencial com jitter; o pedido continua na fila até sincronizar"""
+        tentativas += 1
+        atraso = min(FILA_PEDIDOS_BACKOFF_BASE * 2 ** (tentativas - 1), FILA_PEDIDOS_BACKOFF_MAX)
+        atraso *= random.uniform(0.8, 1.2)
+        self._atualizar(
+            pedido_id, status="pendente", tentativas=tentativas,
+            proxima_tentativa=time.time() + atraso, ultimo_erro=erro,
+        )
+
+@st.cache_resource
+def obter_fila_pedidos():
+    """Cria a fila de pedidos (e sua thread de sincronização) uma única vez por processo"""
+    antiga = os.path.join(DIRETORIO_DADOS_LOCAIS, NOME_FILA_PEDIDOS)
+    if os.path.exists(antiga):
+        logger.warning("%s é de uma versão sem fila por backend: os pedidos pendentes nela não são sincronizados", antiga)
+    diretorio = diretorio_dados_backend()
+    return FilaPedidos(
+        identificador_backend(),
+        os.path.join(diretorio, NOME_FILA_PEDIDOS),
+        os.path.join(diretorio, NOME_SPOOL_FOTOS),
+        metricas=obter_metricas(),
+    )
+
+@medido("pedido.salvar")
+def salvar_pedido(dados: dict, fotos_info: list = None, chave_idempotencia: str = None):
+    """Registra o pedido na fila local (com fotos e variantes no spool) - ID de 10 caracteres
+
+    A confirmação sai assim que o pedido está gravado no disco; a sincronização
+    com o backend (documento, contadores e fotos) acontece em segundo plano.
+    chave_idempotencia identifica o envio do formulário: repetir a mesma chave
+    devolve o pedido já registrado. fotos_info: resultados de processar_upload_foto,
+    na ordem do formulário (a primeira é a capa).
+    """
     try:
-        # 🔥 ID COM APENAS 8 CARACTERES
-        pedido_id = str(uuid.uuid4())[:8]
-        foto_url = None
-        
-        # Upload da foto se existir
-        if foto_bytes and nome_foto:
-            foto_url = upload_foto_firebase(foto_bytes, nome_foto)
+        inicio = time.perf_counter()
+
+        agora = datetime.now(timezone.utc)
+        # 🔥 ID CURTO (10 caracteres, ordenado pelo tempo; colisões na fila local são sorteadas de novo)
+        pedido_id = gerar_id_pedido(agora)
+        fotos = {}
+        fotos_urls = []
+
+        for foto_info in fotos_info or []:
+            arquivos = fotos_do_pedido(foto_info["bytes"], foto_info.get("variantes"))
+            # As URLs já são conhecidas: o pedido referencia as fotos desde a criação (limpeza de órfãs)
+            url = repositorio_fotos.url(arquivos["foto_url"][1])
+            if url in fotos_urls:
+                continue  # mesmo arquivo anexado duas vezes
+            indice = len(fotos_urls)
+            fotos.update({f"{indice}.{campo}": arquivo for campo, arquivo in arquivos.items()})
+            fotos_urls.append(url)
         
         # Preparar dados completos
         pedido_completo = {
             **dados,
-            "id": pedido_id,  # ID de 8 caracteres
-            "data_criacao": datetime_now_str(),
-            "foto_url": foto_url,
-            "tem_foto": foto_url is not None
+            "id": pedido_id,  # ID de 10 caracteres
+            "data_criacao": datetime_now_str(),  # só para exibição (email, exportação)
+            "criado_em": agora,
+            "atualizado_em": agora,
+            "status_em": {dados.get("status") or "Pendente": agora},
+            "numero_serie_normalizado": normalizar_numero_serie(dados.get("numero_serie")),
+            "foto_url": fotos_urls[0] if fotos_urls else None,
+            "fotos_urls": fotos_urls,
+            "tem_foto": False,
+            "foto_pendente": bool(fotos),
+            "chave_idempotencia": chave_idempotencia or uuid.uuid4().hex,
         }
         
-        # Salvar no Firestore
-        doc_ref = firestore_client.collection("pedidos").document(pedido_id)
-        doc_ref.set(pedido_completo)
+        # Gravação durável local; a thread da fila leva ao backend
+        pedido_id, novo = obter_fila_pedidos().enfileirar(pedido_completo, fotos)
+        if not novo:
+            st.info(f"ℹ️ Este envio já tinha sido registrado como o pedido {pedido_id}.")
+            return pedido_id
+
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+        logger.info("Pedido %s confirmado em %.0f ms", pedido_id, latencia_ms)
         
         st.success(f"✅ Pedido {pedido_id} salvo com sucesso!")
+        st.caption(f"⏱️ Confirmado em {latencia_ms:.0f} ms · sincronizando com o servidor em segundo plano")
         
-        # 🔥 ENVIAR EMAIL DE NOTIFICAÇÃO (OPCIONAL)
+        # 🔥 NOTIFICAÇÃO POR EMAIL (OPCIONAL) - enviada em segundo plano
         try:
             if 'EMAIL' in st.secrets:
-                with st.spinner("📧 Enviando notificação por email..."):
-                    if enviar_email_notificacao(pedido_completo):
-                        st.success("📧 Notificação enviada com sucesso!")
-                    else:
-                        st.warning("⚠️ Pedido salvo, mas não foi possível enviar o email.")
+                # O ID devolvido pela fila (sorteado de novo se colidiu lá) é o que o usuário viu
+                if enfileirar_notificacao({**pedido_completo, "id": pedido_id}):
+                    st.success("📧 Notificação por email enfileirada para envio!")
+                else:
+                    st.warning("⚠️ Pedido salvo, mas não foi possível enfileirar o email.")
             else:
                 st.info("ℹ️ Notificação por email não configurada")
         except Exception as email_error:
@@ -304,36 +1606,152 @@ def salvar_pedido(dados: dict, foto_bytes: bytes = None, nome_foto: str = None):
         st.error(f"❌ Erro ao salvar pedido: {e}")
         return None
 
-def listar_pedidos():
-    """Busca todos os pedidos do Firestore ordenados por data"""
+def listar_pedidos(filtros=None, intervalo=None, campos=CAMPOS_RESUMO):
+    """Lista os pedidos (resumo) a partir do espelho em memória (fallback: consulta direta filtrada)"""
+    espelho = obter_espelho_pedidos()
+    if espelho.garantir_ativo():
+        return espelho.listar(filtros, intervalo, campos)
+    return consultar_pedidos(filtros, intervalo, campos)
+
+def consultar_pedidos(filtros=None, intervalo=None, campos=CAMPOS_RESUMO):
+    """Busca os pedidos no backend ordenados por data; os filtros viram where() na consulta"""
     try:
-        from google.cloud.firestore import Query
-        
-        # Buscar todos os pedidos ordenados por data (mais recente primeiro)
-        docs = firestore_client.collection("pedidos").order_by(
-            "data_criacao", direction=Query.DESCENDING
-        ).stream()
-        
-        pedidos = []
-        for doc in docs:
-            pedido_data = doc.to_dict()
-            pedido_data["id"] = doc.id
-            pedidos.append(pedido_data)
-        
-        return pedidos
+        # Buscar os pedidos ordenados por data (mais recente primeiro)
+        return em_cache(
+            ("listar", filtros, intervalo, campos),
+            lambda: repositorio_pedidos.listar(filtros=filtros, intervalo=intervalo, campos=campos),
+        )
             
     except Exception as e:
         st.error(f"❌ Erro ao buscar pedidos: {e}")
         return []
 
+def listar_pedidos_pagina(cursor=None, tamanho: int = TAMANHO_PAGINA_PADRAO, filtros=None, intervalo=None,
+                          campos=CAMPOS_RESUMO):
+    """Busca uma página de pedidos após o cursor (criado_em, id).
+
+    Com intervalo de datas o cursor é (valor do campo do intervalo, id).
+    campos=None traz os pedidos completos.
+    Retorna (pedidos, proximo_cursor); proximo_cursor é None na última página.
+    """
+    espelho = obter_espelho_pedidos()
+    if espelho.ativo:
+        pedidos = espelho.pagina(cursor, tamanho + 1, filtros, intervalo, campos)
+    else:
+        pedidos = consultar_pagina(cursor, tamanho + 1, filtros, intervalo, campos)
+
+    if len(pedidos) > tamanho:
+        pedidos = pedidos[:tamanho]
+        campo = intervalo[0] if intervalo else CAMPO_ORDENACAO
+        return pedidos, chave_ordenacao_pedido(pedidos[-1], campo)
+    return pedidos, None
+
+def consultar_pagina(cursor, limite: int, filtros=None, intervalo=None, campos=CAMPOS_RESUMO):
+    """Consulta paginada no backend (where + limit/start_after no Firestore)"""
+    try:
+        return em_cache(
+            ("pagina", cursor, limite, filtros, intervalo, campos),
+            lambda: repositorio_pedidos.listar(
+                filtros=filtros, cursor=cursor, limite=limite, intervalo=intervalo, campos=campos
+            ),
+        )
+    except Exception as e:
+        st.error(f"❌ Erro ao buscar página de pedidos: {e}")
+        return []
+
+def iterar_pedidos(tamanho_pagina: int = EXPORTACAO_PAGINA):
+    """Percorre a coleção inteira página a página (nunca mais de uma página em memória).
+
+    Vai em ordem de ID para incluir também pedidos ainda sem criado_em.
+    """
+    apos_id = None
+    while True:
+        pagina = repositorio_pedidos.listar_por_id(apos_id, tamanho_pagina)
+        yield from pagina
+        if len(pagina) < tamanho_pagina:
+            return
+        apos_id = pagina[-1]["id"]
+
+def obter_pedido(pedido_id: str):
+    """Busca um pedido pelo ID (espelho em memória ou get direto no backend)"""
+    if not pedido_id:
+        return None
+    espelho = obter_espelho_pedidos()
+    if espelho.ativo:
+        return espelho.obter(pedido_id)
+    try:
+        return repositorio_pedidos.obter(pedido_id)
+    except Exception as e:
+        st.error(f"❌ Erro ao buscar pedido: {e}")
+        return None
+
+@st.cache_data(max_entries=DETALHE_CACHE_ENTRADAS, show_spinner=False)
+def carregar_pedido_completo(pedido_id: str, status: str, atualizado_em):
+    """Pedido completo, em cache por ID.
+
+    status e atualizado_em (vindos do resumo) fazem parte da chave: quando o
+    pedido muda, a próxima lista traz outros valores e o cache é refeito.
+    """
+    return obter_pedido(pedido_id)
+
+def detalhe_pedido(resumo):
+    """Pedido completo a partir de uma linha do resumo (o próprio resumo se não encontrar)"""
+    espelho = obter_espelho_pedidos()
+    if espelho.ativo:
+        return espelho.obter(resumo["id"]) or resumo
+    return carregar_pedido_completo(resumo["id"], resumo.get("status"), resumo.get("atualizado_em")) or resumo
+
+def consultar_serie(prefixo: str, limite: int):
+    """Consulta por prefixo no campo numero_serie_normalizado (range query)"""
+    try:
+        return repositorio_pedidos.buscar_prefixo_serie(prefixo, limite)
+    except Exception as e:
+        st.error(f"❌ Erro ao buscar por número de série: {e}")
+        return []
+
+def pedidos_por_serie(serie: str, limite: int):
+    """Pedidos cujo nº de série normalizado começa com `serie` (espelho ou consulta)"""
+    espelho = obter_espelho_pedidos()
+    if espelho.ativo:
+        return espelho.buscar_por_serie(serie, limite)
+    return consultar_serie(serie, limite)
+
+@medido("pedido.buscar")
+def buscar_pedidos(valor_busca: str, limite: int = BUSCA_LIMITE_CANDIDATOS):
+    """Busca por ID exato e por prefixo do nº de série.
+
+    Retorna lista de (pedido, motivo) com correspondências exatas primeiro.
+    """
+    termo = valor_busca.strip()
+    serie = normalizar_numero_serie(termo)
+    candidatos = {}
+
+    for pedido_id in ids_candidatos(termo):
+        pedido = obter_pedido(pedido_id)
+        if pedido:
+            candidatos[pedido["id"]] = (0, pedido, "ID")
+            break
+
+    if serie:
+        for pedido in pedidos_por_serie(serie, limite):
+            if pedido["id"] in candidatos:
+                continue
+            exato = normalizar_numero_serie(pedido.get("numero_serie")) == serie
+            candidatos[pedido["id"]] = (
+                (1, pedido, "Nº Série exato") if exato else (2, pedido, "Nº Série (prefixo)")
+            )
+
+    ordenados = sorted(
+        candidatos.values(),
+        key=lambda c: (c[0], normalizar_numero_serie(c[1].get("numero_serie")), c[1]["id"]),
+    )
+    return [(pedido, motivo) for _, pedido, motivo in ordenados[:limite]]
+
 def atualizar_status(pedido_id: str, novo_status: str):
-    """Atualiza status de um pedido no Firestore"""
+    """Atualiza status de um pedido (e os contadores, na mesma transação)"""
     try:
-        doc_ref = firestore_client.collection("pedidos").document(pedido_id)
-        doc = doc_ref.get()
-        
-        if doc.exists:
-            doc_ref.update({"status": novo_status})
+        if repositorio_pedidos.atualizar_status(pedido_id, novo_status):
+            invalidar_cache_pedidos()
             st.success(f"✅ Status do pedido {pedido_id} atualizado para {novo_status}")
             return True
         else:
@@ -344,56 +1762,935 @@ def atualizar_status(pedido_id: str, novo_status: str):
         st.error(f"❌ Erro ao atualizar status: {e}")
         return False
 
+def atualizar_status_em_lote(pedido_ids, novo_status: str):
+    """Atualiza vários pedidos em blocos atômicos (WriteBatch no Firestore).
+
+    Cada bloco é lido de uma vez e gravado com precondição; se outro usuário
+    alterar um pedido no meio, o bloco é relido. Retorna lista de
+    (pedido_id, sucesso, mensagem) na ordem recebida.
+    """
+    ids = list(dict.fromkeys(pedido_ids))
+    resultados = {}
+
+    for inicio in range(0, len(ids), LOTE_STATUS_TAMANHO):
+        bloco = ids[inicio:inicio + LOTE_STATUS_TAMANHO]
+        for _ in range(LOTE_STATUS_TENTATIVAS):
+            try:
+                aplicados = repositorio_pedidos.aplicar_status_bloco(bloco, novo_status)
+            except ConflitoConcorrencia:
+                continue  # algum pedido mudou entre a leitura e a escrita: reler o bloco
+            except Exception as e:
+                for pedido_id in bloco:
+                    resultados[pedido_id] = (False, f"❌ Erro ao gravar: {e}")
+                break
+            for pedido_id, (resultado, status_anterior) in aplicados.items():
+                if resultado == "nao_encontrado":
+                    resultados[pedido_id] = (False, "❌ Pedido não encontrado")
+                elif resultado == "inalterado":
+                    resultados[pedido_id] = (True, "Já estava com esse status")
+                else:
+                    resultados[pedido_id] = (True, f"{status_anterior or '-'} → {novo_status}")
+            break
+        else:
+            for pedido_id in bloco:
+                resultados[pedido_id] = (False, "❌ Pedido alterado por outro usuário durante a atualização")
+
+    invalidar_cache_pedidos()
+    return [(pedido_id, *resultados[pedido_id]) for pedido_id in ids]
+
+# =============================================================================
+# EXPORTAÇÃO / IMPORTAÇÃO
+# =============================================================================
+def exportar_pedidos(destino, formato: str = "csv"):
+    """Escreve todos os pedidos em `destino` (arquivo texto) em CSV ou JSONL; retorna a quantidade"""
+    escritor = None
+    if formato == "csv":
+        escritor = csv.DictWriter(destino, fieldnames=CAMPOS_EXPORTACAO, extrasaction="ignore")
+        escritor.writeheader()
+
+    total = 0
+    for pedido in iterar_pedidos():
+        if escritor is not None:
+            escritor.writerow({campo: valor_csv(pedido.get(campo)) for campo in CAMPOS_EXPORTACAO})
+        else:
+            linha = {campo: pedido.get(campo) for campo in CAMPOS_EXPORTACAO if pedido.get(campo) is not None}
+            destino.write(pedido_para_json(linha) + "\n")
+        total += 1
+    return total
+
+def valor_csv(valor):
+    """Célula do CSV: listas e dicionários (fotos, ...) em JSON, datas em ISO"""
+    if valor is None:
+        return ""
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, (list, dict)):
+        return pedido_para_json(valor)
+    return valor
+
+def valor_json_importado(valor, tipo):
+    """Lista/dicionário de uma linha importada (JSONL já vem decodificado; CSV traz o JSON em texto)"""
+    if isinstance(valor, str) and valor.strip():
+        try:
+            valor = json.loads(valor)
+        except ValueError:
+            return None
+    return valor if isinstance(valor, tipo) else None
+
+def data_importada(valor):
+    """Data ISO 8601 de uma linha importada (sem fuso = UTC); None se ausente ou inválida"""
+    if isinstance(valor, str) and valor.strip():
+        try:
+            valor = datetime.fromisoformat(valor.strip())
+        except ValueError:
+            return None
+    if not isinstance(valor, datetime):
+        return None
+    return valor if valor.tzinfo else valor.replace(tzinfo=timezone.utc)
+
+def ler_linhas_importacao(caminho: str):
+    """Lê CSV ou JSONL linha a linha, devolvendo (numero_linha, dict)"""
+    with open(caminho, encoding="utf-8", newline="") as arquivo:
+        if caminho.endswith(".jsonl"):
+            for numero, linha in enumerate(arquivo, start=1):
+                if linha.strip():
+                    yield numero, json.loads(linha)
+        else:
+            for numero, linha in enumerate(csv.DictReader(arquivo), start=1):
+                yield numero, linha
+
+def id_importado(chave_importacao: str, momento: datetime = None, tentativa: int = 0):
+    """ID no formato dos pedidos novos, com o sufixo derivado da linha importada (e da tentativa)"""
+    semente = hashlib.sha256(f"{chave_importacao}:{tentativa}".encode()).digest()
+    return gerar_id_pedido(momento, aleatorio=int.from_bytes(semente[:4], "big"))
+
+def preparar_pedido_importado(linha: dict, chave_importacao: str):
+    """Aplica as mesmas regras do formulário; retorna (pedido, erro)
+
+    Linhas sem `id` recebem id_importado() e chave_idempotencia = chave_importacao.
+    """
+    erro = erro_validacao_pedido(linha.get("tecnico"), linha.get("peca"))
+    if erro:
+        return None, erro
+    status = (linha.get("status") or "Pendente").strip()
+    if status not in STATUS_PEDIDO:
+        return None, f"Status inválido: {status}"
+
+    pedido_id = (linha.get("id") or "").strip() or None
+    foto_url = (linha.get("foto_url") or "").strip() or None
+    fotos = [foto for foto in valor_json_importado(linha.get("fotos"), list) or [] if isinstance(foto, dict)]
+    fotos_urls = [url for url in valor_json_importado(linha.get("fotos_urls"), list) or [] if url]
+    pedido = {
+        "id": pedido_id,
+        "tecnico": linha["tecnico"].strip(),
+        "peca": linha["peca"].strip(),
+        "modelo": linha.get("modelo") or "",
+        "numero_serie": linha.get("numero_serie") or "",
+        "ordem_servico": linha.get("ordem_servico") or "",
+        "observacoes": linha.get("observacoes") or "",
+        "status": status,
+        "data_criacao": (linha.get("data_criacao") or "").strip() or datetime_now_str(),
+        "numero_serie_normalizado": normalizar_numero_serie(linha.get("numero_serie")),
+        "foto_url": foto_url,
+        "tem_foto": foto_url is not None,
+    }
+    for campo in ("foto_miniatura_url", "foto_webp_url"):
+        if (linha.get(campo) or "").strip():
+            pedido[campo] = linha[campo].strip()
+    if fotos:
+        pedido["fotos"] = fotos
+    if fotos_urls:
+        pedido["fotos_urls"] = fotos_urls
+    for campo in ("criado_em", "atualizado_em"):
+        if data_importada(linha.get(campo)) is not None:
+            pedido[campo] = data_importada(linha.get(campo))
+    status_em = {
+        chave: data_importada(momento)
+        for chave, momento in (valor_json_importado(linha.get("status_em"), dict) or {}).items()
+        if chave in STATUS_PEDIDO and data_importada(momento) is not None
+    }
+    if status_em:
+        pedido["status_em"] = status_em
+    # Só o que a linha não trouxe (exportações antigas) vem de data_criacao
+    pedido.update(campos_migracao_datas(pedido) or {})
+    if pedido_id is None:
+        pedido["id"] = id_importado(chave_importacao, pedido.get("criado_em"))
+        pedido["chave_idempotencia"] = chave_importacao
+    elif (linha.get("chave_idempotencia") or "").strip():
+        pedido["chave_idempotencia"] = linha["chave_idempotencia"].strip()
+    return pedido, None
+
+def hash_arquivo(caminho: str):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+def criar_pedidos_importados(pedidos):
+    """criar_lote() dos pedidos com ID gerado; nunca sobrescreve. Retorna as falhas.
+
+    Um ID já existente com a mesma chave_idempotencia é a mesma linha gravada
+    antes (lote retomado); com outra chave é outro pedido, e a linha recebe o
+    próximo ID derivado (até ID_TENTATIVAS).
+    """
+    falhas = []
+    tentativas = {pedido["chave_idempotencia"]: 0 for pedido in pedidos}
+    while pedidos:
+        existentes, falhas_lote = repositorio_pedidos.criar_lote(pedidos)
+        falhas.extend(falhas_lote)
+        existentes = set(existentes)
+        refazer = []
+        for pedido in pedidos:
+            if pedido["id"] not in existentes:
+                continue
+            atual = repositorio_pedidos.obter(pedido["id"])
+            chave = pedido["chave_idempotencia"]
+            if atual is not None and atual.get("chave_idempotencia") == chave:
+                continue
+            tentativas[chave] += 1
+            if tentativas[chave] >= ID_TENTATIVAS:
+                falhas.append((pedido["id"], "IDs gerados já usados por outros pedidos"))
+                continue
+            refazer.append({**pedido, "id": id_importado(chave, pedido.get("criado_em"), tentativas[chave])})
+        pedidos = refazer
+    return falhas
+
+def importar_pedidos(caminho: str, caminho_checkpoint: str = None, dry_run: bool = False, relatorio=print):
+    """Importa pedidos de CSV/JSONL em lotes de IMPORTACAO_LOTE (BulkWriter no Firestore).
+
+    Retomável: o número da última linha confirmada fica no checkpoint. Linhas
+    com `id` sobrescrevem o pedido com esse ID (restaurar uma exportação).
+    Linhas sem `id` são criadas com um ID novo derivado do conteúdo do arquivo
+    + número da linha: reprocessar um lote após falha não duplica, e outro
+    arquivo (mesmo com o mesmo nome) nunca sobrescreve pedidos existentes.
+    """
+    caminho_checkpoint = caminho_checkpoint or caminho + ".checkpoint"
+    ja_importadas = 0
+    if os.path.exists(caminho_checkpoint):
+        with open(caminho_checkpoint, encoding="utf-8") as f:
+            ja_importadas = int(f.read().strip() or 0)
+        relatorio(f"Retomando após a linha {ja_importadas}")
+
+    prefixo_chave = f"importacao:{hash_arquivo(caminho)[:16]}"
+    falhas_escrita = []
+    lote = []
+
+    inicio = time.perf_counter()
+    gravadas = invalidas = 0
+    ultima_linha = ja_importadas
+
+    def _confirmar_lote():
+        if not dry_run:
+            com_id = [pedido for pedido, id_gerado in lote if not id_gerado]
+            if com_id:
+                falhas_escrita.extend(repositorio_pedidos.gravar_lote(com_id))
+            falhas_escrita.extend(criar_pedidos_importados([pedido for pedido, id_gerado in lote if id_gerado]))
+            with open(caminho_checkpoint, "w", encoding="utf-8") as f:
+                f.write(str(ultima_linha))
+        lote.clear()
+        duracao = time.perf_counter() - inicio
+        relatorio(f"… linha {ultima_linha}: {gravadas} gravadas ({gravadas / duracao if duracao else 0:.0f} pedidos/s)")
+
+    for numero, linha in ler_linhas_importacao(caminho):
+        if numero <= ja_importadas:
+            continue
+        pedido, erro = preparar_pedido_importado(linha, f"{prefixo_chave}:{numero}")
+        ultima_linha = numero
+        if erro:
+            invalidas += 1
+            relatorio(f"Linha {numero}: {erro}")
+            continue
+
+        lote.append((pedido, not (linha.get("id") or "").strip()))
+        gravadas += 1
+        if len(lote) >= IMPORTACAO_LOTE:
+            _confirmar_lote()
+
+    _confirmar_lote()
+    if not dry_run:
+        os.remove(caminho_checkpoint)
+        # Import não passa pelos contadores incrementais: recontar no servidor
+        reconciliar_contadores()
+
+    duracao = time.perf_counter() - inicio
+    for pedido_id, mensagem in falhas_escrita:
+        relatorio(f"Falha ao gravar {pedido_id}: {mensagem}")
+    relatorio(
+        f"Concluído: {gravadas - len(falhas_escrita)} gravadas, {invalidas} inválidas, "
+        f"{len(falhas_escrita)} falhas em {duracao:.1f}s "
+        f"({gravadas / duracao if duracao else 0:.0f} pedidos/s)"
+    )
+    return {"gravadas": gravadas - len(falhas_escrita), "invalidas": invalidas, "falhas": falhas_escrita}
+
+# =============================================================================
+# MIGRAÇÃO DE DATAS
+# =============================================================================
+def campos_migracao_datas(pedido):
+    """Campos de data que faltam no pedido; None se data_criacao não puder ser interpretada"""
+    campos = {}
+    criado_em = pedido.get("criado_em")
+    if criado_em is None:
+        criado_em = criado_em_de_data_criacao(pedido.get("data_criacao"))
+        if criado_em is None:
+            return None
+        campos["criado_em"] = criado_em
+    if pedido.get("atualizado_em") is None:
+        campos["atualizado_em"] = criado_em
+    if not pedido.get("status_em"):
+        # Dos pedidos antigos só se sabe quando entraram em Pendente (status inicial)
+        campos["status_em"] = {"Pendente": criado_em}
+    return campos
+
+def campos_migracao_serie(pedido):
+    """numero_serie_normalizado de pedidos (ou resumos arquivados) gravados antes do campo existir"""
+    if pedido.get("numero_serie_normalizado") is None:
+        return {"numero_serie_normalizado": normalizar_numero_serie(pedido.get("numero_serie"))}
+    return {}
+
+def campos_migracao_pedido(pedido):
+    """(campos que faltam, erro): datas a partir de data_criacao + numero_serie_normalizado.
+
+    Com data_criacao inválida o erro é informado, mas o nº de série ainda é migrado.
+    """
+    datas = campos_migracao_datas(pedido)
+    erro = None if datas is not None else f"data_criacao inválida ({pedido.get('data_criacao')!r})"
+    return {**(datas or {}), **campos_migracao_serie(pedido)}, erro
+
+def migrar_em_lotes(listar, atualizar, calcular, caminho_checkpoint: str, dry_run: bool, lote: int, relatorio):
+    """Varre uma coleção em ordem de ID gravando os campos que calcular(doc) devolve.
+
+    O checkpoint guarda o último ID gravado. Retorna os totais da varredura.
+    """
+    apos_id = None
+    if os.path.exists(caminho_checkpoint):
+        with open(caminho_checkpoint, encoding="utf-8") as f:
+            apos_id = f.read().strip() or None
+        relatorio(f"Retomando após {apos_id}")
+
+    inicio = time.perf_counter()
+    lidos = migrados = invalidos = 0
+    falhas = []
+
+    while True:
+        pagina = listar(apos_id, lote)
+        if not pagina:
+            break
+
+        atualizacoes = {}
+        for documento in pagina:
+            campos, erro = calcular(documento)
+            if erro:
+                invalidos += 1
+                relatorio(f"{documento['id']}: {erro}")
+            if campos:
+                atualizacoes[documento["id"]] = campos
+        lidos += len(pagina)
+        migrados += len(atualizacoes)
+        apos_id = pagina[-1]["id"]
+
+        if not dry_run:
+            if atualizacoes:
+                falhas.extend(atualizar(atualizacoes))
+            os.makedirs(os.path.dirname(caminho_checkpoint) or ".", exist_ok=True)
+            with open(caminho_checkpoint, "w", encoding="utf-8") as f:
+                f.write(apos_id)
+
+        duracao = time.perf_counter() - inicio
+        relatorio(
+            f"… {lidos} lidos, {migrados} {'a migrar' if dry_run else 'migrados'} "
+            f"({lidos / duracao if duracao else 0:.0f}/s)"
+        )
+        if len(pagina) < lote:
+            break
+
+    if not dry_run and os.path.exists(caminho_checkpoint):
+        os.remove(caminho_checkpoint)
+    for pedido_id, mensagem in falhas:
+        relatorio(f"❌ {pedido_id}: {mensagem}")
+    return {
+        "lidos": lidos, "migrados": migrados - len(falhas), "invalidos": invalidos, "falhas": falhas,
+        "duracao": time.perf_counter() - inicio,
+    }
+
+def migrar_datas_pedidos(caminho_checkpoint: str = None, dry_run: bool = False,
+                         lote: int = MIGRACAO_LOTE, relatorio=print):
+    """Preenche os campos que os pedidos antigos não têm, em duas varreduras retomáveis:
+
+    1. pedidos: criado_em / atualizado_em / status_em (a partir de data_criacao)
+       e numero_serie_normalizado (a busca por nº de série sem o espelho é uma
+       range query nesse campo e não acha pedidos sem ele);
+    2. índice do arquivo: numero_serie_normalizado dos resumos arquivados.
+
+    Só grava campos ausentes, então rodar de novo é seguro.
+    """
+    diretorio = diretorio_dados_backend()
+    caminho_checkpoint = caminho_checkpoint or os.path.join(diretorio, "migracao_datas.checkpoint")
+    totais = {}
+
+    relatorio("Pedidos:")
+    totais["pedidos"] = migrar_em_lotes(
+        repositorio_pedidos.listar_por_id, repositorio_pedidos.atualizar_lote, campos_migracao_pedido,
+        caminho_checkpoint, dry_run, lote, relatorio,
+    )
+    relatorio("Índice do arquivo:")
+    totais["arquivo"] = migrar_em_lotes(
+        repositorio_pedidos.listar_indice_arquivo_por_id, repositorio_pedidos.atualizar_indice_arquivo_lote,
+        lambda resumo: (campos_migracao_serie(resumo), None),
+        caminho_checkpoint + ".arquivo", dry_run, lote, relatorio,
+    )
+    if not dry_run:
+        invalidar_cache_pedidos()
+
+    for nome, t in totais.items():
+        relatorio(
+            f"{'[dry-run] ' if dry_run else ''}{nome}: {t['lidos']} lidos | {t['migrados']} migrados | "
+            f"{t['lidos'] - t['migrados'] - len(t['falhas'])} já completos | {t['invalidos']} inválidos | "
+            f"{len(t['falhas'])} falhas | {t['duracao']:.1f}s ({t['lidos'] / t['duracao'] if t['duracao'] else 0:.0f}/s)"
+        )
+    return totais
+
+# =============================================================================
+# ARQUIVAMENTO E LIMPEZA DE FOTOS
+# =============================================================================
+def caminho_checkpoint_limpeza():
+    return os.path.join(diretorio_dados_backend(), "limpeza.checkpoint")
+
+def ler_checkpoint_limpeza(caminho: str):
+    """Estado salvo da última execução interrompida, ou None"""
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding="utf-8") as f:
+        estado = json.load(f)
+    estado["corte"] = datetime.fromisoformat(estado["corte"])
+    if estado.get("cursor"):
+        estado["cursor"] = (datetime.fromisoformat(estado["cursor"][0]), estado["cursor"][1])
+    return estado
+
+def gravar_checkpoint_limpeza(caminho: str, estado: dict):
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(estado, f, default=lambda v: v.isoformat())
+
+def tratar_fotos_arquivadas(pedidos, modo: str):
+    """Apaga (ou muda de classe) os arquivos de foto dos pedidos; retorna (tratados, falhas)
+
+    Fotos endereçadas por conteúdo podem ser de vários pedidos: as que outro
+    pedido ainda usa ficam (ao rebaixar, só pedidos ativos contam).
+    """
+    fotos = [foto for pedido in pedidos for foto in lista_fotos_pedido(pedido) if foto.get("url")]
+    compartilhadas = {
+        foto["url"]
+        for foto in fotos
+        if repositorio_pedidos.foto_referenciada(foto["url"], incluir_arquivo=modo == "apagar")
+    }
+    nomes = {
+        nome
+        for foto in fotos
+        if foto["url"] not in compartilhadas
+        for nome in (repositorio_fotos.nome_da_url(foto.get(campo)) for campo in ("url", "miniatura_url", "webp_url"))
+        if nome
+    }
+    falhas = []
+
+    def _tratar(nome):
+        try:
+            if modo == "apagar":
+                repositorio_fotos.apagar(nome)
+            else:
+                repositorio_fotos.mudar_classe(nome, modo)
+        except Exception as e:
+            falhas.append((nome, str(e)))
+
+    list(obter_executor_uploads().map(_tratar, nomes))
+    return len(nomes) - len(falhas), falhas
+
+def coletar_fotos_orfas(apos: str, limite: int, carencia: int = LIMPEZA_FOTOS_CARENCIA):
+    """Verifica um lote de fotos após `apos`; retorna (órfãs, último nome verificado ou None no fim)"""
+    corte = datetime.now(timezone.utc) - timedelta(seconds=carencia)
+    verificados = []
+    for nome, criado_em in repositorio_fotos.listar_detalhado(PREFIXO_FOTOS, apos):
+        verificados.append((nome, criado_em))
+        if len(verificados) >= limite:
+            break
+    orfas = [
+        nome
+        for nome, criado_em in verificados
+        if (criado_em is None or criado_em < corte)
+        and not repositorio_pedidos.foto_referenciada(repositorio_fotos.url(nome))
+    ]
+    return orfas, (verificados[-1][0] if verificados else None)
+
+def executar_limpeza(caminho_checkpoint: str = None, dias: int = None, modo_fotos: str = None,
+                     dry_run: bool = False, max_lotes: int = None, relatorio=print):
+    """Arquiva pedidos Entregue antigos e apaga fotos órfãs, em lotes com checkpoint.
+
+    Fase "pedidos": pedidos Entregue sem alteração há `dias` vão para o arquivo
+    e suas fotos são apagadas (ou rebaixadas de classe). Fase "fotos": arquivos
+    em fotos_pedidos/ que nenhum pedido (nem resumo arquivado) referencia são
+    apagados, com as variantes. Com max_lotes a execução para no meio e a
+    próxima continua do checkpoint (mesma data de corte).
+    """
+    caminho_checkpoint = caminho_checkpoint or caminho_checkpoint_limpeza()
+    dias = int(dias if dias is not None else obter_config("ARQUIVAMENTO_DIAS", ARQUIVAMENTO_DIAS))
+    modo_fotos = modo_fotos or obter_config("FOTOS_ARQUIVADAS", FOTOS_ARQUIVADAS)
+
+    estado = None if dry_run else ler_checkpoint_limpeza(caminho_checkpoint)
+    if estado:
+        relatorio(f"Retomando a fase '{estado['fase']}' (corte {estado['corte']:%d/%m/%Y})")
+    else:
+        estado = {
+            "corte": datetime.now(timezone.utc) - timedelta(days=dias),
+            "fase": "pedidos",
+            "cursor": None,
+            "ultima_foto": None,
+            "totais": {"pedidos_arquivados": 0, "fotos_tratadas": 0, "fotos_orfas": 0, "falhas": 0},
+        }
+    totais = estado["totais"]
+    inicio = time.perf_counter()
+    lotes = 0
+
+    while estado["fase"] != "concluida":
+        if max_lotes is not None and lotes >= max_lotes:
+            break
+        lotes += 1
+
+        if estado["fase"] == "pedidos":
+            pagina = repositorio_pedidos.listar(
+                filtros={"status": "Entregue"},
+                cursor=estado["cursor"],
+                limite=ARQUIVAMENTO_LOTE,
+                intervalo=("atualizado_em", None, estado["corte"]),
+            )
+            if not pagina:
+                estado["fase"] = "fotos"
+            elif dry_run:
+                totais["pedidos_arquivados"] += len(pagina)
+                totais["fotos_tratadas"] += sum(
+                    1 for p in pagina for foto in lista_fotos_pedido(p) for url in foto.values() if url
+                )
+                estado["cursor"] = chave_ordenacao_pedido(pagina[-1], "atualizado_em")
+            else:
+                campos = {"arquivado_em": datetime.now(timezone.utc)}
+                if modo_fotos == "apagar":
+                    campos.update({campo: None for campo in [*CAMPOS_URL_FOTO, *CAMPOS_LISTA_FOTOS]}, tem_foto=False)
+                for _ in range(LOTE_STATUS_TENTATIVAS):
+                    try:
+                        arquivados = repositorio_pedidos.arquivar([p["id"] for p in pagina], "Entregue", campos)
+                        break
+                    except ConflitoConcorrencia:
+                        # Alguém mexeu num pedido do lote: relê só os que ainda se qualificam
+                        arquivados = []
+                        pagina = [
+                            p for p in (repositorio_pedidos.obter(p["id"]) for p in pagina)
+                            if p and p.get("status") == "Entregue"
+                        ]
+                tratadas, falhas = tratar_fotos_arquivadas(arquivados, modo_fotos)
+                for nome, mensagem in falhas:
+                    relatorio(f"❌ {nome}: {mensagem}")
+                if arquivados:
+                    invalidar_cache_pedidos()
+                totais["pedidos_arquivados"] += len(arquivados)
+                totais["fotos_tratadas"] += tratadas
+                totais["falhas"] += len(falhas)
+                if pagina:
+                    estado["cursor"] = chave_ordenacao_pedido(pagina[-1], "atualizado_em")
+        else:
+            orfas, ultima = coletar_fotos_orfas(estado["ultima_foto"], LIMPEZA_FOTOS_LOTE)
+            if ultima is None:
+                estado["fase"] = "concluida"
+            else:
+                estado["ultima_foto"] = ultima
+                totais["fotos_orfas"] += len(orfas)
+                if not dry_run:
+                    variantes = [n for nome in orfas for n in nomes_blobs_variantes(nome).values()]
+                    for nome in orfas + variantes:
+                        try:
+                            repositorio_fotos.apagar(nome)
+                        except Exception as e:
+                            totais["falhas"] += 1
+                            relatorio(f"❌ {nome}: {e}")
+
+        if not dry_run:
+            gravar_checkpoint_limpeza(caminho_checkpoint, estado)
+        relatorio(
+            f"… {totais['pedidos_arquivados']} pedidos {'a arquivar' if dry_run else 'arquivados'}, "
+            f"{totais['fotos_orfas']} fotos órfãs ({time.perf_counter() - inicio:.1f}s)"
+        )
+
+    concluida = estado["fase"] == "concluida"
+    if concluida and not dry_run and os.path.exists(caminho_checkpoint):
+        os.remove(caminho_checkpoint)
+    relatorio(
+        f"{'[dry-run] ' if dry_run else ''}{'Concluído' if concluida else 'Pausado (continua do checkpoint)'}: "
+        f"{totais['pedidos_arquivados']} pedidos arquivados | {totais['fotos_tratadas']} fotos "
+        f"{'apagadas' if modo_fotos == 'apagar' else f'movidas para {modo_fotos}'} | "
+        f"{totais['fotos_orfas']} fotos órfãs | {totais['falhas']} falhas"
+    )
+    return {**totais, "concluida": concluida}
+
+def buscar_arquivados(valor_busca: str, limite: int = BUSCA_LIMITE_CANDIDATOS):
+    """Resumos arquivados por ID, Nº de série ou OS"""
+    try:
+        valor = (valor_busca or "").strip()
+        if not valor:
+            return []
+        pedido = repositorio_pedidos.obter_arquivado(valor)
+        if pedido:
+            return [pedido]
+        return (
+            repositorio_pedidos.buscar_arquivo({"numero_serie_normalizado": normalizar_numero_serie(valor)}, limite)
+            or repositorio_pedidos.buscar_arquivo({"ordem_servico": valor}, limite)
+        )
+
+    except Exception as e:
+        st.error(f"❌ Erro ao buscar no arquivo: {e}")
+        return []
+
+# =============================================================================
+# CONTADORES AGREGADOS
+# =============================================================================
+def obter_contadores():
+    """Lê os contadores agregados; reconcilia se ainda não existirem"""
+    try:
+        contadores = em_cache(("contadores",), repositorio_pedidos.contadores)
+        if contadores is None:
+            return reconciliar_contadores()
+        return contadores
+
+    except Exception as e:
+        st.error(f"❌ Erro ao ler contadores: {e}")
+        return None
+
+def reconciliar_contadores():
+    """Recalcula os contadores (count() no servidor, no Firestore) e regrava"""
+    try:
+        contadores = repositorio_pedidos.recontar()
+        invalidar_cache_pedidos()
+        return contadores
+
+    except Exception as e:
+        st.error(f"❌ Erro ao reconciliar contadores: {e}")
+        return None
+
+# =============================================================================
+# CARTÕES DE PEDIDOS (RENDERIZAÇÃO MEMORIZADA)
+# =============================================================================
+ESTILO_CAIXA_OBSERVACOES = (
+    "background: rgba(255,255,255,0.02); padding: 12px; border-radius: 8px; "
+    "border: 1px solid rgba(255,255,255,0.03);"
+)
+ESTILO_COLUNAS_CARTAO = "display: flex; flex-wrap: wrap; gap: 4px 48px; margin-bottom: 12px;"
+CARACTERES_MARKDOWN = re.compile(r"([\\`*_{}\[\]()#+\-.!|~<>$:])")
+
+def escapar_markdown(texto) -> str:
+    """Texto do usuário literal em markdown (sem negrito, links, LaTeX, emojis :nome:...)"""
+    return CARACTERES_MARKDOWN.sub(r"\\\1", str(texto))
+
+def escapar_html(texto) -> str:
+    """Texto do usuário literal no corpo HTML do cartão; quebras de linha viram <br>.
+
+    O corpo não pode ter linhas em branco: o markdown encerraria o bloco HTML ali
+    e passaria a interpretar o restante do texto.
+    """
+    texto = html.escape(str(texto)).replace("$", "&#36;")
+    return texto.replace("\r\n", "\n").replace("\r", "\n").replace("\n", "<br>")
+
+def campo_cartao(rotulo: str, valor) -> str:
+    return f"<b>{rotulo}:</b> {escapar_html(valor or '-')}"
+
+def montar_cartao_pedido(pedido):
+    """(título, corpo) do cartão de um pedido completo.
+
+    O título é markdown (rótulo do expander) e o corpo é um único bloco HTML com
+    dados, observações e estado/link da foto; os textos do usuário já saem escapados.
+    """
+    status_label = pedido.get("status") or "Pendente"
+    titulo = (
+        f"{obter_emoji_status(status_label)} Pedido — Tecnico: {escapar_markdown(pedido.get('tecnico') or '-')} "
+        f"— Nº de Série: {escapar_markdown(pedido.get('numero_serie') or '-')} — Id: {escapar_markdown(pedido['id'])}"
+    )
+
+    coluna1 = "<br>".join([
+        campo_cartao("Técnico", pedido.get("tecnico")),
+        campo_cartao("Peça", pedido.get("peca")),
+        campo_cartao("Modelo", pedido.get("modelo")),
+        campo_cartao("ID", pedido["id"]),
+    ])
+    coluna2 = "<br>".join([
+        campo_cartao("Nº Série", pedido.get("numero_serie")),
+        campo_cartao("OS", pedido.get("ordem_servico")),
+        campo_cartao("Status", formatar_status(status_label)),
+    ])
+    partes = [
+        f"<p>{campo_cartao('Data', formatar_data_pedido(pedido))}</p>",
+        f"<div style='{ESTILO_COLUNAS_CARTAO}'><div>{coluna1}</div><div>{coluna2}</div></div>",
+    ]
+
+    if pedido.get("observacoes"):
+        partes.append(
+            f"<p><b>Observações:</b></p>"
+            f"<div style='{ESTILO_CAIXA_OBSERVACOES}'>{escapar_html(pedido['observacoes'])}</div>"
+        )
+
+    if pedido.get("foto_pendente"):
+        quantidade = len(pedido.get("fotos_urls") or [])
+        aviso = f"⏳ {quantidade} fotos sendo enviadas..." if quantidade > 1 else "⏳ Foto sendo enviada..."
+        partes.append(f"<p style='opacity: 0.6;'>{aviso}</p>")
+    else:
+        if pedido.get("foto_erro"):
+            partes.append("<p>⚠️ O envio da foto deste pedido falhou.</p>")
+        fotos = [foto for foto in lista_fotos_pedido(pedido) if foto.get("url")] if pedido.get("tem_foto") else []
+        links = []
+        for numero, foto in enumerate(fotos, start=1):
+            url_completa = html.escape(foto.get("webp_url") or foto["url"], quote=True)
+            rotulo = "📸 Abrir foto em tamanho real" if len(fotos) == 1 else f"📸 Foto {numero}"
+            links.append(f"<a href='{url_completa}' target='_blank'>{rotulo}</a>")
+        if links:
+            partes.append(f"<p>{' · '.join(links)}</p>")
+
+    return titulo, "".join(partes)
+
+class CacheCartoes:
+    """LRU de cartões já montados, por (id, atualizado_em), com limite de entradas e de memória.
+
+    Toda escrita em um pedido carimba atualizado_em, então um pedido alterado cai
+    numa chave nova (e a versão anterior dele sai do cache na hora). Os campos
+    presentes também fazem parte da versão: o cartão de uma linha projetada
+    (CAMPOS_RESUMO, sem observações e fotos) nunca é servido para o pedido
+    completo. Pedidos sem atualizado_em (anteriores à migração de datas) são
+    montados sem cache.
+    """
+
+    def __init__(self, max_entradas: int, max_bytes: int):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # (id, versão) -> (cartão, bytes)
+        self._versoes = {}              # id -> versão guardada
+        self._bytes = 0
+
+    def _remover(self, chave):
+        _, tamanho = self._entradas.pop(chave)
+        self._bytes -= tamanho
+        if self._versoes.get(chave[0]) == chave[1]:
+            del self._versoes[chave[0]]
+
+    def obter(self, pedido):
+        if pedido.get("atualizado_em") is None:
+            return montar_cartao_pedido(pedido)
+        versao = (pedido["atualizado_em"], frozenset(pedido))
+
+        chave = (pedido["id"], versao)
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                self._entradas.move_to_end(chave)
+                return entrada[0]
+
+        cartao = montar_cartao_pedido(pedido)
+        tamanho = sum(sys.getsizeof(parte) for parte in cartao)
+        with self._lock:
+            anterior = self._versoes.get(pedido["id"])
+            if anterior is not None and (pedido["id"], anterior) in self._entradas:
+                self._remover((pedido["id"], anterior))
+            self._entradas[chave] = (cartao, tamanho)
+            self._versoes[pedido["id"]] = versao
+            self._bytes += tamanho
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                self._remover(next(iter(self._entradas)))
+        return cartao
+
+@st.cache_resource
+def obter_cache_cartoes():
+    """Cartões compartilhados por todas as sessões do processo"""
+    return CacheCartoes(CARTOES_CACHE_ENTRADAS, CARTOES_CACHE_BYTES)
+
 # =============================================================================
 # TELAS DO SISTEMA
 # =============================================================================
+def mostrar_indicador_sincronizacao(container=st):
+    """Mostra se os dados vêm do listener em tempo real ou de consulta direta"""
+    espelho = obter_espelho_pedidos()
+    if not repositorio_pedidos.suporta_listener:
+        container.caption("💾 Backend local · dados obtidos por consulta direta")
+    elif espelho.ativo:
+        idade = espelho.segundos_desde_atualizacao() or 0
+        container.caption(f"🟢 Sincronizado em tempo real · última alteração há {idade:.0f}s")
+    else:
+        container.caption("🟠 Listener desconectado · dados obtidos por consulta direta")
+    mostrar_pedidos_nao_sincronizados(container)
+
+ETAPAS_SINCRONIZACAO = {"pedido": "⏳ Aguardando envio", "fotos": "📸 Enviando fotos"}
+
+def mostrar_pedidos_nao_sincronizados(container=st):
+    """Pedidos confirmados aqui que ainda não chegaram (inteiros) ao servidor"""
+    try:
+        pendentes = obter_fila_pedidos().pendentes()
+    except Exception as e:
+        container.warning(f"⚠️ Não foi possível ler a fila local de pedidos: {e}")
+        return
+    if not pendentes:
+        return
+
+    falhos = [pedido["id"] for pedido in pendentes if pedido["sincronizacao"]["status"] == "falhou"]
+    if falhos:
+        container.error(
+            f"❌ {len(falhos)} pedido(s) NÃO foram gravados no servidor "
+            f"({escapar_markdown(', '.join(falhos))}): o ID já pertence a outro pedido. "
+            "Cadastre-os novamente e descarte o ID informado."
+        )
+        # Ciente do aviso: os pedidos que falharam saem da fila e o aviso some
+        chave = "descartar_falhas_sidebar" if container is st.sidebar else "descartar_falhas"
+        if container.button("🗑️ Já recadastrei, remover o aviso", key=chave):
+            obter_fila_pedidos().descartar_falhas(falhos)
+            st.rerun()
+
+    with container.expander(f"⏳ {len(pendentes)} pedido(s) aguardando sincronização", expanded=False):
+        st.dataframe(
+            [
+                {
+                    "Sincronização": (
+                        "❌ Falhou" if pedido["sincronizacao"]["status"] == "falhou"
+                        else ETAPAS_SINCRONIZACAO.get(pedido["sincronizacao"]["etapa"], "⏳")
+                    ),
+                    "ID": pedido["id"],
+                    "Técnico": pedido.get("tecnico") or "-",
+                    "Nº Série": pedido.get("numero_serie") or "-",
+                    "Data": data_local_pedido(pedido),
+                    "Tentativas": pedido["sincronizacao"]["tentativas"],
+                    "Último erro": pedido["sincronizacao"]["erro"] or "",
+                }
+                for pedido in pendentes
+            ],
+            column_config={"Data": st.column_config.DatetimeColumn("Data", format="DD/MM/YYYY HH:mm")},
+            hide_index=True,
+            use_container_width=True,
+        )
+
+def mostrar_galeria_pedido(pedido, caption="Foto do equipamento/peça"):
+    """Só as miniaturas, lado a lado; os links para o tamanho real já vêm no corpo do cartão"""
+    if pedido.get("foto_pendente") or not pedido.get("tem_foto"):
+        return
+    miniaturas = [foto["miniatura_url"] for foto in lista_fotos_pedido(pedido) if foto.get("miniatura_url")]
+    if not miniaturas:
+        return
+    try:
+        if len(miniaturas) == 1:
+            st.image(miniaturas[0], width=FOTO_MINIATURA_MAX[0], caption=caption)
+        else:
+            st.image(
+                miniaturas, width=FOTO_GALERIA_LARGURA,
+                caption=[f"Foto {numero}" for numero in range(1, len(miniaturas) + 1)],
+            )
+    except Exception:
+        st.warning("⚠️ Não foi possível carregar as miniaturas deste pedido.")
+
+def mostrar_detalhe_pedido(pedido):
+    """Painel único com os dados do pedido selecionado na tabela"""
+    titulo, corpo = obter_cache_cartoes().obter(pedido)
+    with st.container(border=True):
+        st.markdown(f"**{titulo}**")
+        st.markdown(corpo, unsafe_allow_html=True)
+        mostrar_galeria_pedido(pedido)
+
+def mostrar_tabela_pedidos(pedidos, chave: str, colunas=COLUNAS_TABELA_COMPLETA):
+    """Todos os pedidos num único st.dataframe (ordenável) + detalhe da linha selecionada"""
+    # Busca rápida dentro do que já foi carregado (os filtros do servidor ficam em mostrar_filtros_pedidos)
+    texto = st.text_input("🔎 Procurar nesta lista", key=f"{chave}_texto", placeholder="ID, técnico, peça, nº série, OS...")
+
+    filtrados = filtrar_pedidos(pedidos, texto=texto)
+    if len(filtrados) != len(pedidos):
+        st.caption(f"{len(filtrados)} de {len(pedidos)} pedidos")
+
+    configuracao = {
+        "Data": st.column_config.DatetimeColumn("Data", format="DD/MM/YYYY HH:mm"),
+        "Foto": st.column_config.CheckboxColumn("📸", width="small"),
+    }
+    evento = st.dataframe(
+        colunas_tabela_pedidos(filtrados, colunas),
+        column_config={nome: config for nome, config in configuracao.items() if nome in colunas},
+        on_select="rerun",
+        selection_mode="single-row",
+        hide_index=True,
+        use_container_width=True,
+        key=f"{chave}_tabela",
+    )
+
+    # A seleção é por posição; se o filtro mudou, pode apontar para fora da lista
+    linhas = [i for i in evento.selection.rows if i < len(filtrados)]
+    if linhas:
+        mostrar_detalhe_pedido(detalhe_pedido(filtrados[linhas[0]]))
+    else:
+        st.caption("Selecione uma linha para ver os detalhes do pedido.")
+
+def mostrar_filtros_pedidos(chave: str):
+    """Filtros aplicados na consulta (where no Firestore); retorna (filtros, intervalo)"""
+    with st.expander("🔎 Filtros", expanded=False):
+        status = st.selectbox(
+            "Status",
+            ["Todos", *STATUS_PEDIDO],
+            format_func=lambda s: s if s == "Todos" else formatar_status(s),
+            key=f"{chave}_filtro_status",
+        )
+        tecnico = st.text_input("👤 Técnico", help="Nome exatamente como cadastrado", key=f"{chave}_filtro_tecnico")
+        ordem_servico = st.text_input("📄 OS", key=f"{chave}_filtro_os")
+        periodo = st.date_input(
+            "📅 Período", value=(), format="DD/MM/YYYY", key=f"{chave}_filtro_periodo",
+            help="Só pedidos com data de criação registrada (criado_em)",
+        )
+
+    filtros = {}
+    if status != "Todos":
+        filtros["status"] = status
+    if tecnico.strip():
+        filtros["tecnico"] = tecnico.strip()
+    if ordem_servico.strip():
+        filtros["ordem_servico"] = ordem_servico.strip()
+    intervalo = intervalo_datas(*periodo) if periodo else None
+    return filtros, intervalo
+
+def mostrar_cartoes_pedidos(pedidos):
+    """Um expander por pedido (visualização antiga, com miniaturas)"""
+    cache = obter_cache_cartoes()
+    for pedido in pedidos:
+        titulo, corpo = cache.obter(pedido)
+        with st.expander(titulo, expanded=False):
+            st.markdown(corpo, unsafe_allow_html=True)
+            mostrar_galeria_pedido(pedido)
+
+@medido("tela.sidebar_pedidos")
 def mostrar_sidebar_pedidos():
     """Sidebar APENAS para Atualizar Status - CONTEÚDO VISÍVEL"""
     st.sidebar.markdown("---")
     st.sidebar.subheader("📋 Lista de Pedidos")
 
-    pedidos_sidebar = listar_pedidos()
+    with st.sidebar:
+        filtros, intervalo = mostrar_filtros_pedidos("sidebar_pedidos")
+    pedidos_sidebar = listar_pedidos(filtros, intervalo)
+    mostrar_indicador_sincronizacao(st.sidebar)
 
     if not pedidos_sidebar:
         st.sidebar.info("📭 Nenhum pedido encontrado.")
         return
 
-    for pedido in pedidos_sidebar:
-        status_label = pedido.get("status") or "Pendente"
-        emoji_status = STATUS_EMOJIS.get(status_label, "⚪")
-        
-        # 🔥 TÍTULO MODIFICADO COM TÉCNICO E NÚMERO DE SÉRIE
-        tecnico = pedido.get('tecnico', '-') or '-'
-        numero_serie = pedido.get('numero_serie', '-') or '-'
-        
-        titulo_expander = f" **Status:** {emoji_status} {status_label} | 👤 Técnico: {tecnico} | 🔢 Nº Série: {numero_serie} | 🆔 ID: {pedido['id']}"
+    # Uma única tabela (em vez de um expander por pedido); o detalhe abre ao selecionar a linha
+    with st.sidebar:
+        mostrar_tabela_pedidos(pedidos_sidebar, "sidebar_pedidos", colunas=COLUNAS_TABELA_COMPACTA)
 
-        with st.sidebar.expander(titulo_expander, expanded=False):
-            # 🔥 CONTEÚDO DENTRO DO EXPANDER - AGORA VISÍVEL
-            
-            # Informações básicas
-            st.write(f"**👤 Técnico:** {tecnico}")
-            st.write(f"**🔧 Peça:** {pedido['peca'] or '-'}")
-            st.write(f"**💻 Modelo:** {pedido.get('modelo', '-')}")
-            st.write(f"**🔢 Nº Série:** {numero_serie}")
-            st.write(f"**📄 OS:** {pedido.get('ordem_servico', '-')}")
-            st.write(f"**📌 Status:** {emoji_status} {status_label}")
-            st.write(f"**📅 Data:** {pedido.get('data_criacao', '-')}")
-            
-            # Observações (se houver) - MESMO FORMATO DOS OUTROS CAMPOS
-            if pedido.get("observacoes"):
-                st.write(f"**📝 Observações:** {pedido['observacoes']}")
+def chave_envio_formulario(dados, fotos_info):
+    """Chave de idempotência do envio: sessão + hash do conteúdo do formulário
 
-            st.success(f"**🆔 ID PARA COPIAR:** `{pedido['id']}`")
-            
-            # Foto (se houver) - em expander separado para não ocupar muito espaço
-            if pedido.get("tem_foto") and pedido.get("foto_url"):
-                with st.expander("📸 Ver Foto", expanded=False):
-                    try:
-                        st.image(pedido["foto_url"], use_container_width=True)
-                    except Exception:
-                        st.warning("⚠️ Erro ao carregar foto")
+    Reenviar o mesmo conteúdo (clique duplo, rerun interrompido) repete a chave e
+    devolve o pedido já registrado; um pedido diferente nunca herda a chave de um
+    envio anterior, mesmo que a rotação de chave_envio_pedido não tenha acontecido.
+    """
+    conteudo = hashlib.sha256(json.dumps(dados, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    for foto_info in fotos_info or []:
+        conteudo.update(hashlib.sha256(foto_info["bytes"]).digest())
+    return f"{st.session_state.chave_envio_pedido}:{conteudo.hexdigest()[:32]}"
 
+@medido("tela.adicionar_pedido")
 def mostrar_formulario_adicionar_pedido():
     st.header("📝 Adicionar Novo Pedido")
     
@@ -412,27 +2709,29 @@ def mostrar_formulario_adicionar_pedido():
             observacoes = st.text_area("📝 Observações", help="Observações adicionais")
 
         st.markdown("---")
-        st.subheader("📸 Anexar Foto (Opcional)")
+        st.subheader("📸 Anexar Fotos (Opcional)")
 
-        uploaded_file = st.file_uploader(
-            "Selecione uma foto do equipamento/peça",
+        uploaded_files = st.file_uploader(
+            "Selecione fotos do equipamento/peça",
             type=["jpg", "jpeg", "png", "gif"],
-            help="Formatos suportadas: JPG, JPEG, PNG, GIF (máx. 5MB)",
+            accept_multiple_files=True,
+            help=f"Formatos suportadas: JPG, JPEG, PNG, GIF (máx. 15MB cada, até {FOTOS_MAX_POR_PEDIDO} fotos)",
         )
 
-        foto_info = None
-        if uploaded_file is not None:
-            foto_info = processar_upload_foto(uploaded_file, "preview")
-            if foto_info:
-                st.success("📸 Foto processada com sucesso!")
+        if len(uploaded_files or []) > FOTOS_MAX_POR_PEDIDO:
+            st.warning(f"⚠️ Máximo de {FOTOS_MAX_POR_PEDIDO} fotos por pedido: só as primeiras serão anexadas.")
+        # Todas as fotos processadas ao mesmo tempo (cada uma memorizada pelo hash)
+        fotos_info = processar_uploads_fotos((uploaded_files or [])[:FOTOS_MAX_POR_PEDIDO], "preview")
+        if fotos_info:
+            st.success(
+                "📸 Foto processada com sucesso!" if len(fotos_info) == 1
+                else f"📸 {len(fotos_info)} fotos processadas com sucesso!"
+            )
 
         submitted = st.form_submit_button("➕ Adicionar Pedido", type="primary")
 
         if submitted:
             if validar_formulario(tecnico, peca):
-                uploaded_bytes = foto_info["bytes"] if foto_info else None
-                nome_foto = foto_info["nome"] if foto_info else None
-                
                 dados = {
                     "tecnico": tecnico,
                     "peca": peca,
@@ -443,70 +2742,134 @@ def mostrar_formulario_adicionar_pedido():
                     "status": "Pendente",
                 }
                 
-                pedido_id = salvar_pedido(dados, uploaded_bytes, nome_foto)
-                if pedido_id:
-                    # Mostrar mensagem de sucesso e aguardar um pouco
-                    time.sleep(3)
-                    # Forçar rerun para limpar completamente
-                    st.rerun()
+                # clear_on_submit já limpa o formulário; a confirmação fica na tela.
+                # A chave da sessão só muda depois de registrado: um reenvio do mesmo
+                # conteúdo não duplica, e um conteúdo diferente sempre gera chave nova
+                if salvar_pedido(dados, fotos_info, chave_idempotencia=chave_envio_formulario(dados, fotos_info)):
+                    st.session_state.chave_envio_pedido = uuid.uuid4().hex
 
+@medido("tela.lista_pedidos")
 def mostrar_lista_pedidos():
     st.header("📋 Lista de Pedidos")
 
-    pedidos = listar_pedidos()
+    mostrar_indicador_sincronizacao()
 
-    if not pedidos:
-        st.info("📭 Nenhum pedido cadastrado no momento.")
+    modo = st.radio(
+        "Visualização", ["📊 Tabela", "🗂️ Cartões"], horizontal=True, key="modo_lista_pedidos"
+    )
+    modo_tabela = modo.startswith("📊")
+    if modo_tabela:
+        opcoes, padrao = OPCOES_TAMANHO_PAGINA_TABELA, TAMANHO_PAGINA_TABELA_PADRAO
+    else:
+        opcoes, padrao = OPCOES_TAMANHO_PAGINA, TAMANHO_PAGINA_PADRAO
+    tamanho = st.selectbox(
+        "Pedidos por página",
+        opcoes,
+        index=opcoes.index(padrao),
+        key=f"tamanho_pagina_pedidos_{'tabela' if modo_tabela else 'cartoes'}",
+    )
+    filtros, intervalo = mostrar_filtros_pedidos("lista_pedidos")
+
+    # Trocar o tamanho ou os filtros invalida os cursores já conhecidos
+    consulta = (tamanho, sorted(filtros.items()), intervalo)
+    if st.session_state.get("cursores_consulta") != consulta:
+        st.session_state.cursores_pedidos = [None]
+        st.session_state.cursores_consulta = consulta
+        st.session_state.pagina_pedidos = 0
+
+    pagina = st.session_state.pagina_pedidos
+    cursores = st.session_state.cursores_pedidos
+    # Os cartões mostram tudo (observações, fotos) de uma vez: só eles pedem os documentos completos
+    pedidos_pagina, proximo_cursor = listar_pedidos_pagina(
+        cursores[pagina], tamanho, filtros, intervalo, campos=CAMPOS_RESUMO if modo_tabela else None
+    )
+
+    # Guardar o cursor da próxima página (pré-carregado para navegação)
+    if proximo_cursor is not None:
+        if len(cursores) > pagina + 1:
+            cursores[pagina + 1] = proximo_cursor
+        else:
+            cursores.append(proximo_cursor)
+    else:
+        del cursores[pagina + 1:]
+
+    if not pedidos_pagina and pagina == 0:
+        if filtros or intervalo:
+            st.info("📭 Nenhum pedido encontrado com esses filtros.")
+        else:
+            st.info("📭 Nenhum pedido cadastrado no momento.")
         return
 
     st.markdown("### 📦 Pedidos cadastrados")
+    st.caption(f"Página {pagina + 1}")
     st.write("")
 
-    for pedido in pedidos:
-        status_label = pedido.get("status") or "Pendente"
-        emoji_status = STATUS_EMOJIS.get(status_label, "⚪")
-        titulo = (
-            f"{emoji_status} Pedido — Tecnico: {pedido['tecnico'] or '-'} "
-            f"— Nº de Série: {pedido['numero_serie'] or '-'} — Id: {pedido['id']}"
-        )
-
-        with st.expander(titulo, expanded=False):
-            st.write(f"**Data:** {pedido['data_criacao'] or '-'}")
-
-            col1, col2 = st.columns(2)
-
-            with col1:
-                st.markdown(f"**Técnico:** {pedido['tecnico'] or '-'}")
-                st.markdown(f"**Peça:** {pedido['peca'] or '-'}")
-                st.markdown(f"**Modelo:** {pedido['modelo'] or '-'}")
-                st.markdown(f"**ID:** {pedido['id'] or '-'}")
-
-            with col2:
-                st.markdown(f"**Nº Série:** {pedido['numero_serie'] or '-'}")
-                st.markdown(f"**OS:** {pedido['ordem_servico'] or '-'}")
-                st.markdown(f"**Status:** {formatar_status(status_label)}")
-
-            if pedido["observacoes"]:
-                st.markdown("**Observações:**")
-                st.markdown(
-                    f"<div style='background: rgba(255,255,255,0.02); "
-                    f"padding: 12px; border-radius: 8px; border: 1px solid rgba(255,255,255,0.03);'>"
-                    f"{pedido['observacoes']}</div>",
-                    unsafe_allow_html=True,
+    if modo_tabela:
+        mostrar_tabela_pedidos(pedidos_pagina, "lista_pedidos")
+    else:
+        mostrar_cartoes_pedidos(pedidos_pagina)
+
+    nav1, _, nav2 = st.columns([1, 4, 1])
+    with nav1:
+        if st.button("◀ Anterior", disabled=pagina == 0, key="pagina_anterior"):
+            st.session_state.pagina_pedidos = pagina - 1
+            st.rerun()
+    with nav2:
+        if st.button("Próxima ▶", disabled=proximo_cursor is None, key="pagina_proxima"):
+            st.session_state.pagina_pedidos = pagina + 1
+            st.rerun()
+
+    # Estatísticas gerais (lidas do documento de contadores)
+    mostrar_resumo_pedidos()
+
+    mostrar_exportacao_pedidos()
+
+@medido("tela.exportacao")
+def mostrar_exportacao_pedidos():
+    with st.expander("⬇️ Exportar pedidos", expanded=False):
+        formato = st.radio("Formato", ["csv", "jsonl"], horizontal=True, key="exportacao_formato")
+        if st.button("📦 Gerar arquivo", key="exportacao_gerar"):
+            anterior = st.session_state.pop("exportacao", None)
+            if anterior and os.path.exists(anterior["caminho"]):
+                os.unlink(anterior["caminho"])
+            # Gera em arquivo temporário página a página (sem montar a lista em memória)
+            arquivo = tempfile.NamedTemporaryFile(
+                mode="w+", encoding="utf-8", newline="", suffix=f".{formato}", delete=False
+            )
+            try:
+                with st.spinner("Exportando pedidos..."):
+                    inicio = time.perf_counter()
+                    total = exportar_pedidos(arquivo, formato)
+                    duracao = time.perf_counter() - inicio
+                arquivo.close()
+                st.session_state.exportacao = {"caminho": arquivo.name, "formato": formato, "total": total}
+                st.caption(f"{total} pedidos em {duracao:.1f}s")
+            except Exception as e:
+                arquivo.close()
+                os.unlink(arquivo.name)
+                st.error(f"❌ Erro ao exportar pedidos: {e}")
+
+        exportacao = st.session_state.get("exportacao")
+        if exportacao and os.path.exists(exportacao["caminho"]):
+            with open(exportacao["caminho"], "rb") as arquivo:
+                st.download_button(
+                    f"💾 Baixar {exportacao['total']} pedidos ({exportacao['formato'].upper()})",
+                    data=arquivo,
+                    file_name=f"pedidos_{datetime.now():%Y%m%d_%H%M}.{exportacao['formato']}",
+                    mime="text/csv" if exportacao["formato"] == "csv" else "application/jsonl",
+                    key="exportacao_baixar",
                 )
 
-            if pedido.get("tem_foto") and pedido.get("foto_url"):
-                try:
-                    st.image(pedido["foto_url"], use_container_width=True, caption="Foto do equipamento/peça")
-                except Exception:
-                    st.warning("⚠️ Não foi possível carregar a imagem deste pedido.")
-
-    # Estatísticas gerais
+@medido("tela.resumo")
+def mostrar_resumo_pedidos():
+    contadores = obter_contadores()
+    if contadores is None:
+        return
     try:
-        total_pedidos = len(pedidos)
-        pendentes = sum(1 for p in pedidos if p.get("status") == "Pendente")
-        solicitados = sum(1 for p in pedidos if p.get("status") == "Solicitado")
-        entregues = sum(1 for p in pedidos if p.get("status") == "Entregue")
+        total_pedidos = contadores["total"]
+        pendentes = contadores["Pendente"]
+        solicitados = contadores["Solicitado"]
+        entregues = contadores["Entregue"]
 
         st.markdown("### 📊 Resumo dos pedidos")
         c1, c2, c3, c4 = st.columns(4)
@@ -519,6 +2882,11 @@ def mostrar_lista_pedidos():
         with c4:
             taxa = (entregues / total_pedidos * 100) if total_pedidos > 0 else 0
             st.metric("🟢 Entregues", f"{entregues} ({taxa:.1f}%)")
+
+        if st.session_state.get("autorizado", False):
+            if st.button("🔄 Recalcular resumo", help="Recontar os pedidos no servidor"):
+                if reconciliar_contadores() is not None:
+                    st.rerun()
     except Exception as e:
         st.error(f"Erro ao calcular estatísticas: {e}")
 
@@ -540,17 +2908,160 @@ def mostrar_formulario_autenticacao():
             else:
                 st.error("❌ Senha incorreta. Tente novamente.")
 
+def mostrar_mensagem_flash():
+    """Mostra (uma vez) a mensagem deixada antes de um st.rerun()"""
+    mensagem = st.session_state.pop("mensagem_flash", None)
+    if mensagem:
+        st.success(mensagem)
+
+def resolver_identificadores(tokens):
+    """Converte IDs / nº de série colados em IDs de pedido.
+
+    Retorna (ids, erros) onde erros é lista de (token, motivo).
+    """
+    ids = []
+    erros = []
+    encontrados = {}  # ID candidato → pedido ou None (o mesmo ID não é buscado duas vezes)
+    for token in dict.fromkeys(tokens):
+        pedido = None
+        for pedido_id in ids_candidatos(token):
+            if pedido_id not in encontrados:
+                encontrados[pedido_id] = obter_pedido(pedido_id)
+            pedido = encontrados[pedido_id]
+            if pedido:
+                break
+        if pedido:
+            ids.append(pedido["id"])
+            continue
+        # Os IDs candidatos já foram testados acima: só falta o nº de série
+        serie = normalizar_numero_serie(token)
+        exatos = [
+            p for p in (pedidos_por_serie(serie, BUSCA_LIMITE_CANDIDATOS) if serie else [])
+            if normalizar_numero_serie(p.get("numero_serie")) == serie
+        ]
+        if len(exatos) == 1:
+            ids.append(exatos[0]["id"])
+        elif exatos:
+            erros.append((token, f"{len(exatos)} pedidos com esse Nº de Série — use o ID"))
+        else:
+            erros.append((token, "Nenhum pedido encontrado"))
+    return list(dict.fromkeys(ids)), erros
+
+@medido("tela.atualizacao_em_lote")
+def mostrar_atualizacao_em_lote():
+    st.subheader("Atualização em Lote")
+
+    modo = st.radio(
+        "Selecionar pedidos por",
+        ["📋 Colar / escanear IDs ou Nº de Série", "✅ Marcar na tabela"],
+        horizontal=True,
+        key="lote_modo",
+    )
+
+    if modo.startswith("📋"):
+        texto = st.text_area(
+            "IDs ou números de série",
+            help="Um por linha (leitor de código de barras) ou separados por vírgula / ponto e vírgula",
+            key="lote_texto",
+        )
+        tokens = [t.strip() for t in re.split(r"[\n,;]+", texto or "") if t.strip()]
+        # As abas rodam a cada rerun da página: as buscas só acontecem no clique,
+        # e o resultado fica na sessão enquanto o texto colado for o mesmo
+        if st.button("🔍 Verificar", key="lote_verificar", disabled=not tokens):
+            ids, erros = resolver_identificadores(tokens)
+            st.session_state.lote_resolucao = {"tokens": tokens, "ids": ids, "erros": erros}
+        resolucao = st.session_state.get("lote_resolucao")
+        if resolucao is not None and resolucao["tokens"] == tokens:
+            ids = resolucao["ids"]
+            for token, motivo in resolucao["erros"]:
+                st.warning(f"⚠️ `{token}`: {motivo}")
+        else:
+            ids = []
+            if tokens:
+                st.info("ℹ️ Clique em Verificar para localizar os pedidos colados.")
+    else:
+        status_filtro = st.selectbox(
+            "Status atual", STATUS_PEDIDO, index=1, format_func=formatar_status, key="lote_filtro"
+        )
+        # Idem para a lista: carregada ao escolher o status (ou no botão) e guardada na sessão
+        lista = st.session_state.get("lote_lista")
+        recarregar = st.button("🔄 Recarregar lista", key="lote_recarregar")
+        if recarregar or lista is None or lista["status"] != status_filtro:
+            lista = {
+                "status": status_filtro,
+                "tabela": [
+                    {
+                        "ID": p["id"],
+                        "Técnico": p.get("tecnico") or "-",
+                        "Peça": p.get("peca") or "-",
+                        "Nº Série": p.get("numero_serie") or "-",
+                        "Data": formatar_data_pedido(p),
+                    }
+                    for p in listar_pedidos(filtros={"status": status_filtro})
+                ],
+            }
+            st.session_state.lote_lista = lista
+        tabela = lista["tabela"]
+        # A seleção é por posição e o Streamlit a mantém entre reruns: a chave muda
+        # junto com as linhas (filtro, pedidos que entraram/saíram, lote aplicado),
+        # então uma seleção antiga nunca aponta para outros pedidos
+        conteudo = hashlib.sha1("\n".join(linha["ID"] for linha in tabela).encode()).hexdigest()[:12]
+        evento = st.dataframe(
+            tabela,
+            on_select="rerun",
+            selection_mode="multi-row",
+            hide_index=True,
+            use_container_width=True,
+            key=f"lote_tabela_{status_filtro}_{conteudo}_{st.session_state.get('lote_aplicacoes', 0)}",
+        )
+        ids = [tabela[i]["ID"] for i in evento.selection.rows if i < len(tabela)]
+
+    novo_status = st.selectbox("🔄 Novo Status", STATUS_PEDIDO, index=2, format_func=formatar_status, key="lote_novo_status")
+    st.write(f"**{len(ids)}** pedido(s) selecionado(s)")
+    if ids:
+        st.caption("IDs: " + escapar_markdown(", ".join(ids)))
+
+    if st.button("✅ Aplicar a todos", type="primary", disabled=not ids, key="lote_aplicar"):
+        with st.spinner("Atualizando pedidos..."):
+            resultados = atualizar_status_em_lote(ids, novo_status)
+        # Nova chave para a tabela: a seleção aplicada não vale para o próximo lote.
+        # A lista guardada já não reflete os status novos: recarregar no próximo rerun
+        st.session_state.lote_aplicacoes = st.session_state.get("lote_aplicacoes", 0) + 1
+        st.session_state.pop("lote_lista", None)
+
+        sucessos = sum(1 for _, ok, _ in resultados if ok)
+        falhas = len(resultados) - sucessos
+        if falhas:
+            st.warning(f"⚠️ {sucessos} atualizado(s), {falhas} com falha")
+        else:
+            st.success(f"✅ {sucessos} pedido(s) atualizado(s) para {formatar_status(novo_status)}")
+        st.dataframe(
+            [{"ID": i, "Resultado": "✅" if ok else "❌", "Detalhe": msg} for i, ok, msg in resultados],
+            hide_index=True,
+            use_container_width=True,
+        )
+
 def mostrar_formulario_atualizacao_status():
+    aba_individual, aba_lote = st.tabs(["🔎 Individual", "📦 Em lote"])
+    with aba_lote:
+        mostrar_atualizacao_em_lote()
+    with aba_individual:
+        mostrar_atualizacao_individual()
+
+    # 🔥 SIDEBAR
+    mostrar_sidebar_pedidos()
+
+@medido("tela.atualizacao_individual")
+def mostrar_atualizacao_individual():
     with st.container():
         st.subheader("Atualizar Status do Pedido")
-
-        pedidos = listar_pedidos()
+        mostrar_mensagem_flash()
 
         with st.form("form_atualizacao_status"):
             # 🔥 BUSCA FLEXÍVEL - ID OU NÚMERO DE SÉRIE
             valor_busca = st.text_input(
-                "🔎 ID (8 caracteres) OU Número de Série *", 
-                help="Digite o ID de 8 caracteres OU o número de série completo"
+                "🔎 ID do pedido OU Número de Série *", 
+                help="Digite o ID do pedido (maiúsculas ou minúsculas) OU o início do número de série"
             )
 
             opcoes_status = [f"{STATUS_EMOJIS[s]} {s}" for s in STATUS_PEDIDO]
@@ -561,60 +3072,228 @@ def mostrar_formulario_atualizacao_status():
 
         # 🔥 MOVER A LÓGICA DE PROCESSAMENTO PARA FORA DO FORMULÁRIO
         if submitted:
+            st.session_state.busca_status = None
             if not valor_busca.strip():
                 st.warning("⚠️ Por favor, informe o ID ou Número de Série.")
-                
-            elif not pedidos:
-                st.error("Nenhum pedido encontrado para atualizar.")
-                
             else:
-                pedido_encontrado = None
-                valor_busca_clean = valor_busca.strip().lower()
-                
-                # 🔥 BUSCA FLEXÍVEL - PRIMEIRO POR ID, DEPOIS POR NÚMERO DE SÉRIE
-                for pedido in pedidos:
-                    # Busca por ID exato
-                    if pedido.get("id") and pedido["id"].lower() == valor_busca_clean:
-                        pedido_encontrado = pedido
-                        break
-                    
-                    # Busca por número de série (exato ou parcial)
-                    if (pedido.get("numero_serie") and 
-                        valor_busca_clean in pedido["numero_serie"].lower()):
-                        pedido_encontrado = pedido
-                        break
-
-                if not pedido_encontrado:
+                candidatos = buscar_pedidos(valor_busca)
+                if not candidatos:
                     st.error("❌ Nenhum pedido encontrado com os dados informados.")
-                    
                 else:
-                    pedido_id_real = pedido_encontrado.get("id")
-                    if not pedido_id_real:
-                        st.error("❌ Pedido encontrado, mas sem ID válido.")
-                        
-                    else:
-                        # Mostrar confirmação ANTES de atualizar
-                        st.success(f"✅ Pedido encontrado!")
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.write(f"**👤 Técnico:** {pedido_encontrado.get('tecnico', '-')}")
-                            st.write(f"**🔧 Peça:** {pedido_encontrado.get('peca', '-')}")
-                            st.write(f"**💻 Modelo:** {pedido_encontrado.get('modelo', '-')}")
-                        with col2:
-                            st.write(f"**🔢 Nº Série:** {pedido_encontrado.get('numero_serie', '-')}")
-                            st.write(f"**📄 OS:** {pedido_encontrado.get('ordem_servico', '-')}")
-                            st.write(f"**🆔 ID:** `{pedido_id_real}`")
-                        
-                        st.write(f"**Status atual:** {formatar_status(pedido_encontrado.get('status'))} → **Novo status:** {novo_status_formatado}")
-                        
-                        # Botão de confirmação final
-                        if st.button("✅ Confirmar Atualização", type="primary"):
-                            if atualizar_status(pedido_id_real, novo_status):
-                                time.sleep(2)
-                                st.rerun()
+                    # Guardar o resultado para o clique de confirmação (que é outro rerun)
+                    st.session_state.busca_status = {
+                        "candidatos": candidatos,
+                        "novo_status": novo_status,
+                    }
+
+        busca = st.session_state.get("busca_status")
+        if busca:
+            candidatos = busca["candidatos"]
+            novo_status = busca["novo_status"]
+
+            if len(candidatos) == 1:
+                st.success("✅ Pedido encontrado!")
+                indice = 0
+            else:
+                st.info(f"🔎 {len(candidatos)} pedidos encontrados — selecione o correto:")
+                indice = st.radio(
+                    "Pedidos encontrados",
+                    range(len(candidatos)),
+                    format_func=lambda i: (
+                        f"{obter_emoji_status(candidatos[i][0].get('status'))} "
+                        f"{candidatos[i][0].get('numero_serie') or '-'} · "
+                        f"{candidatos[i][0].get('tecnico') or '-'} · "
+                        f"ID {candidatos[i][0]['id']} ({candidatos[i][1]})"
+                    ),
+                    label_visibility="collapsed",
+                )
 
-    # 🔥 SIDEBAR
-    mostrar_sidebar_pedidos()
+            pedido_encontrado = candidatos[indice][0]
+            pedido_id_real = pedido_encontrado["id"]
+
+            # Mostrar confirmação ANTES de atualizar
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write(f"**👤 Técnico:** {pedido_encontrado.get('tecnico', '-')}")
+                st.write(f"**🔧 Peça:** {pedido_encontrado.get('peca', '-')}")
+                st.write(f"**💻 Modelo:** {pedido_encontrado.get('modelo', '-')}")
+            with col2:
+                st.write(f"**🔢 Nº Série:** {pedido_encontrado.get('numero_serie', '-')}")
+                st.write(f"**📄 OS:** {pedido_encontrado.get('ordem_servico', '-')}")
+                st.write(f"**🆔 ID:** `{pedido_id_real}`")
+
+            st.write(f"**Status atual:** {formatar_status(pedido_encontrado.get('status'))} → **Novo status:** {formatar_status(novo_status)}")
+
+            # Botão de confirmação final
+            if st.button("✅ Confirmar Atualização", type="primary"):
+                if atualizar_status(pedido_id_real, novo_status):
+                    st.session_state.busca_status = None
+                    st.session_state.mensagem_flash = (
+                        f"✅ Status do pedido {pedido_id_real} atualizado para {novo_status}"
+                    )
+                    st.rerun()
+
+def mostrar_pagina_manutencao():
+    """Arquivamento de pedidos entregues e limpeza de fotos (mesma senha do Atualizar Status)"""
+    st.header("🧹 Manutenção")
+    if not st.session_state.get("autorizado", False):
+        mostrar_formulario_autenticacao()
+        return
+
+    st.subheader("Arquivar pedidos entregues")
+    caminho = caminho_checkpoint_limpeza()
+    pendente = ler_checkpoint_limpeza(caminho)
+    if pendente:
+        st.info(
+            f"⏸️ Execução anterior parada na fase '{pendente['fase']}' "
+            f"(corte {pendente['corte'].astimezone():%d/%m/%Y}); o botão continua dela."
+        )
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        dias = st.number_input(
+            "Dias sem alteração",
+            min_value=1,
+            value=int(obter_config("ARQUIVAMENTO_DIAS", ARQUIVAMENTO_DIAS)),
+            disabled=pendente is not None,
+        )
+    with col2:
+        opcoes_fotos = ["apagar", "NEARLINE", "COLDLINE", "ARCHIVE"]
+        modo_padrao = obter_config("FOTOS_ARQUIVADAS", FOTOS_ARQUIVADAS)
+        modo_fotos = st.selectbox(
+            "Fotos dos arquivados",
+            opcoes_fotos,
+            index=opcoes_fotos.index(modo_padrao) if modo_padrao in opcoes_fotos else 0,
+            format_func=lambda m: "🗑️ Apagar" if m == "apagar" else f"🧊 Mover para {m}",
+        )
+    with col3:
+        max_lotes = st.number_input("Lotes por execução", min_value=1, value=LIMPEZA_LOTES_POR_CLIQUE)
+    dry_run = st.checkbox("Só simular (dry-run)", value=True)
+
+    if st.button("🧹 Executar limpeza", type="primary"):
+        mensagens = []
+        with st.spinner("Arquivando pedidos e verificando fotos..."):
+            resultado = executar_limpeza(
+                caminho, dias=dias, modo_fotos=modo_fotos, dry_run=dry_run,
+                max_lotes=int(max_lotes), relatorio=mensagens.append,
+            )
+        if resultado["falhas"]:
+            st.warning(mensagens[-1])
+        else:
+            st.success(mensagens[-1])
+        with st.expander("📜 Detalhes"):
+            st.text("\n".join(mensagens))
+
+    st.divider()
+    st.subheader("🔎 Buscar no arquivo")
+    valor_busca = st.text_input("ID, Nº de série ou OS", key="busca_arquivo")
+    if valor_busca:
+        encontrados = buscar_arquivados(valor_busca)
+        if not encontrados:
+            st.info("📭 Nenhum pedido arquivado encontrado.")
+        else:
+            st.dataframe(
+                [
+                    {
+                        "ID": p["id"],
+                        "Técnico": p.get("tecnico") or "-",
+                        "Peça": p.get("peca") or "-",
+                        "Nº Série": p.get("numero_serie") or "-",
+                        "OS": p.get("ordem_servico") or "-",
+                        "Criado": formatar_data_pedido(p),
+                        "Arquivado": p["arquivado_em"].astimezone().strftime("%d/%m/%Y") if p.get("arquivado_em") else "-",
+                    }
+                    for p in encontrados
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+
+def mostrar_painel_desempenho():
+    """Painel de desempenho (mesma senha do Atualizar Status)"""
+    st.header("⏱️ Desempenho")
+    if not st.session_state.get("autorizado", False):
+        mostrar_formulario_autenticacao()
+        return
+
+    metricas = obter_metricas()
+    resumo = metricas.resumo()
+    st.caption(
+        f"Medições deste processo (pid {os.getpid()}) desde "
+        f"{datetime.fromtimestamp(metricas.inicio).strftime('%d/%m/%Y %H:%M:%S')}"
+    )
+    if not resumo:
+        st.info("📭 Nenhuma medição ainda.")
+        return
+
+    st.dataframe(
+        [
+            {
+                "Trecho": nome,
+                "Chamadas": dados["chamadas"],
+                "p50 (ms)": round(dados["ms_p50"], 1),
+                "p95 (ms)": round(dados["ms_p95"], 1),
+                "Máx (ms)": round(dados["ms_max"], 1),
+                "Erros": dados["erros"],
+                "Docs lidos": dados["documentos_lidos"],
+                "Docs/chamada": round(dados["documentos_lidos"] / dados["chamadas"], 1),
+            }
+            for nome, dados in resumo.items()
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    st.subheader("Inicialização a frio")
+    inicializacao = obter_relatorio_inicializacao().resumo()
+    if inicializacao["primeira_renderizacao_ms"] is not None:
+        st.caption(f"Primeira tela renderizada em {inicializacao['primeira_renderizacao_ms']:.0f} ms")
+    st.dataframe(
+        [
+            {"Tipo": tipo, "Nome": nome, "ms": round(ms, 1)}
+            for tipo, tempos in (
+                ("importação", inicializacao["importacoes_ms"]), ("etapa", inicializacao["etapas_ms"])
+            )
+            for nome, ms in sorted(tempos.items(), key=lambda item: item[1], reverse=True)
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    st.subheader("Execuções recentes")
+    st.dataframe(
+        [
+            {
+                "Data": execucao["data"],
+                "Página": execucao["pagina"],
+                "Total (ms)": execucao["ms"],
+                "Docs lidos": execucao["documentos_lidos"],
+                "Trechos mais lentos": ", ".join(
+                    f"{nome} {dados['ms']:.0f}ms"
+                    for nome, dados in sorted(
+                        execucao["spans"].items(), key=lambda item: item[1]["ms"], reverse=True
+                    )[:3]
+                ),
+            }
+            for execucao in metricas.execucoes()
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button(
+            "⬇️ JSON", metricas.como_json(), file_name="desempenho.json", mime="application/json"
+        )
+    with col2:
+        st.download_button(
+            "⬇️ Prometheus", metricas.como_prometheus(), file_name="desempenho.prom", mime="text/plain"
+        )
+    with col3:
+        if st.button("🧹 Zerar medições"):
+            metricas.limpar()
+            st.rerun()
 
 # =============================================================================
 # MAIN
@@ -622,24 +3301,46 @@ def mostrar_formulario_atualizacao_status():
 def inicializar_session_state():
     if "autorizado" not in st.session_state:
         st.session_state.autorizado = False
+    if "pagina_pedidos" not in st.session_state:
+        st.session_state.pagina_pedidos = 0
+    if "cursores_pedidos" not in st.session_state:
+        st.session_state.cursores_pedidos = [None]
+    if "busca_status" not in st.session_state:
+        st.session_state.busca_status = None
+    if "chave_envio_pedido" not in st.session_state:
+        st.session_state.chave_envio_pedido = uuid.uuid4().hex
 
 def main():
-    configurar_pagina()
-    inicializar_session_state()
+    # Cada rerun é uma execução no painel de desempenho (com os spans e leituras dela)
+    metricas = obter_metricas()
+    metricas.iniciar_execucao()
+    relatorio = obter_relatorio_inicializacao()
+    iniciar_aquecimento()
+    menu = None
+    try:
+        configurar_pagina()
+        inicializar_session_state()
 
-    st.title("📦 Controle de Pedidos de Peças Usadas")
-    
-    menu = st.sidebar.selectbox(
-        "📂 Menu",
-        ["Adicionar Pedido", "Visualizar Pedidos", "Atualizar Status"],
-    )
+        st.title("📦 Controle de Pedidos de Peças Usadas")
+        
+        menu = st.sidebar.selectbox(
+            "📂 Menu",
+            ["Adicionar Pedido", "Visualizar Pedidos", "Atualizar Status", "Manutenção", "Desempenho"],
+        )
 
-    if menu == "Adicionar Pedido":
-        mostrar_formulario_adicionar_pedido()
-    elif menu == "Visualizar Pedidos":
-        mostrar_lista_pedidos()
-    elif menu == "Atualizar Status":
-        mostrar_pagina_atualizar_status()
+        if menu == "Adicionar Pedido":
+            mostrar_formulario_adicionar_pedido()
+        elif menu == "Visualizar Pedidos":
+            mostrar_lista_pedidos()
+        elif menu == "Atualizar Status":
+            mostrar_pagina_atualizar_status()
+        elif menu == "Manutenção":
+            mostrar_pagina_manutencao()
+        elif menu == "Desempenho":
+            mostrar_painel_desempenho()
+    finally:
+        metricas.finalizar_execucao(menu or "-")
+        relatorio.marcar_primeira_renderizacao()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,1169 @@
+# armazenamento.py - BACKENDS DE ARMAZENAMENTO DE PEDIDOS E FOTOS
+#
+# O app só conversa com RepositorioPedidos / RepositorioFotos. Em produção são
+# Firestore + Cloud Storage; para rodar offline, testar carga ou medir
+# desempenho num notebook há a versão SQLite + diretório local, com a mesma
+# ordenação, filtros e paginação.
+#
+# Este módulo não usa Streamlit: erros sobem como exceções e quem chama decide
+# como mostrá-los.
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import urllib.parse
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+COLECAO_PEDIDOS = "pedidos"
+
+# Campos gravados como timestamp nativo (datetime com fuso). status_em guarda
+# {status: momento em que o pedido entrou nele}.
+CAMPOS_DATA = ["criado_em", "atualizado_em", "arquivado_em"]
+CAMPO_ORDENACAO = "criado_em"
+
+# Pedidos arquivados: documento completo em COLECAO_ARQUIVO e um resumo pequeno
+# (para buscas) em COLECAO_INDICE_ARQUIVO, ambos com o mesmo ID do pedido
+COLECAO_ARQUIVO = "pedidos_arquivados"
+COLECAO_INDICE_ARQUIVO = "indice_arquivo"
+CAMPOS_INDICE_ARQUIVO = [
+    "tecnico", "peca", "modelo", "numero_serie", "numero_serie_normalizado", "ordem_servico",
+    "status", "data_criacao", "criado_em", "arquivado_em", "foto_url", "fotos_urls",
+]
+
+def normalizar_numero_serie(numero_serie):
+    """Nº de série em minúsculas, só letras e dígitos (chave de busca por prefixo)"""
+    if not numero_serie:
+        return ""
+    return re.sub(r"[^0-9a-z]", "", str(numero_serie).lower())
+
+def resumo_arquivo(pedido):
+    """Entrada do índice do arquivo para um pedido (pedidos antigos ganham o nº de série normalizado)"""
+    resumo = {"id": pedido["id"], **{campo: pedido.get(campo) for campo in CAMPOS_INDICE_ARQUIVO}}
+    if resumo["numero_serie_normalizado"] is None:
+        resumo["numero_serie_normalizado"] = normalizar_numero_serie(pedido.get("numero_serie"))
+    return resumo
+
+# Fotos com nome = hash do conteúdo nunca mudam: o navegador/CDN pode guardar para sempre
+CACHE_CONTROL_IMUTAVEL = "public, max-age=31536000, immutable"
+
+class ErroArmazenamento(Exception):
+    """Erro genérico de backend"""
+
+class ConflitoConcorrencia(ErroArmazenamento):
+    """Um pedido mudou entre a leitura e a escrita (precondição falhou)"""
+
+class PedidoJaExiste(ErroArmazenamento):
+    """criar() encontrou um pedido com o mesmo ID (nada foi gravado)"""
+
+# =============================================================================
+# INTERFACES
+# =============================================================================
+class RepositorioPedidos:
+    """Acesso aos pedidos.
+
+    Ordem padrão das listagens: (criado_em, id) decrescente. O cursor de
+    paginação é a tupla (criado_em, id) do último pedido da página anterior.
+    Pedidos sem criado_em (anteriores à migração de datas) não aparecem nas
+    listagens ordenadas; listar_por_id os alcança.
+
+    As escritas de status/campos carimbam atualizado_em e, quando o status
+    muda, status_em.<novo status>.
+    """
+
+    suporta_listener = False
+
+    def obter(self, pedido_id: str):
+        """Pedido pelo ID, ou None"""
+        raise NotImplementedError
+
+    def listar(self, filtros: dict = None, cursor=None, limite: int = None, ordenar: bool = True,
+               intervalo=None, campos=None):
+        """Pedidos que batem com os filtros de igualdade {campo: valor}.
+
+        intervalo: (campo, inicio, fim) com inicio <= campo < fim (None = aberto).
+        Com intervalo a ordem passa a ser (campo, id) decrescente e o cursor é
+        (valor do campo, id) - exigência do Firestore para filtros de faixa.
+        campos: projeção - só esses campos (mais o id) vêm do backend.
+        """
+        raise NotImplementedError
+
+    def buscar_prefixo_serie(self, prefixo: str, limite: int):
+        """Pedidos cujo numero_serie_normalizado começa com `prefixo`"""
+        raise NotImplementedError
+
+    def listar_por_id(self, apos_id: str = None, limite: int = None):
+        """Todos os pedidos em ordem de ID, após `apos_id` (varredura retomável)"""
+        raise NotImplementedError
+
+    def criar(self, pedido: dict):
+        """Grava um pedido novo e incrementa os contadores na mesma escrita atômica.
+
+        Nunca sobrescreve: levanta PedidoJaExiste se o ID já estiver em uso, então
+        repetir a mesma criação não duplica o pedido nem os contadores.
+        """
+        raise NotImplementedError
+
+    def atualizar(self, pedido_id: str, campos: dict):
+        """Atualiza campos de um pedido existente (sem mexer nos contadores)"""
+        raise NotImplementedError
+
+    def atualizar_status(self, pedido_id: str, novo_status: str) -> bool:
+        """Troca o status e move os contadores (transação); False se não existir"""
+        raise NotImplementedError
+
+    def aplicar_status_bloco(self, pedido_ids, novo_status: str):
+        """Troca o status de vários pedidos numa escrita atômica.
+
+        Retorna {pedido_id: (resultado, status_anterior)} com resultado em
+        "atualizado", "inalterado" ou "nao_encontrado". Levanta
+        ConflitoConcorrencia se algum pedido mudou durante a operação.
+        """
+        raise NotImplementedError
+
+    def gravar_lote(self, pedidos):
+        """Grava (sobrescreve) vários pedidos; retorna lista de (pedido_id, erro) das falhas"""
+        raise NotImplementedError
+
+    def criar_lote(self, pedidos):
+        """Cria vários pedidos sem sobrescrever nenhum (nem mexer nos contadores).
+
+        Retorna (ids que já existiam, lista de (pedido_id, erro) das falhas).
+        """
+        raise NotImplementedError
+
+    def atualizar_lote(self, campos_por_id: dict):
+        """Atualização parcial {pedido_id: campos} sem carimbar atualizado_em (migrações)
+
+        Retorna lista de (pedido_id, erro) das falhas.
+        """
+        raise NotImplementedError
+
+    def arquivar(self, pedido_ids, status_esperado: str, campos: dict = None):
+        """Move pedidos para o arquivo (documento + resumo no índice) numa escrita atômica.
+
+        Só arquiva os que ainda estão em `status_esperado`; `campos` é aplicado à
+        cópia arquivada. Desconta os contadores. Retorna os pedidos arquivados
+        como estavam antes de `campos`. Levanta ConflitoConcorrencia se algum
+        pedido mudou durante a operação.
+        """
+        raise NotImplementedError
+
+    def obter_arquivado(self, pedido_id: str):
+        """Pedido arquivado completo, ou None"""
+        raise NotImplementedError
+
+    def buscar_arquivo(self, filtros: dict, limite: int):
+        """Resumos do índice do arquivo que batem com os filtros de igualdade"""
+        raise NotImplementedError
+
+    def listar_indice_arquivo_por_id(self, apos_id: str = None, limite: int = None):
+        """Resumos do índice do arquivo em ordem de ID, após `apos_id` (varredura retomável)"""
+        raise NotImplementedError
+
+    def atualizar_indice_arquivo_lote(self, campos_por_id: dict):
+        """Atualização parcial {pedido_id: campos} de resumos do arquivo (migrações); retorna as falhas"""
+        raise NotImplementedError
+
+    def foto_referenciada(self, url: str, incluir_arquivo: bool = True) -> bool:
+        """Se algum pedido (ou resumo arquivado) ainda aponta para a foto (foto_url ou fotos_urls).
+
+        Com fotos endereçadas por conteúdo vários pedidos podem usar o mesmo
+        arquivo: esta consulta é a referência reversa antes de apagar um.
+        """
+        raise NotImplementedError
+
+    def contadores(self):
+        """{"total": n, <status>: n, ...} ou None se ainda não foram calculados"""
+        raise NotImplementedError
+
+    def recontar(self):
+        """Recalcula os contadores a partir dos pedidos e os regrava"""
+        raise NotImplementedError
+
+    def ouvir(self, callback):
+        """Assina alterações na coleção.
+
+        callback recebe uma lista de (tipo, pedido_id, pedido) com tipo em
+        ADDED / MODIFIED / REMOVED. Retorna um objeto com `is_active` e
+        `unsubscribe()`, ou None se o backend não tiver listener.
+        """
+        return None
+
+class RepositorioFotos:
+    """Acesso aos arquivos de foto"""
+
+    def enviar(self, nome: str, dados: bytes, content_type: str = "image/jpeg") -> str:
+        """Grava o arquivo (leitura pública) e retorna a URL"""
+        raise NotImplementedError
+
+    def enviar_se_ausente(self, nome: str, dados: bytes, content_type: str = "image/jpeg"):
+        """Para nomes derivados do conteúdo: só envia se ainda não existir. Retorna (url, enviado)"""
+        if self.existe(nome):
+            return self.url(nome), False
+        return self.enviar(nome, dados, content_type), True
+
+    def existe(self, nome: str) -> bool:
+        raise NotImplementedError
+
+    def baixar(self, nome: str) -> bytes:
+        raise NotImplementedError
+
+    def listar(self, prefixo: str):
+        """Nomes dos arquivos diretamente sob `prefixo` (sem subpastas)"""
+        raise NotImplementedError
+
+    def url(self, nome: str) -> str:
+        raise NotImplementedError
+
+    def nome_da_url(self, url: str):
+        """Inverso de url(); None se a URL não for deste repositório"""
+        raise NotImplementedError
+
+    def listar_detalhado(self, prefixo: str, apos: str = None):
+        """(nome, criado_em) dos arquivos diretamente sob `prefixo`, em ordem de nome, após `apos`"""
+        raise NotImplementedError
+
+    def apagar(self, nome: str):
+        """Remove o arquivo (sem erro se já não existir)"""
+        raise NotImplementedError
+
+    def mudar_classe(self, nome: str, classe: str):
+        """Move o arquivo para uma classe de armazenamento mais barata (ex.: ARCHIVE)"""
+        raise NotImplementedError
+
+# =============================================================================
+# FIRESTORE + CLOUD STORAGE
+# =============================================================================
+class RepositorioPedidosFirestore(RepositorioPedidos):
+    suporta_listener = True
+
+    def __init__(self, client, status_validos, colecao_contadores="contadores_pedidos", fragmentos=1):
+        self.client = client
+        self.status_validos = list(status_validos)
+        self.colecao_contadores = colecao_contadores
+        self.fragmentos = fragmentos
+
+    def _colecao(self):
+        return self.client.collection(COLECAO_PEDIDOS)
+
+    @staticmethod
+    def _para_dict(doc):
+        pedido = doc.to_dict() or {}
+        pedido["id"] = doc.id
+        return pedido
+
+    # ---- leitura -----------------------------------------------------------
+    def obter(self, pedido_id):
+        doc = self._colecao().document(pedido_id).get()
+        return self._para_dict(doc) if doc.exists else None
+
+    def listar(self, filtros=None, cursor=None, limite=None, ordenar=True, intervalo=None, campos=None):
+        from google.cloud.firestore import Query
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        query = self._colecao()
+        for campo, valor in (filtros or {}).items():
+            query = query.where(filter=FieldFilter(campo, "==", valor))
+        campo_ordem = CAMPO_ORDENACAO
+        if intervalo is not None:
+            campo_ordem, inicio, fim = intervalo
+            if inicio is not None:
+                query = query.where(filter=FieldFilter(campo_ordem, ">=", inicio))
+            if fim is not None:
+                query = query.where(filter=FieldFilter(campo_ordem, "<", fim))
+        if ordenar:
+            query = query.order_by(campo_ordem, direction=Query.DESCENDING).order_by(
+                "__name__", direction=Query.DESCENDING
+            )
+            if cursor is not None:
+                valor, pedido_id = cursor
+                query = query.start_after({campo_ordem: valor, "__name__": pedido_id})
+        if campos is not None:
+            query = query.select(campos)
+        if limite:
+            query = query.limit(limite)
+        return [self._para_dict(doc) for doc in query.stream()]
+
+    def buscar_prefixo_serie(self, prefixo, limite):
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        query = (
+            self._colecao()
+            .where(filter=FieldFilter("numero_serie_normalizado", ">=", prefixo))
+            .where(filter=FieldFilter("numero_serie_normalizado", "<", prefixo + "\uf8ff"))
+            .limit(limite)
+        )
+        return [self._para_dict(doc) for doc in query.stream()]
+
+    def listar_por_id(self, apos_id=None, limite=None):
+        query = self._colecao().order_by("__name__")
+        if apos_id is not None:
+            query = query.start_after({"__name__": apos_id})
+        if limite:
+            query = query.limit(limite)
+        return [self._para_dict(doc) for doc in query.stream()]
+
+    def ouvir(self, callback):
+        def _ao_receber(snapshot, alteracoes, read_time):
+            callback([
+                (
+                    alteracao.type.name,
+                    alteracao.document.id,
+                    None if alteracao.type.name == "REMOVED" else self._para_dict(alteracao.document),
+                )
+                for alteracao in alteracoes
+            ])
+
+        return self._colecao().on_snapshot(_ao_receber)
+
+    # ---- contadores --------------------------------------------------------
+    def _ref_fragmento(self, indice=None):
+        """Fragmento do contador (aleatório se não informado) - espalha a contenção de escrita"""
+        if indice is None:
+            indice = random.randrange(self.fragmentos)
+        return self.client.collection(self.colecao_contadores).document(f"status_{indice}")
+
+    def _incrementos(self, deltas: dict):
+        from google.cloud import firestore
+
+        return {campo: firestore.Increment(valor) for campo, valor in deltas.items() if valor}
+
+    def _contadores_vazios(self):
+        return {"total": 0, **{status: 0 for status in self.status_validos}}
+
+    @staticmethod
+    def _carimbos(novo_status=None):
+        """atualizado_em (e status_em.<status>) com o horário do servidor"""
+        from google.cloud import firestore
+
+        carimbos = {"atualizado_em": firestore.SERVER_TIMESTAMP}
+        if novo_status is not None:
+            carimbos[f"status_em.{novo_status}"] = firestore.SERVER_TIMESTAMP
+        return carimbos
+
+    def contadores(self):
+        refs = [self._ref_fragmento(i) for i in range(self.fragmentos)]
+        contadores = self._contadores_vazios()
+        encontrou = False
+        for doc in self.client.get_all(refs):
+            if not doc.exists:
+                continue
+            encontrou = True
+            dados = doc.to_dict() or {}
+            for campo in contadores:
+                contadores[campo] += int(dados.get(campo, 0) or 0)
+        return contadores if encontrou else None
+
+    @staticmethod
+    def _contar_no_servidor(query):
+        """Agregação count() no Firestore (não baixa os documentos)"""
+        resultado = query.count(alias="total").get()
+        return int(resultado[0][0].value)
+
+    def recontar(self):
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        colecao = self._colecao()
+        contadores = {"total": self._contar_no_servidor(colecao)}
+        for status in self.status_validos:
+            contadores[status] = self._contar_no_servidor(
+                colecao.where(filter=FieldFilter("status", "==", status))
+            )
+
+        batch = self.client.batch()
+        for i in range(self.fragmentos):
+            batch.set(self._ref_fragmento(i), contadores if i == 0 else self._contadores_vazios())
+        batch.commit()
+        return contadores
+
+    # ---- escrita -----------------------------------------------------------
+    def criar(self, pedido):
+        from google.api_core import exceptions as google_exceptions
+
+        batch = self.client.batch()
+        batch.create(self._colecao().document(pedido["id"]), pedido)
+        deltas = {"total": 1}
+        if pedido.get("status") in self.status_validos:
+            deltas[pedido["status"]] = 1
+        batch.set(self._ref_fragmento(), self._incrementos(deltas), merge=True)
+        try:
+            batch.commit()
+        except google_exceptions.AlreadyExists as e:
+            raise PedidoJaExiste(pedido["id"]) from e
+
+    def atualizar(self, pedido_id, campos):
+        self._colecao().document(pedido_id).update({**campos, **self._carimbos()})
+
+    def atualizar_status(self, pedido_id, novo_status):
+        from google.cloud import firestore
+
+        doc_ref = self._colecao().document(pedido_id)
+
+        @firestore.transactional
+        def _atualizar(transaction):
+            doc = doc_ref.get(transaction=transaction)
+            if not doc.exists:
+                return False
+            status_anterior = (doc.to_dict() or {}).get("status")
+            if status_anterior == novo_status:
+                return True
+            transaction.update(doc_ref, {"status": novo_status, **self._carimbos(novo_status)})
+            deltas = {novo_status: 1}
+            if status_anterior in self.status_validos:
+                deltas[status_anterior] = -1
+            transaction.set(self._ref_fragmento(), self._incrementos(deltas), merge=True)
+            return True
+
+        return _atualizar(self.client.transaction())
+
+    def aplicar_status_bloco(self, pedido_ids, novo_status):
+        """get_all + WriteBatch com precondição last_update_time em cada pedido"""
+        from google.api_core import exceptions as google_exceptions
+
+        colecao = self._colecao()
+        resultados = {}
+        deltas = {status: 0 for status in self.status_validos}
+        batch = self.client.batch()
+        gravados = 0
+
+        for doc in self.client.get_all([colecao.document(i) for i in pedido_ids]):
+            if not doc.exists:
+                resultados[doc.id] = ("nao_encontrado", None)
+                continue
+            status_anterior = (doc.to_dict() or {}).get("status")
+            if status_anterior == novo_status:
+                resultados[doc.id] = ("inalterado", status_anterior)
+                continue
+            batch.update(
+                doc.reference,
+                {"status": novo_status, **self._carimbos(novo_status)},
+                option=self.client.write_option(last_update_time=doc.update_time),
+            )
+            resultados[doc.id] = ("atualizado", status_anterior)
+            gravados += 1
+            if status_anterior in deltas:
+                deltas[status_anterior] -= 1
+            deltas[novo_status] += 1
+
+        if gravados:
+            batch.set(self._ref_fragmento(), self._incrementos(deltas), merge=True)
+            try:
+                batch.commit()
+            except google_exceptions.FailedPrecondition as e:
+                raise ConflitoConcorrencia(str(e)) from e
+        return resultados
+
+    def gravar_lote(self, pedidos):
+        colecao = self._colecao()
+        falhas = []
+
+        def _ao_falhar(falha, _bulk_writer):
+            if falha.attempts < 5:
+                return True
+            falhas.append((falha.operation.reference.id, falha.message))
+            return False
+
+        bulk_writer = self.client.bulk_writer()
+        bulk_writer.on_write_error(_ao_falhar)
+        for pedido in pedidos:
+            bulk_writer.set(colecao.document(pedido["id"]), pedido)
+        bulk_writer.close()
+        return falhas
+
+    def criar_lote(self, pedidos):
+        from google.rpc import code_pb2
+
+        colecao = self._colecao()
+        existentes = []
+        falhas = []
+
+        def _ao_falhar(falha, _bulk_writer):
+            if falha.code == code_pb2.ALREADY_EXISTS:
+                existentes.append(falha.operation.reference.id)
+                return False
+            if falha.attempts < 5:
+                return True
+            falhas.append((falha.operation.reference.id, falha.message))
+            return False
+
+        bulk_writer = self.client.bulk_writer()
+        bulk_writer.on_write_error(_ao_falhar)
+        for pedido in pedidos:
+            bulk_writer.create(colecao.document(pedido["id"]), pedido)
+        bulk_writer.close()
+        return existentes, falhas
+
+    def atualizar_lote(self, campos_por_id):
+        colecao = self._colecao()
+        falhas = []
+
+        def _ao_falhar(falha, _bulk_writer):
+            if falha.attempts < 5:
+                return True
+            falhas.append((falha.operation.reference.id, falha.message))
+            return False
+
+        bulk_writer = self.client.bulk_writer()
+        bulk_writer.on_write_error(_ao_falhar)
+        for pedido_id, campos in campos_por_id.items():
+            bulk_writer.update(colecao.document(pedido_id), campos)
+        bulk_writer.close()
+        return falhas
+
+    # ---- arquivo -----------------------------------------------------------
+    def arquivar(self, pedido_ids, status_esperado, campos=None):
+        """get_all + WriteBatch; a remoção tem precondição last_update_time (como no status em bloco)"""
+        from google.api_core import exceptions as google_exceptions
+
+        colecao = self._colecao()
+        arquivo = self.client.collection(COLECAO_ARQUIVO)
+        indice = self.client.collection(COLECAO_INDICE_ARQUIVO)
+        batch = self.client.batch()
+        arquivados = []
+
+        for doc in self.client.get_all([colecao.document(i) for i in pedido_ids]):
+            if not doc.exists:
+                continue
+            pedido = self._para_dict(doc)
+            if pedido.get("status") != status_esperado:
+                continue
+            registro = {**pedido, **(campos or {})}
+            batch.set(arquivo.document(doc.id), registro)
+            batch.set(indice.document(doc.id), resumo_arquivo(registro))
+            batch.delete(doc.reference, option=self.client.write_option(last_update_time=doc.update_time))
+            arquivados.append(pedido)
+
+        if arquivados:
+            deltas = {"total": -len(arquivados)}
+            if status_esperado in self.status_validos:
+                deltas[status_esperado] = -len(arquivados)
+            batch.set(self._ref_fragmento(), self._incrementos(deltas), merge=True)
+            try:
+                batch.commit()
+            except google_exceptions.FailedPrecondition as e:
+                raise ConflitoConcorrencia(str(e)) from e
+        return arquivados
+
+    def obter_arquivado(self, pedido_id):
+        doc = self.client.collection(COLECAO_ARQUIVO).document(pedido_id).get()
+        return self._para_dict(doc) if doc.exists else None
+
+    def listar_indice_arquivo_por_id(self, apos_id=None, limite=None):
+        query = self.client.collection(COLECAO_INDICE_ARQUIVO).order_by("__name__")
+        if apos_id is not None:
+            query = query.start_after({"__name__": apos_id})
+        if limite:
+            query = query.limit(limite)
+        return [self._para_dict(doc) for doc in query.stream()]
+
+    def atualizar_indice_arquivo_lote(self, campos_por_id):
+        indice = self.client.collection(COLECAO_INDICE_ARQUIVO)
+        falhas = []
+
+        def _ao_falhar(falha, _bulk_writer):
+            if falha.attempts < 5:
+                return True
+            falhas.append((falha.operation.reference.id, falha.message))
+            return False
+
+        bulk_writer = self.client.bulk_writer()
+        bulk_writer.on_write_error(_ao_falhar)
+        for pedido_id, campos in campos_por_id.items():
+            bulk_writer.update(indice.document(pedido_id), campos)
+        bulk_writer.close()
+        return falhas
+
+    def buscar_arquivo(self, filtros, limite):
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        query = self.client.collection(COLECAO_INDICE_ARQUIVO)
+        for campo, valor in filtros.items():
+            query = query.where(filter=FieldFilter(campo, "==", valor))
+        return [self._para_dict(doc) for doc in query.limit(limite).stream()]
+
+    def foto_referenciada(self, url, incluir_arquivo=True):
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        # foto_url: pedidos de uma foto só (anteriores a fotos_urls); fotos_urls: todas as fotos
+        for colecao in (COLECAO_PEDIDOS, COLECAO_INDICE_ARQUIVO) if incluir_arquivo else (COLECAO_PEDIDOS,):
+            for filtro in (FieldFilter("foto_url", "==", url), FieldFilter("fotos_urls", "array_contains", url)):
+                query = self.client.collection(colecao).where(filter=filtro).limit(1)
+                if any(True for _ in query.stream()):
+                    return True
+        return False
+
+class RepositorioFotosStorage(RepositorioFotos):
+    def __init__(self, client, bucket_name):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.bucket = client.bucket(bucket_name)
+
+    def enviar(self, nome, dados, content_type="image/jpeg"):
+        # predefined_acl já deixa público no próprio upload (sem make_public depois)
+        blob = self.bucket.blob(nome)
+        blob.upload_from_string(dados, content_type=content_type, predefined_acl="publicRead")
+        return blob.public_url
+
+    def enviar_se_ausente(self, nome, dados, content_type="image/jpeg"):
+        from google.api_core import exceptions as google_exceptions
+
+        blob = self.bucket.blob(nome)
+        if blob.exists():
+            return blob.public_url, False
+        blob.cache_control = CACHE_CONTROL_IMUTAVEL
+        try:
+            # if_generation_match=0: só cria; se outro upload igual chegou antes, fica o dele
+            blob.upload_from_string(
+                dados, content_type=content_type, predefined_acl="publicRead", if_generation_match=0
+            )
+        except google_exceptions.PreconditionFailed:
+            return blob.public_url, False
+        return blob.public_url, True
+
+    def existe(self, nome):
+        return self.bucket.blob(nome).exists()
+
+    def baixar(self, nome):
+        return self.bucket.blob(nome).download_as_bytes()
+
+    def listar(self, prefixo):
+        # delimiter="/" lista só o nível direto (subpastas ficam em .prefixes)
+        for blob in self.client.list_blobs(self.bucket_name, prefix=prefixo, delimiter="/"):
+            yield blob.name
+
+    def url(self, nome):
+        return self.bucket.blob(nome).public_url
+
+    def nome_da_url(self, url):
+        base = f"https://storage.googleapis.com/{self.bucket_name}/"
+        if not url or not url.startswith(base):
+            return None
+        return urllib.parse.unquote(url[len(base):])
+
+    def listar_detalhado(self, prefixo, apos=None):
+        # start_offset é inclusivo
+        for blob in self.client.list_blobs(self.bucket_name, prefix=prefixo, delimiter="/", start_offset=apos):
+            if blob.name != apos:
+                yield blob.name, blob.time_created
+
+    def apagar(self, nome):
+        from google.api_core import exceptions as google_exceptions
+
+        try:
+            self.bucket.blob(nome).delete()
+        except google_exceptions.NotFound:
+            pass
+
+    def mudar_classe(self, nome, classe):
+        # Reescreve o objeto no próprio bucket com a nova classe (URL não muda)
+        self.bucket.blob(nome).update_storage_class(classe)
+
+# =============================================================================
+# SQLITE + DIRETÓRIO LOCAL
+# =============================================================================
+# Campos com coluna própria (e índice) para filtros e ordenação
+COLUNAS_SQLITE = ["data_criacao", "status", "tecnico", "ordem_servico", "numero_serie_normalizado", "foto_url"]
+COLUNAS_INDICE_ARQUIVO_SQLITE = ["numero_serie_normalizado", "ordem_servico", "foto_url"]
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS pedidos (
+    id TEXT PRIMARY KEY,
+    data_criacao TEXT NOT NULL DEFAULT '',
+    status TEXT,
+    tecnico TEXT,
+    ordem_servico TEXT,
+    numero_serie_normalizado TEXT,
+    foto_url TEXT,
+    versao INTEGER NOT NULL DEFAULT 1,
+    dados TEXT NOT NULL
+);
+DROP INDEX IF EXISTS idx_pedidos_data;
+DROP INDEX IF EXISTS idx_pedidos_status;
+DROP INDEX IF EXISTS idx_pedidos_tecnico;
+DROP INDEX IF EXISTS idx_pedidos_os;
+CREATE INDEX IF NOT EXISTS idx_pedidos_criado_em ON pedidos (json_extract(dados, '$.criado_em') DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_pedidos_status_criado_em
+    ON pedidos (status, json_extract(dados, '$.criado_em') DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_pedidos_tecnico_criado_em
+    ON pedidos (tecnico, json_extract(dados, '$.criado_em') DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_pedidos_os_criado_em
+    ON pedidos (ordem_servico, json_extract(dados, '$.criado_em') DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_pedidos_serie ON pedidos (numero_serie_normalizado);
+CREATE INDEX IF NOT EXISTS idx_pedidos_foto ON pedidos (foto_url);
+CREATE INDEX IF NOT EXISTS idx_pedidos_status_atualizado_em
+    ON pedidos (status, json_extract(dados, '$.atualizado_em') DESC, id DESC);
+CREATE TABLE IF NOT EXISTS pedidos_arquivados (
+    id TEXT PRIMARY KEY,
+    dados TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS indice_arquivo (
+    id TEXT PRIMARY KEY,
+    numero_serie_normalizado TEXT,
+    ordem_servico TEXT,
+    foto_url TEXT,
+    dados TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_indice_arquivo_serie ON indice_arquivo (numero_serie_normalizado);
+CREATE INDEX IF NOT EXISTS idx_indice_arquivo_os ON indice_arquivo (ordem_servico);
+CREATE INDEX IF NOT EXISTS idx_indice_arquivo_foto ON indice_arquivo (foto_url);
+CREATE TABLE IF NOT EXISTS fotos_pedidos (
+    url TEXT NOT NULL,
+    pedido_id TEXT NOT NULL,
+    arquivado INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (url, pedido_id)
+);
+CREATE INDEX IF NOT EXISTS idx_fotos_pedidos_pedido ON fotos_pedidos (pedido_id);
+CREATE TABLE IF NOT EXISTS contadores (
+    campo TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+"""
+
+class RepositorioPedidosSQLite(RepositorioPedidos):
+    """Mesma semântica do Firestore: strings comparadas byte a byte (collation BINARY)"""
+
+    def __init__(self, caminho, status_validos):
+        self.caminho = caminho
+        self.status_validos = list(status_validos)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._conexao().executescript(ESQUEMA_SQLITE)
+
+    def _conexao(self):
+        """Uma conexão por thread (sqlite3 não compartilha conexões entre threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transacao(self):
+        conn = self._conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _coluna(campo, colunas=COLUNAS_SQLITE):
+        if campo in colunas:
+            return campo
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", campo):
+            raise ErroArmazenamento(f"Campo inválido: {campo}")
+        return f"json_extract(dados, '$.{campo}')"
+
+    @classmethod
+    def _valor(cls, valor):
+        """datetime vira texto ISO em UTC (mesmo formato sempre: compara na ordem certa)"""
+        if isinstance(valor, datetime):
+            if valor.tzinfo is None:
+                valor = valor.astimezone()
+            return valor.astimezone(timezone.utc).isoformat(timespec="microseconds")
+        if isinstance(valor, dict):
+            return {chave: cls._valor(item) for chave, item in valor.items()}
+        return valor
+
+    @classmethod
+    def _para_dict(cls, linha, campos=None):
+        if campos is None:
+            return cls._decodificar(json.loads(linha[0]))
+        return cls._decodificar(dict(zip([*campos, "id"], json.loads(linha[0]))))
+
+    @staticmethod
+    def _decodificar(pedido):
+        for campo in CAMPOS_DATA:
+            if isinstance(pedido.get(campo), str):
+                pedido[campo] = datetime.fromisoformat(pedido[campo])
+        if isinstance(pedido.get("status_em"), dict):
+            pedido["status_em"] = {
+                status: datetime.fromisoformat(momento) if isinstance(momento, str) else momento
+                for status, momento in pedido["status_em"].items()
+            }
+        return pedido
+
+    @staticmethod
+    def _carimbar(pedido, novo_status=None):
+        agora = datetime.now(timezone.utc)
+        pedido["atualizado_em"] = agora
+        if novo_status is not None:
+            pedido["status_em"] = {**(pedido.get("status_em") or {}), novo_status: agora}
+        return pedido
+
+    @staticmethod
+    def _projecao(campos):
+        """Expressão do SELECT: o JSON inteiro, ou um json_extract com vários caminhos
+        (devolve um array e lê o documento uma vez só)"""
+        if campos is None:
+            return "dados"
+        caminhos = [*campos, "id"]  # com 2+ caminhos o resultado é sempre um array
+        for campo in caminhos:
+            if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", campo):
+                raise ErroArmazenamento(f"Campo inválido: {campo}")
+        return "json_extract(dados, " + ", ".join(f"'$.{campo}'" for campo in caminhos) + ")"
+
+    def _json(self, pedido):
+        return json.dumps(
+            {campo: self._valor(valor) for campo, valor in pedido.items()}, ensure_ascii=False, default=str
+        )
+
+    def _gravar(self, conn, pedido, versao=1):
+        conn.execute(
+            "INSERT OR REPLACE INTO pedidos (id, data_criacao, status, tecnico, ordem_servico, "
+            "numero_serie_normalizado, foto_url, versao, dados) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                pedido["id"],
+                pedido.get("data_criacao") or "",
+                pedido.get("status"),
+                pedido.get("tecnico"),
+                pedido.get("ordem_servico"),
+                pedido.get("numero_serie_normalizado"),
+                pedido.get("foto_url"),
+                versao,
+                self._json(pedido),
+            ),
+        )
+        self._gravar_fotos(conn, pedido["id"], pedido.get("fotos_urls"))
+
+    @staticmethod
+    def _gravar_fotos(conn, pedido_id, urls, arquivado=0):
+        """fotos_urls de cada pedido numa tabela indexada (o JSON não tem índice por elemento)"""
+        conn.execute("DELETE FROM fotos_pedidos WHERE pedido_id = ?", (pedido_id,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO fotos_pedidos (url, pedido_id, arquivado) VALUES (?, ?, ?)",
+            [(url, pedido_id, arquivado) for url in urls or [] if url],
+        )
+
+    def _incrementar(self, conn, deltas):
+        conn.executemany(
+            "INSERT INTO contadores (campo, valor) VALUES (?, ?) "
+            "ON CONFLICT(campo) DO UPDATE SET valor = valor + excluded.valor",
+            [(campo, valor) for campo, valor in deltas.items() if valor],
+        )
+
+    # ---- leitura -----------------------------------------------------------
+    def obter(self, pedido_id):
+        linha = self._conexao().execute("SELECT dados FROM pedidos WHERE id = ?", (pedido_id,)).fetchone()
+        return self._para_dict(linha) if linha else None
+
+    def listar(self, filtros=None, cursor=None, limite=None, ordenar=True, intervalo=None, campos=None):
+        condicoes, parametros = [], []
+        for campo, valor in (filtros or {}).items():
+            condicoes.append(f"{self._coluna(campo)} = ?")
+            parametros.append(self._valor(valor))
+        coluna_ordem = self._coluna(CAMPO_ORDENACAO)
+        if intervalo is not None:
+            campo, inicio, fim = intervalo
+            coluna_ordem = self._coluna(campo)
+            if inicio is not None:
+                condicoes.append(f"{coluna_ordem} >= ?")
+                parametros.append(self._valor(inicio))
+            if fim is not None:
+                condicoes.append(f"{coluna_ordem} < ?")
+                parametros.append(self._valor(fim))
+        if ordenar and cursor is not None:
+            condicoes.append(f"({coluna_ordem}, id) < (?, ?)")
+            parametros.extend(self._valor(valor) for valor in cursor)
+
+        sql = f"SELECT {self._projecao(campos)} FROM pedidos"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        if ordenar:
+            sql += f" ORDER BY {coluna_ordem} DESC, id DESC"
+        if limite:
+            sql += " LIMIT ?"
+            parametros.append(limite)
+        return [self._para_dict(linha, campos) for linha in self._conexao().execute(sql, parametros)]
+
+    def buscar_prefixo_serie(self, prefixo, limite):
+        linhas = self._conexao().execute(
+            "SELECT dados FROM pedidos WHERE numero_serie_normalizado >= ? AND numero_serie_normalizado < ? "
+            "ORDER BY numero_serie_normalizado LIMIT ?",
+            (prefixo, prefixo + "\uf8ff", limite),
+        )
+        return [self._para_dict(linha) for linha in linhas]
+
+    def listar_por_id(self, apos_id=None, limite=None):
+        sql, parametros = "SELECT dados FROM pedidos", []
+        if apos_id is not None:
+            sql += " WHERE id > ?"
+            parametros.append(apos_id)
+        sql += " ORDER BY id"
+        if limite:
+            sql += " LIMIT ?"
+            parametros.append(limite)
+        return [self._para_dict(linha) for linha in self._conexao().execute(sql, parametros)]
+
+    # ---- contadores --------------------------------------------------------
+    def contadores(self):
+        linhas = self._conexao().execute("SELECT campo, valor FROM contadores").fetchall()
+        if not linhas:
+            return None
+        contadores = {"total": 0, **{status: 0 for status in self.status_validos}}
+        contadores.update(dict(linhas))
+        return contadores
+
+    def recontar(self):
+        with self._transacao() as conn:
+            contadores = {"total": conn.execute("SELECT COUNT(*) FROM pedidos").fetchone()[0]}
+            for status in self.status_validos:
+                contadores[status] = conn.execute(
+                    "SELECT COUNT(*) FROM pedidos WHERE status = ?", (status,)
+                ).fetchone()[0]
+            conn.execute("DELETE FROM contadores")
+            conn.executemany("INSERT INTO contadores (campo, valor) VALUES (?, ?)", contadores.items())
+        return contadores
+
+    # ---- escrita -----------------------------------------------------------
+    def criar(self, pedido):
+        with self._transacao() as conn:
+            if conn.execute("SELECT 1 FROM pedidos WHERE id = ?", (pedido["id"],)).fetchone():
+                raise PedidoJaExiste(pedido["id"])
+            self._gravar(conn, pedido)
+            deltas = {"total": 1}
+            if pedido.get("status") in self.status_validos:
+                deltas[pedido["status"]] = 1
+            self._incrementar(conn, deltas)
+
+    def _ler_para_escrita(self, conn, pedido_id):
+        linha = conn.execute("SELECT dados, versao FROM pedidos WHERE id = ?", (pedido_id,)).fetchone()
+        if linha is None:
+            return None, None
+        return json.loads(linha[0]), linha[1]
+
+    def atualizar(self, pedido_id, campos):
+        with self._transacao() as conn:
+            pedido, versao = self._ler_para_escrita(conn, pedido_id)
+            if pedido is None:
+                raise ErroArmazenamento(f"Pedido {pedido_id} não encontrado")
+            self._gravar(conn, self._carimbar({**pedido, **campos}), versao + 1)
+
+    def atualizar_status(self, pedido_id, novo_status):
+        resultados = self.aplicar_status_bloco([pedido_id], novo_status)
+        return resultados[pedido_id][0] != "nao_encontrado"
+
+    def aplicar_status_bloco(self, pedido_ids, novo_status):
+        # BEGIN IMMEDIATE serializa os escritores: não há conflito a reportar
+        resultados = {}
+        deltas = {status: 0 for status in self.status_validos}
+        with self._transacao() as conn:
+            for pedido_id in pedido_ids:
+                pedido, versao = self._ler_para_escrita(conn, pedido_id)
+                if pedido is None:
+                    resultados[pedido_id] = ("nao_encontrado", None)
+                    continue
+                status_anterior = pedido.get("status")
+                if status_anterior == novo_status:
+                    resultados[pedido_id] = ("inalterado", status_anterior)
+                    continue
+                self._gravar(conn, self._carimbar({**pedido, "status": novo_status}, novo_status), versao + 1)
+                resultados[pedido_id] = ("atualizado", status_anterior)
+                if status_anterior in deltas:
+                    deltas[status_anterior] -= 1
+                deltas[novo_status] += 1
+            self._incrementar(conn, deltas)
+        return resultados
+
+    def gravar_lote(self, pedidos):
+        with self._transacao() as conn:
+            for pedido in pedidos:
+                self._gravar(conn, pedido)
+        return []
+
+    def criar_lote(self, pedidos):
+        existentes = []
+        with self._transacao() as conn:
+            for pedido in pedidos:
+                if conn.execute("SELECT 1 FROM pedidos WHERE id = ?", (pedido["id"],)).fetchone():
+                    existentes.append(pedido["id"])
+                    continue
+                self._gravar(conn, pedido)
+        return existentes, []
+
+    def atualizar_lote(self, campos_por_id):
+        falhas = []
+        with self._transacao() as conn:
+            for pedido_id, campos in campos_por_id.items():
+                pedido, versao = self._ler_para_escrita(conn, pedido_id)
+                if pedido is None:
+                    falhas.append((pedido_id, "Pedido não encontrado"))
+                    continue
+                self._gravar(conn, {**pedido, **campos}, versao + 1)
+        return falhas
+
+    # ---- arquivo -----------------------------------------------------------
+    def arquivar(self, pedido_ids, status_esperado, campos=None):
+        arquivados = []
+        with self._transacao() as conn:
+            for pedido_id in pedido_ids:
+                linha = conn.execute("SELECT dados FROM pedidos WHERE id = ?", (pedido_id,)).fetchone()
+                if linha is None:
+                    continue
+                pedido = self._para_dict(linha)
+                if pedido.get("status") != status_esperado:
+                    continue
+                registro = {**pedido, **(campos or {})}
+                resumo = resumo_arquivo(registro)
+                conn.execute(
+                    "INSERT OR REPLACE INTO pedidos_arquivados (id, dados) VALUES (?, ?)",
+                    (pedido_id, self._json(registro)),
+                )
+                self._gravar_resumo_arquivo(conn, resumo)
+                conn.execute("DELETE FROM pedidos WHERE id = ?", (pedido_id,))
+                self._gravar_fotos(conn, pedido_id, resumo["fotos_urls"], arquivado=1)
+                arquivados.append(pedido)
+            if arquivados:
+                deltas = {"total": -len(arquivados)}
+                if status_esperado in self.status_validos:
+                    deltas[status_esperado] = -len(arquivados)
+                self._incrementar(conn, deltas)
+        return arquivados
+
+    def _gravar_resumo_arquivo(self, conn, resumo):
+        conn.execute(
+            "INSERT OR REPLACE INTO indice_arquivo (id, numero_serie_normalizado, ordem_servico, "
+            "foto_url, dados) VALUES (?, ?, ?, ?, ?)",
+            (
+                resumo["id"],
+                resumo.get("numero_serie_normalizado"),
+                resumo.get("ordem_servico"),
+                resumo.get("foto_url"),
+                self._json(resumo),
+            ),
+        )
+
+    def listar_indice_arquivo_por_id(self, apos_id=None, limite=None):
+        sql, parametros = "SELECT dados FROM indice_arquivo", []
+        if apos_id is not None:
+            sql += " WHERE id > ?"
+            parametros.append(apos_id)
+        sql += " ORDER BY id"
+        if limite:
+            sql += " LIMIT ?"
+            parametros.append(limite)
+        return [self._para_dict(linha) for linha in self._conexao().execute(sql, parametros)]
+
+    def atualizar_indice_arquivo_lote(self, campos_por_id):
+        falhas = []
+        with self._transacao() as conn:
+            for pedido_id, campos in campos_por_id.items():
+                linha = conn.execute("SELECT dados FROM indice_arquivo WHERE id = ?", (pedido_id,)).fetchone()
+                if linha is None:
+                    falhas.append((pedido_id, "Resumo arquivado não encontrado"))
+                    continue
+                self._gravar_resumo_arquivo(conn, {**json.loads(linha[0]), **campos})
+        return falhas
+
+    def obter_arquivado(self, pedido_id):
+        linha = self._conexao().execute(
+            "SELECT dados FROM pedidos_arquivados WHERE id = ?", (pedido_id,)
+        ).fetchone()
+        return self._para_dict(linha) if linha else None
+
+    def buscar_arquivo(self, filtros, limite):
+        condicoes, parametros = [], []
+        for campo, valor in filtros.items():
+            condicoes.append(f"{self._coluna(campo, COLUNAS_INDICE_ARQUIVO_SQLITE)} = ?")
+            parametros.append(self._valor(valor))
+        sql = "SELECT dados FROM indice_arquivo"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        sql += " ORDER BY id LIMIT ?"
+        parametros.append(limite)
+        return [self._para_dict(linha) for linha in self._conexao().execute(sql, parametros)]
+
+    def foto_referenciada(self, url, incluir_arquivo=True):
+        conn = self._conexao()
+        if any(
+            conn.execute(f"SELECT 1 FROM {tabela} WHERE foto_url = ? LIMIT 1", (url,)).fetchone()
+            for tabela in (("pedidos", "indice_arquivo") if incluir_arquivo else ("pedidos",))
+        ):
+            return True
+        sql = "SELECT 1 FROM fotos_pedidos WHERE url = ?" + ("" if incluir_arquivo else " AND arquivado = 0")
+        return conn.execute(sql + " LIMIT 1", (url,)).fetchone() is not None
+
+class RepositorioFotosLocal(RepositorioFotos):
+    """Fotos num diretório local; a "URL" é o caminho do arquivo (st.image aceita)"""
+
+    def __init__(self, diretorio):
+        self.diretorio = os.path.abspath(diretorio)
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def _caminho(self, nome):
+        caminho = os.path.abspath(os.path.join(self.diretorio, nome))
+        if not caminho.startswith(self.diretorio + os.sep):
+            raise ErroArmazenamento(f"Nome de arquivo inválido: {nome}")
+        return caminho
+
+    def enviar(self, nome, dados, content_type="image/jpeg"):
+        caminho = self._caminho(nome)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, "wb") as arquivo:
+            arquivo.write(dados)
+        os.replace(temporario, caminho)
+        return caminho
+
+    def enviar_se_ausente(self, nome, dados, content_type="image/jpeg"):
+        caminho = self._caminho(nome)
+        if os.path.isfile(caminho):
+            return caminho, False
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, "wb") as arquivo:
+            arquivo.write(dados)
+        try:
+            # link() falha se o destino já existe: criação atômica como o if_generation_match=0
+            os.link(temporario, caminho)
+            return caminho, True
+        except FileExistsError:
+            return caminho, False
+        finally:
+            os.remove(temporario)
+
+    def existe(self, nome):
+        return os.path.isfile(self._caminho(nome))
+
+    def baixar(self, nome):
+        with open(self._caminho(nome), "rb") as arquivo:
+            return arquivo.read()
+
+    def listar(self, prefixo):
+        pasta = self._caminho(prefixo) if prefixo.rstrip("/") else self.diretorio
+        if not os.path.isdir(pasta):
+            return
+        for entrada in sorted(os.scandir(pasta), key=lambda e: e.name):
+            if entrada.is_file() and not entrada.name.endswith(".tmp"):
+                yield prefixo + entrada.name
+
+    def url(self, nome):
+        return self._caminho(nome)
+
+    def nome_da_url(self, url):
+        if not url or not url.startswith(self.diretorio + os.sep):
+            return None
+        return os.path.relpath(url, self.diretorio).replace(os.sep, "/")
+
+    def listar_detalhado(self, prefixo, apos=None):
+        for nome in self.listar(prefixo):
+            if apos is None or nome > apos:
+                criado_em = datetime.fromtimestamp(os.path.getmtime(self._caminho(nome)), timezone.utc)
+                yield nome, criado_em
+
+    def apagar(self, nome):
+        try:
+            os.remove(self._caminho(nome))
+        except FileNotFoundError:
+            pass
+
+    def mudar_classe(self, nome, classe):
+        # Disco local não tem classes de armazenamento: o arquivo fica como está
+        pass
@@ -0,0 +1,574 @@
+# benchmark.py - MEDIÇÕES DE DESEMPENHO DO CONTROLE DE PEDIDOS
+#
+# Uso:
+#   python benchmark.py fotos [--repeticoes 5] [--saida resultados.json]
+#   python benchmark.py pedidos [--quantidades 1000 10000 100000] [--repeticoes 5]
+#                               [--fracao-fotos 0.3] [--semente 42] [--sem-paginas] [--saida resultados.json]
+#   python benchmark.py salvar [--fotos 0 1 3] [--repeticoes 10] [--latencia-ms 100] [--saida resultados.json]
+#
+# Roda contra o backend local (SQLite + fotos em disco) num diretório temporário,
+# com dados sintéticos gerados a partir de uma semente fixa: não precisa de secrets
+# e os resultados de duas versões do app podem ser comparados diretamente.
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+CAMINHO_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# =============================================================================
+# UTILITÁRIOS
+# =============================================================================
+def configurar_backend_local(diretorio: str):
+    """Aponta o app para um SQLite + pasta de fotos + dados locais descartáveis (antes de importar o app)"""
+    os.environ["PARTFLOW_BACKEND"] = "sqlite"
+    os.environ["PARTFLOW_SQLITE_CAMINHO"] = os.path.join(diretorio, "pedidos.sqlite3")
+    os.environ["PARTFLOW_FOTOS_DIRETORIO"] = os.path.join(diretorio, "fotos")
+    # Fila de pedidos, emails e checkpoints também descartáveis (nunca os do diretório atual)
+    os.environ["PARTFLOW_DADOS_LOCAIS"] = diretorio
+    # Os eventos de INFO do app (uma linha por execução/upload) misturariam-se à tabela
+    os.environ.setdefault("PARTFLOW_LOG_NIVEL", "WARNING")
+
+def rss_pico_mb():
+    """Pico de memória residente do processo (ru_maxrss é KB no Linux, bytes no macOS)"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if platform.system() == "Darwin" else 1024
+    return pico / divisor
+
+def resumir_tempos(tempos_ms):
+    """Mediana, p95 e máximo de uma lista de tempos em ms"""
+    ordenados = sorted(tempos_ms)
+    p95 = ordenados[min(len(ordenados) - 1, round(0.95 * (len(ordenados) - 1)))]
+    return {
+        "ms_mediana": statistics.median(ordenados),
+        "ms_p95": p95,
+        "ms_max": ordenados[-1],
+        "execucoes": len(ordenados),
+    }
+
+def cronometrar(funcao, repeticoes: int):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return resumir_tempos(tempos)
+
+def versao_codigo():
+    """Commit atual (para saber qual versão gerou o arquivo de resultados)"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(CAMINHO_APP), capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def rodar_em_processo(alvo, *args):
+    """Roda a medição num processo 'spawn' próprio (RSS e caches isolados) e devolve o resultado"""
+    contexto = multiprocessing.get_context("spawn")
+    fila = contexto.Queue()
+    processo = contexto.Process(target=alvo, args=(*args, fila))
+    processo.start()
+    resultado = fila.get()
+    processo.join()
+    return resultado
+
+# =============================================================================
+# FOTOS
+# =============================================================================
+CLASSES_FOTO = {
+    "VGA (0.3MP)": (640, 480),
+    "2MP": (1600, 1200),
+    "12MP": (4000, 3000),
+    "24MP": (6000, 4000),
+}
+
+def gerar_foto_sintetica(largura: int, altura: int) -> bytes:
+    """JPEG com gradiente + ruído (comprime como foto real) e orientação EXIF 6"""
+    from PIL import Image
+
+    base = Image.linear_gradient("L").resize((largura, altura))
+    ruido = Image.effect_noise((max(largura // 8, 1), max(altura // 8, 1)), 40).resize((largura, altura))
+    imagem = Image.merge("RGB", (base, ruido, base.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: girar 90°
+    buffered = io.BytesIO()
+    imagem.save(buffered, format="JPEG", quality=90, exif=exif)
+    return buffered.getvalue()
+
+def _medir_classe_foto(nome, tamanho, repeticoes, fila):
+    """Roda em processo próprio para que o pico de RSS seja só desta classe"""
+    diretorio = tempfile.mkdtemp(prefix="partflow-bench-")
+    configurar_backend_local(diretorio)
+    from app import processar_bytes_foto, processar_upload_foto
+
+    dados = gerar_foto_sintetica(*tamanho)
+    rss_inicial = rss_pico_mb()
+
+    def _upload():
+        arquivo = io.BytesIO(dados)
+        arquivo.name = "foto.jpg"
+        return processar_upload_foto(arquivo, "bench")
+
+    tempos = []
+    for _ in range(repeticoes):
+        processar_bytes_foto.clear()
+        inicio = time.perf_counter()
+        foto_info = _upload()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    memorizado = cronometrar(_upload, repeticoes)
+    shutil.rmtree(diretorio, ignore_errors=True)
+
+    dimensoes = foto_info["dimensoes"]
+    fila.put({
+        "classe": nome,
+        "entrada": f"{tamanho[0]}x{tamanho[1]}",
+        "bytes_entrada": len(dados),
+        "saida": f"{dimensoes[0]}x{dimensoes[1]}",
+        "bytes_saida": len(foto_info["bytes"]),
+        "bytes_miniatura": len(foto_info["variantes"]["miniatura"]),
+        "bytes_webp": len(foto_info["variantes"]["webp"]),
+        **resumir_tempos(tempos),
+        "ms_mediana_memorizado": memorizado["ms_mediana"],
+        "rss_inicial_mb": rss_inicial,
+        "rss_pico_mb": rss_pico_mb(),
+    })
+
+def benchmark_fotos(repeticoes: int):
+    resultados = []
+    for nome, tamanho in CLASSES_FOTO.items():
+        resultado = rodar_em_processo(_medir_classe_foto, nome, tamanho, repeticoes)
+        resultados.append(resultado)
+        print(
+            f"{nome:<12} {resultado['entrada']:>10} {resultado['bytes_entrada'] / 1024:>8.0f}KB "
+            f"→ {resultado['saida']:>8} {resultado['bytes_saida'] / 1024:>6.0f}KB | "
+            f"{resultado['ms_mediana']:>7.1f} ms (máx {resultado['ms_max']:.1f}, "
+            f"memorizado {resultado['ms_mediana_memorizado']:.2f}) | "
+            f"RSS pico {resultado['rss_pico_mb']:.0f}MB "
+            f"(+{resultado['rss_pico_mb'] - resultado['rss_inicial_mb']:.0f}MB)"
+        )
+    return resultados
+
+# =============================================================================
+# PEDIDOS SINTÉTICOS
+# =============================================================================
+TECNICOS = [
+    "Carlos Souza", "Ana Lima", "João Pereira", "Marcos Oliveira", "Fernanda Costa",
+    "Ricardo Alves", "Juliana Rocha", "Paulo Martins", "Camila Ribeiro", "Eduardo Gomes",
+    "Patrícia Dias", "Rafael Barbosa", "Luciana Freitas", "Thiago Cardoso", "Beatriz Nunes",
+    "Gustavo Teixeira", "Renata Moreira", "André Correia", "Vanessa Pinto", "Diego Ramos",
+]
+
+PECAS = [
+    "Fusor", "Unidade de imagem", "Rolete de tração", "Rolete de separação", "Placa lógica",
+    "Fonte de alimentação", "Cartucho de toner", "Cilindro", "Correia de transferência",
+    "Scanner (vidro)", "Painel de controle", "Sensor de papel", "Engrenagem do fusor",
+    "Bandeja 2", "Duplex", "Cabo flat do scanner", "Laser (LSU)", "Rolete de transferência",
+    "Pad de separação", "Motor principal", "Ventoinha", "Placa de rede", "Bucha do rolete",
+    "Mola do pad", "Tampa traseira", "ADF completo", "Lâmina de limpeza", "Chip do toner",
+]
+
+# (modelo, prefixo do nº de série)
+MODELOS = [
+    ("HP LaserJet M426", "PHB"), ("HP LaserJet M404", "PHC"), ("Samsung M4080", "ZDDE"),
+    ("Samsung M4020", "ZDDF"), ("Brother DCP-L5652", "U6"), ("Brother HL-L6202", "U64"),
+    ("Lexmark MX511", "7015"), ("Lexmark MS811", "4063"), ("Kyocera M3655", "VCF"),
+    ("Ricoh MP 301", "W91"), ("Epson L6191", "X4DE"), ("Canon imageCLASS MF445", "XFB"),
+]
+
+FRASES_OBSERVACAO = [
+    "Cliente relatou atolamento frequente.", "Peça retirada de equipamento de sucata.",
+    "Urgente - equipamento parado.", "Testar antes de enviar.", "Enviar junto com o rolete.",
+    "Contador acima de 200 mil páginas.", "Manchas na impressão < 5cm da borda.",
+    "Aguardando aprovação do orçamento & peça.", "Ruído no fusor ao aquecer.",
+    "Trocar também a engrenagem \"B\".", "Levar na próxima visita.", "Confirmar modelo com o cliente.",
+]
+
+PESOS_STATUS = {"Pendente": 0.15, "Solicitado": 0.25, "Entregue": 0.60}
+
+def pesos_zipf(quantidade: int, expoente: float = 1.1):
+    """Poucos valores muito frequentes e cauda longa (como técnicos e peças na prática)"""
+    return [1 / (posicao + 1) ** expoente for posicao in range(quantidade)]
+
+def gerar_numero_serie(rng: random.Random, prefixo: str) -> str:
+    corpo = "".join(rng.choice("0123456789ABCDEFGHJKLMNPRSTUVWXYZ") for _ in range(10 - len(prefixo)))
+    numero = prefixo + corpo
+    sorteio = rng.random()
+    if sorteio < 0.05:
+        return numero.lower()  # digitado em minúsculas
+    if sorteio < 0.10:
+        return f"{numero[:4]}-{numero[4:]}"  # digitado com hífen
+    return numero
+
+def gerar_observacoes(rng: random.Random) -> str:
+    sorteio = rng.random()
+    if sorteio < 0.55:
+        return ""
+    if sorteio < 0.97:
+        return " ".join(rng.sample(FRASES_OBSERVACAO, rng.randint(1, 3)))
+    return " ".join(rng.choices(FRASES_OBSERVACAO, k=rng.randint(15, 30)))  # texto longo
+
+def gerar_pedidos_sinteticos(quantidade: int, semente: int = 42, fracao_fotos: float = 0.3, fotos=()):
+    """Gera pedidos determinísticos (mesma semente → mesmos dados) no formato gravado pelo app.
+
+    fotos: campos de URL já enviados (foto_url, foto_miniatura_url, ...) a reaproveitar
+    na fração de pedidos com foto.
+    """
+    from app import normalizar_numero_serie
+
+    rng = random.Random(semente)
+    pesos_tecnicos = pesos_zipf(len(TECNICOS))
+    pesos_pecas = pesos_zipf(len(PECAS))
+    pesos_modelos = pesos_zipf(len(MODELOS), 0.8)
+    status, pesos_status = zip(*PESOS_STATUS.items())
+    inicio = datetime(2024, 1, 1, 8, 0, 0)
+
+    for indice in range(quantidade):
+        modelo, prefixo_serie = rng.choices(MODELOS, pesos_modelos)[0]
+        numero_serie = gerar_numero_serie(rng, prefixo_serie)
+        criado = inicio + timedelta(minutes=indice * 7 + rng.randrange(7))
+        pedido = {
+            "id": f"{rng.getrandbits(32):08x}",
+            "tecnico": rng.choices(TECNICOS, pesos_tecnicos)[0],
+            "peca": rng.choices(PECAS, pesos_pecas)[0],
+            "modelo": modelo,
+            "numero_serie": numero_serie,
+            "numero_serie_normalizado": normalizar_numero_serie(numero_serie),
+            "ordem_servico": str(rng.randrange(100000, 999999)),
+            "observacoes": gerar_observacoes(rng),
+            "status": rng.choices(status, pesos_status)[0],
+            "data_criacao": criado.strftime("%d/%m/%Y %H:%M:%S"),
+            "criado_em": criado.astimezone(timezone.utc),
+            "atualizado_em": criado.astimezone(timezone.utc),
+        }
+        pedido["status_em"] = {pedido["status"]: pedido["criado_em"]}
+        if fotos and rng.random() < fracao_fotos:
+            pedido.update(rng.choice(fotos))
+            pedido["tem_foto"] = True
+        yield pedido
+
+def semear_fotos(quantidade: int = 8):
+    """Envia algumas fotos sintéticas (e variantes) para o backend e devolve os campos de URL"""
+    from app import PREFIXO_FOTOS, enviar_blob, reduzir_foto, upload_variantes_foto
+
+    fotos = []
+    for indice in range(quantidade):
+        variantes, _ = reduzir_foto(gerar_foto_sintetica(1600, 1200))
+        blob_name = f"{PREFIXO_FOTOS}bench_{indice}.jpg"
+        fotos.append({"foto_url": enviar_blob(variantes["jpeg"], blob_name), **upload_variantes_foto(blob_name, variantes)})
+    return fotos
+
+def semear_pedidos(quantidade: int, semente: int, fracao_fotos: float):
+    from app import IMPORTACAO_LOTE, reconciliar_contadores, repositorio_pedidos
+
+    fotos = semear_fotos() if fracao_fotos > 0 else []
+    lote, amostra = [], []
+    for pedido in gerar_pedidos_sinteticos(quantidade, semente, fracao_fotos, fotos):
+        lote.append(pedido)
+        if len(amostra) < 50:
+            amostra.append(pedido)
+        if len(lote) >= IMPORTACAO_LOTE:
+            repositorio_pedidos.gravar_lote(lote)
+            lote = []
+    if lote:
+        repositorio_pedidos.gravar_lote(lote)
+    reconciliar_contadores()
+    return amostra
+
+# =============================================================================
+# PEDIDOS: OPERAÇÕES E PÁGINAS
+# =============================================================================
+def consultas_busca(amostra):
+    """Termos de busca típicos do formulário de Atualizar Status"""
+    from app import normalizar_numero_serie
+
+    pedido = amostra[len(amostra) // 2]
+    serie = normalizar_numero_serie(pedido["numero_serie"])
+    return {
+        "id": pedido["id"],
+        "serie_exata": pedido["numero_serie"],
+        "serie_prefixo": serie[:4],
+        "inexistente": "nao-existe-0000",
+    }
+
+def medir_operacoes(amostra, repeticoes: int):
+    from app import (
+        TAMANHO_PAGINA_PADRAO,
+        buscar_pedidos,
+        listar_pedidos,
+        listar_pedidos_pagina,
+        obter_contadores,
+    )
+
+    operacoes = {
+        "listar_pedidos": cronometrar(listar_pedidos, repeticoes),
+        "listar_pedidos_pagina": cronometrar(lambda: listar_pedidos_pagina(None, TAMANHO_PAGINA_PADRAO), repeticoes),
+        "obter_contadores": cronometrar(obter_contadores, repeticoes),
+    }
+    for nome, termo in consultas_busca(amostra).items():
+        operacoes[f"buscar_pedidos[{nome}]"] = cronometrar(lambda: buscar_pedidos(termo), repeticoes)
+    return operacoes
+
+def medir_paginas(amostra, repeticoes: int, timeout: float):
+    """Execuções completas do script (AppTest) para cada item do menu"""
+    from streamlit.testing.v1 import AppTest
+
+    paginas = {}
+
+    def _rodar(app_test, nome):
+        inicio = time.perf_counter()
+        app_test.run(timeout=timeout)
+        tempo = (time.perf_counter() - inicio) * 1000
+        if app_test.exception:
+            raise RuntimeError(f"{nome}: {app_test.exception[0].message}")
+        return tempo
+
+    for menu in ["Adicionar Pedido", "Visualizar Pedidos", "Atualizar Status"]:
+        app_test = AppTest.from_file(CAMINHO_APP, default_timeout=timeout)
+        app_test.session_state["autorizado"] = True  # mede a página completa, não a tela de senha
+        app_test.run()
+        app_test.sidebar.selectbox[0].set_value(menu)
+        paginas[menu] = resumir_tempos([_rodar(app_test, menu) for _ in range(repeticoes)])
+
+        if menu == "Atualizar Status":
+            termo = consultas_busca(amostra)["serie_prefixo"]
+            tempos = []
+            for _ in range(repeticoes):
+                app_test.text_input[0].input(termo)
+                next(b for b in app_test.button if b.label == "📥 Atualizar Status").click()
+                tempos.append(_rodar(app_test, "busca"))
+            paginas["Atualizar Status (busca)"] = resumir_tempos(tempos)
+    return paginas
+
+def _medir_quantidade(quantidade, repeticoes, fracao_fotos, semente, medir_telas, timeout, fila):
+    """Roda em processo próprio: backend novo, semeado só com esta quantidade"""
+    diretorio = tempfile.mkdtemp(prefix="partflow-bench-")
+    configurar_backend_local(diretorio)
+    try:
+        inicio = time.perf_counter()
+        amostra = semear_pedidos(quantidade, semente, fracao_fotos)
+        ms_semeadura = (time.perf_counter() - inicio) * 1000
+
+        resultado = {
+            "quantidade": quantidade,
+            "ms_semeadura": ms_semeadura,
+            "operacoes": medir_operacoes(amostra, repeticoes),
+        }
+        if medir_telas:
+            resultado["paginas"] = medir_paginas(amostra, repeticoes, timeout)
+        resultado["rss_pico_mb"] = rss_pico_mb()
+        fila.put(resultado)
+    except Exception as e:
+        fila.put({"quantidade": quantidade, "erro": str(e)})
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+def benchmark_pedidos(quantidades, repeticoes: int, fracao_fotos: float, semente: int,
+                      medir_telas: bool = True, timeout: float = 600):
+    resultados = []
+    for quantidade in quantidades:
+        resultado = rodar_em_processo(
+            _medir_quantidade, quantidade, repeticoes, fracao_fotos, semente, medir_telas, timeout
+        )
+        resultados.append(resultado)
+        print(f"\n== {quantidade} pedidos ==")
+        if "erro" in resultado:
+            print(f"❌ {resultado['erro']}")
+            continue
+        print(f"semeadura: {resultado['ms_semeadura'] / 1000:.1f}s | RSS pico {resultado['rss_pico_mb']:.0f}MB")
+        for grupo in ("operacoes", "paginas"):
+            for nome, tempos in resultado.get(grupo, {}).items():
+                print(
+                    f"  {nome:<36} {tempos['ms_mediana']:>9.1f} ms "
+                    f"(p95 {tempos['ms_p95']:.1f}, máx {tempos['ms_max']:.1f})"
+                )
+    return resultados
+
+# =============================================================================
+# SALVAR PEDIDO (ENVIO → CONFIRMAÇÃO)
+# =============================================================================
+# O backend local não tem rede: cada chamada aos repositórios ganha uma espera
+# fixa (--latencia-ms), o que aproxima uma ida e volta ao Firestore/Storage
+METODOS_SEM_REDE = {"url", "nome_da_url"}
+
+def simular_latencia(latencia_ms: float):
+    """Atrasa os métodos públicos dos repositórios locais (só neste processo)"""
+    from armazenamento import RepositorioFotosLocal, RepositorioPedidosSQLite
+
+    def _com_latencia(metodo):
+        def envolvido(*args, **kwargs):
+            time.sleep(latencia_ms / 1000)
+            return metodo(*args, **kwargs)
+        return envolvido
+
+    for classe in (RepositorioPedidosSQLite, RepositorioFotosLocal):
+        for nome, metodo in list(vars(classe).items()):
+            if callable(metodo) and not nome.startswith("_") and nome not in METODOS_SEM_REDE:
+                setattr(classe, nome, _com_latencia(metodo))
+
+def salvar_pedido_sincrono(dados, fotos_info, latencia_ms: float):
+    """O caminho antigo: cada arquivo enviado e tornado público (make_public, mais
+    uma ida e volta) em sequência, e só então o documento criado no backend"""
+    from app import (
+        datetime_now_str,
+        fotos_do_pedido,
+        gerar_id_pedido,
+        normalizar_numero_serie,
+        repositorio_fotos,
+        repositorio_pedidos,
+    )
+
+    agora = datetime.now(timezone.utc)
+    fotos_urls = []
+    for foto_info in fotos_info:
+        for campo, (dados_foto, blob_name, content_type) in fotos_do_pedido(
+            foto_info["bytes"], foto_info.get("variantes")
+        ).items():
+            url = repositorio_fotos.enviar(blob_name, dados_foto, content_type)
+            time.sleep(latencia_ms / 1000)  # make_public
+            if campo == "foto_url":
+                fotos_urls.append(url)
+    pedido_id = gerar_id_pedido(agora)
+    repositorio_pedidos.criar({
+        **dados,
+        "id": pedido_id,
+        "data_criacao": datetime_now_str(),
+        "criado_em": agora,
+        "atualizado_em": agora,
+        "status_em": {dados.get("status") or "Pendente": agora},
+        "numero_serie_normalizado": normalizar_numero_serie(dados.get("numero_serie")),
+        "foto_url": fotos_urls[0] if fotos_urls else None,
+        "fotos_urls": fotos_urls,
+        "tem_foto": bool(fotos_urls),
+    })
+    return pedido_id
+
+def _medir_salvar(quantidade_fotos, repeticoes, latencia_ms, fila):
+    """Roda em processo próprio: backend novo, latência simulada só aqui"""
+    diretorio = tempfile.mkdtemp(prefix="partflow-bench-")
+    configurar_backend_local(diretorio)
+    try:
+        simular_latencia(latencia_ms)
+        from app import obter_fila_pedidos, obter_contadores, processar_upload_foto, salvar_pedido
+
+        # As fotos já processadas (igual nos dois caminhos: acontece antes do envio)
+        fotos_info = []
+        for indice in range(quantidade_fotos):
+            arquivo = io.BytesIO(gerar_foto_sintetica(1600 + indice, 1200))
+            arquivo.name = f"foto_{indice}.jpg"
+            fotos_info.append(processar_upload_foto(arquivo, "bench"))
+
+        dados = {"tecnico": TECNICOS[0], "peca": PECAS[0], "modelo": MODELOS[0][0],
+                 "numero_serie": "PHB1234567", "ordem_servico": "123456", "observacoes": "", "status": "Pendente"}
+        # Conexões, fila e secrets carregados antes de cronometrar (nenhum dos caminhos paga a inicialização)
+        obter_contadores()
+        fila_pedidos = obter_fila_pedidos()
+        salvar_pedido_sincrono(dados, fotos_info, latencia_ms)
+        salvar_pedido(dados, fotos_info)
+        antes = cronometrar(lambda: salvar_pedido_sincrono(dados, fotos_info, latencia_ms), repeticoes)
+        depois = cronometrar(lambda: salvar_pedido(dados, fotos_info), repeticoes)
+
+        # Quanto a fila leva para levar tudo ao backend (fora do tempo de confirmação)
+        inicio = time.perf_counter()
+        while fila_pedidos.pendentes():
+            time.sleep(0.05)
+        fila.put({
+            "fotos": quantidade_fotos,
+            "latencia_ms": latencia_ms,
+            "antes": antes,
+            "depois": depois,
+            "ms_esvaziar_fila": (time.perf_counter() - inicio) * 1000,
+        })
+    except Exception as e:
+        fila.put({"fotos": quantidade_fotos, "latencia_ms": latencia_ms, "erro": str(e)})
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+def benchmark_salvar(quantidades_fotos, repeticoes: int, latencia_ms: float):
+    resultados = []
+    print(f"latência simulada por chamada ao backend: {latencia_ms:.0f} ms")
+    for quantidade_fotos in quantidades_fotos:
+        resultado = rodar_em_processo(_medir_salvar, quantidade_fotos, repeticoes, latencia_ms)
+        resultados.append(resultado)
+        if "erro" in resultado:
+            print(f"{quantidade_fotos} foto(s): ❌ {resultado['erro']}")
+            continue
+        antes, depois = resultado["antes"], resultado["depois"]
+        print(
+            f"{quantidade_fotos} foto(s): antes {antes['ms_mediana']:>8.1f} ms (p95 {antes['ms_p95']:.1f}) | "
+            f"depois {depois['ms_mediana']:>7.1f} ms (p95 {depois['ms_p95']:.1f}) | "
+            f"fila esvaziada {resultado['ms_esvaziar_fila'] / 1000:.1f}s depois"
+        )
+    return resultados
+
+# =============================================================================
+# MAIN
+# =============================================================================
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do Controle de Pedidos")
+    sub = parser.add_subparsers(dest="suite", required=True)
+
+    p_fotos = sub.add_parser("fotos", help="processar_upload_foto por classe de tamanho")
+    p_fotos.add_argument("--repeticoes", type=int, default=5)
+    p_fotos.add_argument("--saida", help="arquivo JSON com os resultados")
+
+    p_pedidos = sub.add_parser("pedidos", help="listagem, busca e páginas com N pedidos sintéticos")
+    p_pedidos.add_argument("--quantidades", type=int, nargs="+", default=[1000, 10000])
+    p_pedidos.add_argument("--repeticoes", type=int, default=5)
+    p_pedidos.add_argument("--fracao-fotos", type=float, default=0.3, help="parcela dos pedidos com foto")
+    p_pedidos.add_argument("--semente", type=int, default=42)
+    p_pedidos.add_argument("--sem-paginas", action="store_true", help="não rodar as páginas via AppTest")
+    p_pedidos.add_argument("--timeout-pagina", type=float, default=600, help="segundos por execução de página")
+    p_pedidos.add_argument("--saida", help="arquivo JSON com os resultados")
+
+    p_salvar = sub.add_parser("salvar", help="envio → confirmação: caminho síncrono antigo x fila local")
+    p_salvar.add_argument("--fotos", type=int, nargs="+", default=[0, 1, 3], help="fotos por pedido")
+    p_salvar.add_argument("--repeticoes", type=int, default=10)
+    p_salvar.add_argument("--latencia-ms", type=float, default=100, help="espera por chamada ao backend")
+    p_salvar.add_argument("--saida", help="arquivo JSON com os resultados")
+
+    args = parser.parse_args()
+
+    if args.suite == "fotos":
+        resultados = benchmark_fotos(args.repeticoes)
+    elif args.suite == "pedidos":
+        resultados = benchmark_pedidos(
+            args.quantidades, args.repeticoes, args.fracao_fotos, args.semente,
+            medir_telas=not args.sem_paginas, timeout=args.timeout_pagina,
+        )
+    elif args.suite == "salvar":
+        resultados = benchmark_salvar(args.fotos, args.repeticoes, args.latencia_ms)
+
+    if args.saida:
+        parametros = {k: v for k, v in vars(args).items() if k not in ("suite", "saida")}
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "suite": args.suite,
+                    "data": datetime.now().isoformat(timespec="seconds"),
+                    "versao": versao_codigo(),
+                    "python": sys.version.split()[0],
+                    "plataforma": platform.platform(),
+                    "parametros": parametros,
+                    "resultados": resultados,
+                },
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+
+if __name__ == "__main__":
+    main()
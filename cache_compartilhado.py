@@ -0,0 +1,276 @@
+# cache_compartilhado.py - CACHE DE CONSULTAS COMPARTILHADO ENTRE RÉPLICAS
+#
+# Com várias réplicas do app atrás de um balanceador, cada uma consultava o
+# backend por conta própria (e cada uma via os pedidos com um atraso diferente).
+# Aqui os resultados das consultas (resumos de pedidos, contadores) ficam num
+# lugar comum: Redis, ou um arquivo SQLite quando todas as réplicas estão no
+# mesmo host.
+#
+# - A chave de cada consulta inclui um carimbo de versão. Toda escrita em
+#   pedidos incrementa a versão, e todas as réplicas passam a ignorar o que
+#   estava guardado (as entradas antigas expiram pelo TTL).
+# - Só uma réplica recalcula uma chave por vez (trava com expiração); as
+#   outras esperam o resultado dela em vez de repetir a consulta.
+# - Se o cache cair, as consultas vão direto ao backend.
+#
+# Os valores são gravados em JSON (datetimes marcados), nunca pickle: o que
+# vem do cache compartilhado não pode executar código.
+#
+# Este módulo não usa Streamlit. O pacote redis só é importado se configurado.
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+TTL_PADRAO = 300          # segundos que uma consulta fica guardada
+TRAVA_TTL = 30            # segundos até a trava de uma réplica que caiu expirar
+ESPERA_TRAVA = 5.0        # segundos aguardando a réplica que está recalculando
+INTERVALO_ESPERA = 0.05
+
+def _codificar(valor) -> bytes:
+    def _padrao(objeto):
+        if isinstance(objeto, datetime):
+            return {"$dt": objeto.isoformat()}
+        raise TypeError(f"Valor não serializável no cache: {type(objeto).__name__}")
+
+    return json.dumps(valor, default=_padrao, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _decodificar(dados: bytes):
+    def _objeto(objeto):
+        if len(objeto) == 1 and "$dt" in objeto:
+            return datetime.fromisoformat(objeto["$dt"])
+        return objeto
+
+    return json.loads(dados, object_hook=_objeto)
+
+def chave_consulta(partes) -> str:
+    """Hash estável dos parâmetros da consulta (filtros, intervalo, cursor...)"""
+    texto = json.dumps(partes, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+# =============================================================================
+# BACKENDS
+# =============================================================================
+class BackendCache:
+    """Operações mínimas que o cache precisa (todas atômicas no servidor)"""
+
+    def obter(self, chave: str):
+        """Bytes guardados, ou None se não existir/expirou"""
+        raise NotImplementedError
+
+    def gravar(self, chave: str, valor: bytes, ttl: int):
+        raise NotImplementedError
+
+    def versao(self, nome: str) -> int:
+        raise NotImplementedError
+
+    def incrementar_versao(self, nome: str) -> int:
+        raise NotImplementedError
+
+    def travar(self, chave: str, ttl: int):
+        """Token se conseguiu a trava, None se outra réplica já a tem"""
+        raise NotImplementedError
+
+    def destravar(self, chave: str, token: str):
+        """Libera a trava só se ainda for a mesma (o token confere)"""
+        raise NotImplementedError
+
+class BackendRedis(BackendCache):
+    # GET + DEL atômicos: não apaga a trava que outra réplica pegou depois da nossa expirar
+    SCRIPT_DESTRAVAR = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, url: str):
+        import redis
+
+        self.cliente = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+
+    def obter(self, chave):
+        return self.cliente.get(chave)
+
+    def gravar(self, chave, valor, ttl):
+        self.cliente.set(chave, valor, ex=ttl)
+
+    def versao(self, nome):
+        return int(self.cliente.get(nome) or 0)
+
+    def incrementar_versao(self, nome):
+        return int(self.cliente.incr(nome))
+
+    def travar(self, chave, ttl):
+        token = uuid.uuid4().hex
+        return token if self.cliente.set(f"{chave}:trava", token, nx=True, ex=ttl) else None
+
+    def destravar(self, chave, token):
+        self.cliente.eval(self.SCRIPT_DESTRAVAR, 1, f"{chave}:trava", token)
+
+ESQUEMA_CACHE_SQLITE = """
+CREATE TABLE IF NOT EXISTS entradas (
+    chave TEXT PRIMARY KEY,
+    valor BLOB NOT NULL,
+    expira REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versoes (
+    nome TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS travas (
+    chave TEXT PRIMARY KEY,
+    token TEXT NOT NULL,
+    expira REAL NOT NULL
+);
+"""
+
+class BackendSQLite(BackendCache):
+    """Arquivo SQLite compartilhado pelos processos de um mesmo host"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._conexao().executescript(ESQUEMA_CACHE_SQLITE)
+
+    def _conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def obter(self, chave):
+        linha = self._conexao().execute(
+            "SELECT valor FROM entradas WHERE chave = ? AND expira > ?", (chave, time.time())
+        ).fetchone()
+        return linha[0] if linha else None
+
+    def gravar(self, chave, valor, ttl):
+        agora = time.time()
+        conn = self._conexao()
+        conn.execute("DELETE FROM entradas WHERE expira <= ?", (agora,))
+        conn.execute(
+            "INSERT OR REPLACE INTO entradas (chave, valor, expira) VALUES (?, ?, ?)",
+            (chave, valor, agora + ttl),
+        )
+
+    def versao(self, nome):
+        linha = self._conexao().execute("SELECT valor FROM versoes WHERE nome = ?", (nome,)).fetchone()
+        return linha[0] if linha else 0
+
+    def incrementar_versao(self, nome):
+        return self._conexao().execute(
+            "INSERT INTO versoes (nome, valor) VALUES (?, 1) "
+            "ON CONFLICT(nome) DO UPDATE SET valor = valor + 1 RETURNING valor",
+            (nome,),
+        ).fetchone()[0]
+
+    def travar(self, chave, ttl):
+        token = uuid.uuid4().hex
+        agora = time.time()
+        conn = self._conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM travas WHERE chave = ? AND expira <= ?", (chave, agora))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO travas (chave, token, expira) VALUES (?, ?, ?)",
+                (chave, token, agora + ttl),
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return token if cursor.rowcount == 1 else None
+
+    def destravar(self, chave, token):
+        self._conexao().execute("DELETE FROM travas WHERE chave = ? AND token = ?", (chave, token))
+
+def criar_backend_cache(url: str) -> BackendCache:
+    """redis://, rediss://, unix:// (Redis) ou sqlite:///relativo.db / sqlite:////absoluto.db"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return BackendRedis(url)
+    if url.startswith("sqlite:///"):
+        return BackendSQLite(url[len("sqlite:///"):])
+    raise ValueError(f"URL de cache não suportada: {url}")
+
+# =============================================================================
+# CACHE DE CONSULTAS
+# =============================================================================
+class CacheConsultas:
+    """Cache de consultas com carimbo de versão e single-flight por chave"""
+
+    def __init__(self, backend: BackendCache, prefixo: str = "partflow", ttl: int = TTL_PADRAO,
+                 espera: float = ESPERA_TRAVA, metricas=None, logger=None):
+        self.backend = backend
+        self.prefixo = prefixo
+        self.ttl = ttl
+        self.espera = espera
+        self._metricas = metricas
+        self._logger = logger
+        self._nome_versao = f"{prefixo}:versao"
+
+    def _registrar(self, evento: str, inicio: float):
+        if self._metricas is not None:
+            self._metricas.registrar(f"cache.{evento}", (time.perf_counter() - inicio) * 1000)
+
+    def _falha(self, operacao: str, erro: Exception):
+        if self._logger is not None:
+            self._logger.warning("Cache compartilhado indisponível (%s): %s", operacao, erro)
+
+    def obter_ou_calcular(self, partes, calcular):
+        """Valor da consulta `partes`: do cache, da réplica que já está calculando, ou de calcular()"""
+        inicio = time.perf_counter()
+        try:
+            chave = f"{self.prefixo}:v{self.backend.versao(self._nome_versao)}:{chave_consulta(partes)}"
+            dados = self.backend.obter(chave)
+            if dados is not None:
+                self._registrar("acerto", inicio)
+                return _decodificar(dados)
+            token = self.backend.travar(chave, TRAVA_TTL)
+        except Exception as e:
+            self._falha("leitura", e)
+            return calcular()
+
+        if token is None:
+            # Outra réplica está calculando esta chave: esperar o resultado dela
+            limite = time.monotonic() + self.espera
+            while time.monotonic() < limite:
+                time.sleep(INTERVALO_ESPERA)
+                try:
+                    dados = self.backend.obter(chave)
+                except Exception as e:
+                    self._falha("espera", e)
+                    break
+                if dados is not None:
+                    self._registrar("espera", inicio)
+                    return _decodificar(dados)
+            # Demorou demais (ou a outra réplica caiu): calcular sem gravar
+            self._registrar("espera_esgotada", inicio)
+            return calcular()
+
+        try:
+            valor = calcular()
+            try:
+                self.backend.gravar(chave, _codificar(valor), self.ttl)
+            except Exception as e:
+                self._falha("gravação", e)
+            self._registrar("falta", inicio)
+            return valor
+        finally:
+            try:
+                self.backend.destravar(chave, token)
+            except Exception as e:
+                self._falha("destravar", e)
+
+    def invalidar(self):
+        """Nova versão: tudo o que estava guardado deixa de ser usado (em todas as réplicas)"""
+        try:
+            return self.backend.incrementar_versao(self._nome_versao)
+        except Exception as e:
+            self._falha("invalidação", e)
+            return None
@@ -0,0 +1,309 @@
+# ferramentas.py - COMANDOS DE MANUTENÇÃO DO CONTROLE DE PEDIDOS
+#
+# Uso:
+#   python ferramentas.py variantes-fotos [--dry-run] [--limite N]
+#   python ferramentas.py exportar --saida pedidos.csv|pedidos.jsonl
+#   python ferramentas.py importar pedidos.csv|pedidos.jsonl [--checkpoint arq] [--dry-run]
+#   python ferramentas.py migrar-datas [--checkpoint arq] [--lote N] [--dry-run]
+#   python ferramentas.py limpeza [--dias N] [--fotos apagar|ARCHIVE] [--max-lotes N] [--dry-run]
+#   python ferramentas.py testar-email [--quantidade N]
+#
+# migrar-datas também preenche numero_serie_normalizado (pedidos e índice do
+# arquivo): rode antes de depender da busca por nº de série sem o espelho.
+#
+# A limpeza (arquivamento de pedidos entregues + fotos órfãs) foi feita para
+# rodar agendada, ex.: no cron "0 3 * * * cd /app && python ferramentas.py limpeza".
+#
+# Importa o app.py, então usa os mesmos secrets (.streamlit/secrets.toml) e o mesmo
+# backend (PARTFLOW_BACKEND=sqlite para os dados locais).
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from contextlib import closing
+
+# =============================================================================
+# VARIANTES DE FOTOS (BACKFILL)
+# =============================================================================
+def backfill_variantes_fotos(dry_run: bool = False, limite: int = None):
+    """Gera miniatura + WebP para fotos antigas em fotos_pedidos/ e grava as URLs nos pedidos"""
+    from app import (
+        PREFIXO_FOTOS,
+        invalidar_cache_pedidos,
+        nomes_blobs_variantes,
+        reduzir_foto,
+        repositorio_fotos,
+        repositorio_pedidos,
+        upload_variantes_foto,
+    )
+
+    inicio = time.perf_counter()
+    processadas = ignoradas = erros = pedidos_atualizados = 0
+
+    # listar() devolve só o nível direto (as variantes ficam em subpastas)
+    for nome in repositorio_fotos.listar(PREFIXO_FOTOS):
+        if limite is not None and processadas >= limite:
+            break
+        if repositorio_fotos.existe(nomes_blobs_variantes(nome)["miniatura"]):
+            ignoradas += 1
+            continue
+
+        try:
+            variantes, _ = reduzir_foto(repositorio_fotos.baixar(nome))
+            processadas += 1
+            if dry_run:
+                print(f"[dry-run] {nome}: geraria miniatura e WebP")
+                continue
+
+            campos = {k: v for k, v in upload_variantes_foto(nome, variantes).items() if v}
+            if not campos:
+                erros += 1
+                continue
+
+            pedidos = repositorio_pedidos.listar(
+                filtros={"foto_url": repositorio_fotos.url(nome)}, ordenar=False
+            )
+            for pedido in pedidos:
+                repositorio_pedidos.atualizar(pedido["id"], campos)
+                pedidos_atualizados += 1
+            print(f"✅ {nome}")
+        except Exception as e:
+            erros += 1
+            print(f"❌ {nome}: {e}")
+
+    if pedidos_atualizados:
+        invalidar_cache_pedidos()
+
+    duracao = time.perf_counter() - inicio
+    print(
+        f"\nFotos processadas: {processadas} | já tinham variantes: {ignoradas} | erros: {erros} | "
+        f"pedidos atualizados: {pedidos_atualizados} | {duracao:.1f}s "
+        f"({processadas / duracao if duracao else 0:.1f} fotos/s)"
+    )
+
+# =============================================================================
+# EXPORTAÇÃO / IMPORTAÇÃO
+# =============================================================================
+def exportar(saida: str):
+    """Exporta para arquivo (ou stdout com '-'); o formato vem da extensão"""
+    from app import exportar_pedidos
+
+    formato = "jsonl" if saida.endswith(".jsonl") else "csv"
+    inicio = time.perf_counter()
+    if saida == "-":
+        total = exportar_pedidos(sys.stdout, formato)
+    else:
+        with open(saida, "w", encoding="utf-8", newline="") as destino:
+            total = exportar_pedidos(destino, formato)
+    duracao = time.perf_counter() - inicio
+    print(
+        f"{total} pedidos exportados em {duracao:.1f}s ({total / duracao if duracao else 0:.0f} pedidos/s)",
+        file=sys.stderr,
+    )
+
+def importar(caminho: str, checkpoint: str = None, dry_run: bool = False):
+    from app import importar_pedidos
+
+    importar_pedidos(caminho, caminho_checkpoint=checkpoint, dry_run=dry_run)
+
+# =============================================================================
+# MIGRAÇÃO DE DATAS
+# =============================================================================
+def migrar_datas(checkpoint: str = None, lote: int = None, dry_run: bool = False):
+    """criado_em / atualizado_em / status_em nos pedidos que só têm data_criacao, e
+    numero_serie_normalizado nos pedidos e resumos arquivados anteriores ao campo"""
+    from app import MIGRACAO_LOTE, migrar_datas_pedidos
+
+    migrar_datas_pedidos(caminho_checkpoint=checkpoint, dry_run=dry_run, lote=lote or MIGRACAO_LOTE)
+
+# =============================================================================
+# ARQUIVAMENTO E LIMPEZA DE FOTOS
+# =============================================================================
+def limpeza(dias: int = None, fotos: str = None, max_lotes: int = None, checkpoint: str = None,
+            dry_run: bool = False):
+    from app import executar_limpeza
+
+    executar_limpeza(checkpoint, dias=dias, modo_fotos=fotos, dry_run=dry_run, max_lotes=max_lotes)
+
+# =============================================================================
+# EMAIL (SERVIDOR SMTP LOCAL DE TESTE)
+# =============================================================================
+def testar_email(quantidade: int = 3, timeout: float = 30):
+    """Passa notificações pela caixa de saída até um SMTP local (aiosmtpd) e confere a entrega.
+
+    Verifica: uma única sessão autenticada para todos os envios, o modo resumo
+    (um email para vários pedidos) e o reenvio depois que o servidor volta.
+    Não usa os secrets: a caixa de saída fica num diretório temporário.
+    """
+    try:
+        from aiosmtpd.controller import Controller
+        from aiosmtpd.smtp import AuthResult
+    except ImportError:
+        print("❌ Servidor de teste não instalado: pip install aiosmtpd")
+        return False
+
+    import logging
+    import socket
+    import tempfile
+
+    import app
+
+    # O aiosmtpd avisa a cada AUTH que um campo interno dele está obsoleto
+    logging.getLogger("mail.log").setLevel(logging.ERROR)
+
+    # Ciclos e backoff curtos para o teste não esperar minutos
+    app.CAIXA_SAIDA_INTERVALO = 0.2
+    app.CAIXA_SAIDA_BACKOFF_BASE = 0.5
+
+    class Servidor:
+        def __init__(self):
+            self.mensagens = []
+            self.logins = 0
+
+        async def handle_DATA(self, server, session, envelope):
+            self.mensagens.append(envelope.content.decode("utf-8", errors="replace"))
+            return "250 OK"
+
+        def autenticar(self, server, session, envelope, mechanism, auth_data):
+            valido = auth_data.login == b"partflow@teste.local" and auth_data.password == b"senha"
+            self.logins += valido
+            return AuthResult(success=valido)
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        porta = sock.getsockname()[1]
+
+    servidor = Servidor()
+
+    def _controlador():
+        return Controller(
+            servidor, hostname="127.0.0.1", port=porta,
+            authenticator=servidor.autenticar, auth_require_tls=False,
+        )
+
+    def _esperar(condicao):
+        limite = time.time() + timeout
+        while not condicao():
+            if time.time() > limite:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def _pedido(indice):
+        return {
+            "id": f"TESTE{indice:05d}", "tecnico": "Teste", "peca": f"Peça {indice}", "modelo": "",
+            "numero_serie": "", "ordem_servico": "", "observacoes": "", "status": "Pendente",
+            "data_criacao": app.datetime_now_str(),
+        }
+
+    config = {
+        "SMTP_SERVER": "127.0.0.1", "SMTP_PORT": porta, "SMTP_STARTTLS": False,
+        "EMAIL_FROM": "partflow@teste.local", "EMAIL_PASSWORD": "senha", "EMAIL_TO": "estoque@teste.local",
+    }
+    diretorio = tempfile.mkdtemp(prefix="partflow-email-")
+    resultados = []
+    controlador = _controlador()
+    controlador.start()
+    try:
+        # 1. Um email por pedido, todos pela mesma sessão SMTP
+        caixa = app.CaixaSaidaEmail(config, caminho=os.path.join(diretorio, "individual.sqlite3"))
+        for indice in range(quantidade):
+            caixa.enfileirar(_pedido(indice))
+        entregues = _esperar(lambda: len(servidor.mensagens) >= quantidade and caixa.pendentes() == 0)
+        resultados.append((f"{quantidade} emails individuais entregues", entregues))
+        resultados.append((f"uma sessão SMTP para os {quantidade} envios", entregues and servidor.logins == 1))
+
+        # 2. Modo resumo: os pedidos da janela num só email
+        antes = len(servidor.mensagens)
+        caixa_resumo = app.CaixaSaidaEmail(
+            {**config, "DIGEST": True, "DIGEST_JANELA_SEGUNDOS": 1},
+            caminho=os.path.join(diretorio, "resumo.sqlite3"),
+        )
+        for indice in range(quantidade):
+            caixa_resumo.enfileirar(_pedido(100 + indice))
+        entregue = _esperar(lambda: caixa_resumo.pendentes() == 0)
+        resultados.append((
+            f"resumo: {quantidade} pedidos em 1 email",
+            entregue and len(servidor.mensagens) == antes + 1
+            and f"{quantidade} NOVOS PEDIDOS" in servidor.mensagens[-1],
+        ))
+
+        # 3. Servidor fora do ar: o envio falha, fica em backoff e sai quando ele volta
+        controlador.stop()
+        antes = len(servidor.mensagens)
+        caixa_retentativa = app.CaixaSaidaEmail(config, caminho=os.path.join(diretorio, "retentativa.sqlite3"))
+        caixa_retentativa.enfileirar(_pedido(200))
+        with closing(sqlite3.connect(caixa_retentativa.caminho)) as conn:
+            falhou = _esperar(lambda: conn.execute("SELECT MAX(tentativas) FROM notificacoes").fetchone()[0])
+        controlador = _controlador()
+        controlador.start()
+        entregue = _esperar(lambda: caixa_retentativa.pendentes() == 0)
+        resultados.append((
+            "reenvio depois que o servidor volta",
+            falhou and entregue and len(servidor.mensagens) == antes + 1,
+        ))
+    finally:
+        controlador.stop()
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    for descricao, ok in resultados:
+        print(f"{'✅' if ok else '❌'} {descricao}")
+    return all(ok for _, ok in resultados)
+
+# =============================================================================
+# MAIN
+# =============================================================================
+def main():
+    parser = argparse.ArgumentParser(description="Ferramentas de manutenção do Controle de Pedidos")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_variantes = sub.add_parser("variantes-fotos", help="gerar miniatura/WebP das fotos existentes")
+    p_variantes.add_argument("--dry-run", action="store_true", help="só listar o que seria feito")
+    p_variantes.add_argument("--limite", type=int, help="máximo de fotos processadas nesta execução")
+
+    p_exportar = sub.add_parser("exportar", help="exportar todos os pedidos (CSV ou JSONL)")
+    p_exportar.add_argument("--saida", required=True, help="arquivo .csv/.jsonl ou '-' para stdout (CSV)")
+
+    p_importar = sub.add_parser("importar", help="importar pedidos de CSV/JSONL em lotes")
+    p_importar.add_argument("arquivo")
+    p_importar.add_argument("--checkpoint", help="arquivo de checkpoint (padrão: <arquivo>.checkpoint)")
+    p_importar.add_argument("--dry-run", action="store_true", help="só validar as linhas")
+
+    p_migrar = sub.add_parser("migrar-datas", help="preencher datas e nº de série normalizado dos pedidos antigos")
+    p_migrar.add_argument("--checkpoint", help="arquivo de checkpoint (padrão: .dados_locais/<backend>/migracao_datas.checkpoint)")
+    p_migrar.add_argument("--lote", type=int, help="pedidos por lote de leitura/escrita")
+    p_migrar.add_argument("--dry-run", action="store_true", help="só contar o que seria migrado")
+
+    p_limpeza = sub.add_parser("limpeza", help="arquivar pedidos entregues antigos e apagar fotos órfãs")
+    p_limpeza.add_argument("--dias", type=int, help="dias sem alteração para arquivar (padrão: ARQUIVAMENTO_DIAS)")
+    p_limpeza.add_argument("--fotos", help="'apagar' ou classe do Storage para as fotos arquivadas (ex.: ARCHIVE)")
+    p_limpeza.add_argument("--max-lotes", type=int, help="parar após N lotes (continua do checkpoint)")
+    p_limpeza.add_argument("--checkpoint", help="arquivo de checkpoint (padrão: .dados_locais/<backend>/limpeza.checkpoint)")
+    p_limpeza.add_argument("--dry-run", action="store_true", help="só contar o que seria feito")
+
+    p_email = sub.add_parser("testar-email", help="conferir a caixa de saída contra um SMTP local (aiosmtpd)")
+    p_email.add_argument("--quantidade", type=int, default=3, help="notificações por cenário")
+
+    args = parser.parse_args()
+
+    if args.comando == "variantes-fotos":
+        backfill_variantes_fotos(dry_run=args.dry_run, limite=args.limite)
+    elif args.comando == "exportar":
+        exportar(args.saida)
+    elif args.comando == "importar":
+        importar(args.arquivo, checkpoint=args.checkpoint, dry_run=args.dry_run)
+    elif args.comando == "migrar-datas":
+        migrar_datas(checkpoint=args.checkpoint, lote=args.lote, dry_run=args.dry_run)
+    elif args.comando == "limpeza":
+        limpeza(
+            dias=args.dias, fotos=args.fotos, max_lotes=args.max_lotes,
+            checkpoint=args.checkpoint, dry_run=args.dry_run,
+        )
+    elif args.comando == "testar-email":
+        if not testar_email(quantidade=args.quantidade):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
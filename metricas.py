@@ -0,0 +1,286 @@
+# metricas.py - MEDIÇÃO DE TEMPO (SPANS) E LEITURAS DE DOCUMENTOS
+#
+# Agrega no próprio processo a duração de cada trecho medido (chamadas ao
+# backend, páginas, processamento de fotos, SMTP) em amostras limitadas, de
+# onde saem p50/p95. Cada execução do script (rerun) também é registrada com
+# os spans e documentos lidos nela.
+#
+# Este módulo não usa Streamlit; o app guarda uma instância em cache_resource.
+import importlib
+import json
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+AMOSTRAS_POR_SPAN = 1000      # janela deslizante usada nos percentis
+EXECUCOES_GUARDADAS = 50      # reruns recentes mostrados no painel
+
+def percentil(valores_ordenados, fracao: float):
+    if not valores_ordenados:
+        return 0.0
+    posicao = min(len(valores_ordenados) - 1, round(fracao * (len(valores_ordenados) - 1)))
+    return valores_ordenados[posicao]
+
+class EstatisticaSpan:
+    """Contagem/soma totais e as últimas AMOSTRAS_POR_SPAN durações"""
+
+    def __init__(self):
+        self.chamadas = 0
+        self.erros = 0
+        self.ms_total = 0.0
+        self.documentos = 0
+        self.amostras = deque(maxlen=AMOSTRAS_POR_SPAN)
+
+    def registrar(self, ms: float, documentos: int, erro: bool):
+        self.chamadas += 1
+        self.erros += int(erro)
+        self.ms_total += ms
+        self.documentos += documentos
+        self.amostras.append(ms)
+
+    def resumo(self):
+        ordenadas = sorted(self.amostras)
+        return {
+            "chamadas": self.chamadas,
+            "erros": self.erros,
+            "ms_p50": percentil(ordenadas, 0.50),
+            "ms_p95": percentil(ordenadas, 0.95),
+            "ms_max": ordenadas[-1] if ordenadas else 0.0,
+            "ms_total": self.ms_total,
+            "documentos_lidos": self.documentos,
+        }
+
+class MetricasDesempenho:
+    """Agregador de spans, seguro para várias threads (sessões, uploads, email)"""
+
+    def __init__(self, logger=None):
+        self._lock = threading.Lock()
+        self._spans = defaultdict(EstatisticaSpan)
+        self._execucoes = deque(maxlen=EXECUCOES_GUARDADAS)
+        self._local = threading.local()  # execução (rerun) em andamento nesta thread
+        self._logger = logger
+        self.inicio = time.time()
+
+    # ---- spans -------------------------------------------------------------
+    def registrar(self, nome: str, ms: float, documentos: int = 0, erro: bool = False):
+        with self._lock:
+            self._spans[nome].registrar(ms, documentos, erro)
+        execucao = getattr(self._local, "execucao", None)
+        if execucao is not None:
+            parcial = execucao["spans"].setdefault(nome, {"chamadas": 0, "ms": 0.0, "documentos": 0})
+            parcial["chamadas"] += 1
+            parcial["ms"] += ms
+            parcial["documentos"] += documentos
+            execucao["documentos_lidos"] += documentos
+
+    @contextmanager
+    def span(self, nome: str):
+        """with metricas.span("nome") as s: ... ; s["documentos"] = n para contar leituras"""
+        dados = {"documentos": 0}
+        inicio = time.perf_counter()
+        erro = False
+        try:
+            yield dados
+        except Exception:  # st.rerun()/st.stop() são BaseException e não contam como erro
+            erro = True
+            raise
+        finally:
+            self.registrar(nome, (time.perf_counter() - inicio) * 1000, dados["documentos"], erro)
+
+    def medir(self, nome: str):
+        """Decorador equivalente a span()"""
+        def decorador(funcao):
+            @wraps(funcao)
+            def envolvida(*args, **kwargs):
+                with self.span(nome):
+                    return funcao(*args, **kwargs)
+            return envolvida
+        return decorador
+
+    # ---- execuções (reruns) ------------------------------------------------
+    def iniciar_execucao(self):
+        self._local.execucao = {"inicio": time.perf_counter(), "documentos_lidos": 0, "spans": {}}
+
+    def finalizar_execucao(self, pagina: str):
+        execucao = getattr(self._local, "execucao", None)
+        if execucao is None:
+            return None
+        self._local.execucao = None
+
+        ms = (time.perf_counter() - execucao.pop("inicio")) * 1000
+        registro = {
+            "evento": "execucao",
+            "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "pagina": pagina,
+            "ms": round(ms, 2),
+            **execucao,
+        }
+        self.registrar(f"pagina.{pagina}", ms, execucao["documentos_lidos"])
+        with self._lock:
+            self._execucoes.append(registro)
+        if self._logger is not None:
+            self._logger.info(json.dumps(registro, ensure_ascii=False, default=str))
+        return registro
+
+    # ---- consulta / exportação ---------------------------------------------
+    def resumo(self):
+        with self._lock:
+            return {nome: estatistica.resumo() for nome, estatistica in sorted(self._spans.items())}
+
+    def execucoes(self):
+        with self._lock:
+            return list(reversed(self._execucoes))
+
+    def limpar(self):
+        with self._lock:
+            self._spans.clear()
+            self._execucoes.clear()
+            self.inicio = time.time()
+
+    def como_json(self):
+        return json.dumps(
+            {"desde": self.inicio, "spans": self.resumo(), "execucoes": self.execucoes()},
+            ensure_ascii=False, indent=2, default=str,
+        )
+
+    def como_prometheus(self, prefixo: str = "partflow"):
+        """Formato texto de exposição do Prometheus (summary em segundos)"""
+        linhas = [
+            f"# HELP {prefixo}_span_seconds Duração dos trechos medidos",
+            f"# TYPE {prefixo}_span_seconds summary",
+        ]
+        resumo = self.resumo()
+        for nome, dados in resumo.items():
+            rotulo = f'span="{nome}"'
+            linhas.append(f'{prefixo}_span_seconds{{{rotulo},quantile="0.5"}} {dados["ms_p50"] / 1000:.6f}')
+            linhas.append(f'{prefixo}_span_seconds{{{rotulo},quantile="0.95"}} {dados["ms_p95"] / 1000:.6f}')
+            linhas.append(f'{prefixo}_span_seconds_sum{{{rotulo}}} {dados["ms_total"] / 1000:.6f}')
+            linhas.append(f'{prefixo}_span_seconds_count{{{rotulo}}} {dados["chamadas"]}')
+        linhas.append(f"# HELP {prefixo}_span_erros_total Trechos que terminaram com exceção")
+        linhas.append(f"# TYPE {prefixo}_span_erros_total counter")
+        for nome, dados in resumo.items():
+            linhas.append(f'{prefixo}_span_erros_total{{span="{nome}"}} {dados["erros"]}')
+        linhas.append(f"# HELP {prefixo}_documentos_lidos_total Documentos lidos do backend")
+        linhas.append(f"# TYPE {prefixo}_documentos_lidos_total counter")
+        for nome, dados in resumo.items():
+            if dados["documentos_lidos"]:
+                linhas.append(f'{prefixo}_documentos_lidos_total{{span="{nome}"}} {dados["documentos_lidos"]}')
+        return "\n".join(linhas) + "\n"
+
+# =============================================================================
+# INICIALIZAÇÃO A FRIO
+# =============================================================================
+class RelatorioInicializacao:
+    """Arranque a frio do processo: tempo de cada importação, de cada etapa
+    (backend, listener...) e até a primeira tela renderizada.
+
+    Cada duração também vira um span "inicializacao.*", então aparece no painel
+    e na exportação Prometheus junto com os demais.
+    """
+
+    def __init__(self, metricas: MetricasDesempenho, inicio: float, logger=None):
+        self._metricas = metricas
+        self._logger = logger
+        self._lock = threading.Lock()
+        self.inicio = inicio  # perf_counter() no início da primeira execução do script
+        self.importacoes = {}
+        self.etapas = {}
+        self.primeira_renderizacao_ms = None
+
+    def registrar_importacao(self, nome: str, ms: float):
+        with self._lock:
+            if nome in self.importacoes:
+                return
+            self.importacoes[nome] = ms
+        self._metricas.registrar(f"inicializacao.importacao.{nome}", ms)
+
+    def importar(self, nome: str):
+        """importlib.import_module medido (só conta se o módulo ainda não estava carregado)"""
+        if nome in sys.modules:
+            return sys.modules[nome]
+        inicio = time.perf_counter()
+        modulo = importlib.import_module(nome)
+        self.registrar_importacao(nome, (time.perf_counter() - inicio) * 1000)
+        return modulo
+
+    @contextmanager
+    def etapa(self, nome: str):
+        inicio = time.perf_counter()
+        with self._metricas.span(f"inicializacao.{nome}"):
+            yield
+        with self._lock:
+            self.etapas[nome] = (time.perf_counter() - inicio) * 1000
+
+    def marcar_primeira_renderizacao(self):
+        """Chamado ao fim de cada execução; só a primeira do processo é registrada"""
+        with self._lock:
+            if self.primeira_renderizacao_ms is not None:
+                return False
+            self.primeira_renderizacao_ms = (time.perf_counter() - self.inicio) * 1000
+        self._metricas.registrar("inicializacao.primeira_renderizacao", self.primeira_renderizacao_ms)
+        if self._logger is not None:
+            self._logger.info(json.dumps({"evento": "inicializacao", **self.resumo()}, ensure_ascii=False))
+        return True
+
+    def resumo(self):
+        with self._lock:
+            return {
+                "primeira_renderizacao_ms": self.primeira_renderizacao_ms,
+                "importacoes_ms": dict(self.importacoes),
+                "etapas_ms": dict(self.etapas),
+            }
+
+# =============================================================================
+# REPOSITÓRIO INSTRUMENTADO
+# =============================================================================
+def _documentos_lidos(metodo: str, args, resultado):
+    """Estimativa de leituras faturáveis de cada chamada ao repositório"""
+    if metodo in ("listar", "buscar_prefixo_serie", "listar_por_id", "listar_indice_arquivo_por_id"):
+        return len(resultado or [])
+    if metodo in ("obter", "atualizar", "atualizar_status", "contadores"):
+        return 1
+    if metodo in ("aplicar_status_bloco", "arquivar") and args:
+        return len(args[0])
+    if metodo == "buscar_arquivo":
+        return len(resultado or [])
+    if metodo in ("obter_arquivado", "foto_referenciada"):
+        return 1
+    return 0
+
+class RepositorioInstrumentado:
+    """Envolve um repositório e mede cada método público como span "<prefixo>.<metodo>"
+
+    Chamadas do listener (ouvir) contam os documentos recebidos em cada snapshot.
+    """
+
+    def __init__(self, repositorio, metricas: MetricasDesempenho, prefixo: str):
+        self._repositorio = repositorio
+        self._metricas = metricas
+        self._prefixo = prefixo
+
+    def __getattr__(self, nome):
+        atributo = getattr(self._repositorio, nome)
+        if nome.startswith("_") or not callable(atributo):
+            return atributo
+
+        span = f"{self._prefixo}.{nome}"
+
+        if nome == "ouvir":
+            def ouvir(callback):
+                def callback_medido(alteracoes):
+                    with self._metricas.span(f"{span}.snapshot") as dados:
+                        dados["documentos"] = len(alteracoes)
+                        callback(alteracoes)
+                return atributo(callback_medido)
+            return ouvir
+
+        @wraps(atributo)
+        def medido(*args, **kwargs):
+            with self._metricas.span(span) as dados:
+                resultado = atributo(*args, **kwargs)
+                dados["documentos"] = _documentos_lidos(nome, args, resultado)
+                return resultado
+        return medido